@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Import-time benchmark for df_widgets.
+
+Each module is imported in a fresh interpreter. The script reports the wall time
+and fails (exit code 1) if one of the heavy backends is loaded at import time
+or if the median import time exceeds `--max-time`.
+
+Usage:
+
+    python benchmarks/bench_import.py [--repeat 5] [--max-time 2.0]
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Modules that must not be imported by `import df_widgets.xxx`.
+HEAVY_MODULES = ["matplotlib.pyplot", "seaborn", "scipy", "statsmodels"]
+
+MODULES = ["df_widgets", "df_widgets.pandasw", "df_widgets.seabornw"]
+
+_SNIPPET = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t0
+print(json.dumps({{"time": dt, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module, repeat=5):
+    """Import `module` `repeat` times in fresh interpreters. Return (list of times, heavy modules loaded)."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get("PYTHONPATH", "")]))
+    times, loaded = [], set()
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", _SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+                                      env=env)
+        d = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+        times.append(d["time"])
+        loaded.update(d["loaded"])
+    return times, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters per module.")
+    parser.add_argument("--max-time", type=float, default=2.0, help="Max median import time in seconds.")
+    options = parser.parse_args()
+
+    failed = False
+    print("%-25s %10s %10s  %s" % ("module", "median [s]", "min [s]", "heavy modules loaded"))
+    for module in MODULES:
+        times, loaded = time_import(module, repeat=options.repeat)
+        median = sorted(times)[len(times) // 2]
+        print("%-25s %10.3f %10.3f  %s" % (module, median, min(times), ", ".join(loaded) or "-"))
+        if loaded or median > options.max_time: failed = True
+
+    if failed: print("FAILED: heavy backends imported or import time above %.2f s" % options.max_time)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmark suite for the widget backends.
+
+The inner plotting functions of `dfw_plot` and of the `seabornw` wrappers are executed headlessly
+(Agg backend, no render cache) on synthetic DataFrames with 1e3 - 1e7 rows and columns with different
+cardinalities. For each function, parameter set and size we record the wall time of the plotting function,
+the time needed to encode the figure in PNG and the peak memory allocated (tracemalloc).
+Times and memory are measured in separate runs since tracemalloc slows down the allocations.
+Results are appended to a JSON-lines file so that different releases can be compared.
+
+Usage:
+
+    python benchmarks/bench_widgets.py -o results.jsonl [--sizes 1e3 1e5] [--functions boxplot dfw_plot]
+    python benchmarks/bench_widgets.py -o new.jsonl --compare old.jsonl [--threshold 1.2]
+    python benchmarks/bench_widgets.py --check-streaming
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import sys
+import json
+import time
+import platform
+import tracemalloc
+import subprocess
+
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+
+# Columns of the synthetic DataFrame: num1, num2 (float), cat_lo (5 levels), cat_hi (50 levels), hue (3 levels)
+CASES = OrderedDict([
+    ("dfw_plot", [dict(x="num1", y="num2", kind=kind) for kind in ("line", "scatter", "hist", "box", "hexbin")]),
+    ("lmplot", [dict(x="num1", y="num2"), dict(x="num1", y="num2", hue="hue")]),
+    ("factorplot", [dict(x=cat, y="num1", kind="bar") for cat in ("cat_lo", "cat_hi")]),
+    ("boxplot", [dict(x=cat, y="num1") for cat in ("cat_lo", "cat_hi")]),
+    ("violinplot", [dict(x=cat, y="num1") for cat in ("cat_lo", "cat_hi")]),
+    ("stripplot", [dict(x=cat, y="num1") for cat in ("cat_lo", "cat_hi")]),
+    ("swarmplot", [dict(x=cat, y="num1") for cat in ("cat_lo", "cat_hi")]),
+    ("pointplot", [dict(x=cat, y="num1") for cat in ("cat_lo", "cat_hi")]),
+    ("barplot", [dict(x=cat, y="num1") for cat in ("cat_lo", "cat_hi")]),
+    ("countplot", [dict(x=cat) for cat in ("cat_lo", "cat_hi")]),
+])
+
+
+def make_frame(nrows, seed=0):
+    """Synthetic DataFrame with numeric columns and categorical columns of different cardinality."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame(OrderedDict([
+        ("num1", rng.randn(nrows)),
+        ("num2", rng.randn(nrows).cumsum()),
+        ("cat_lo", pd.Categorical.from_codes(rng.randint(0, 5, nrows), ["c%d" % i for i in range(5)])),
+        ("cat_hi", pd.Categorical.from_codes(rng.randint(0, 50, nrows), ["c%d" % i for i in range(50)])),
+        ("hue", pd.Categorical.from_codes(rng.randint(0, 3, nrows), ["h%d" % i for i in range(3)])),
+    ]))
+
+
+def _version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        return version("df_widgets")
+    except (ImportError, PackageNotFoundError):
+        return None
+
+
+def _git_commit():
+    try:
+        out = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.STDOUT)
+        return out.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def clear_caches():
+    """Clear the module-level caches of df_widgets (dictionaries `_NAME` with a `_MAX_NAME` bound)."""
+    for modname, module in list(sys.modules.items()):
+        if not modname.startswith("df_widgets.") or module is None: continue
+        for name, value in list(vars(module).items()):
+            if name.startswith("_MAX_") and isinstance(vars(module).get("_" + name[5:]), dict):
+                vars(module)["_" + name[5:]].clear()
+
+
+def run_case(data, funcname, params):
+    """Run one benchmark case. Return dictionary with the measurements."""
+    import matplotlib.pyplot as plt
+    from df_widgets.batch import get_closure
+    from df_widgets.render import get_figure, encode_figure
+
+    closure, defaults = get_closure(data, funcname)
+    kwargs = dict(defaults)
+    kwargs.update(params)
+
+    rec = OrderedDict([("wall_time", None), ("encode_time", None), ("peak_mem", None), ("nbytes", None), ("error", None)])
+    # Timing run without tracemalloc. Both runs start with empty caches.
+    clear_caches()
+    try:
+        start = time.perf_counter()
+        fig = get_figure(closure(**kwargs))
+        rec["wall_time"] = time.perf_counter() - start
+        start = time.perf_counter()
+        rec["nbytes"] = len(encode_figure(fig, fmt="png"))
+        rec["encode_time"] = time.perf_counter() - start
+    except Exception as exc:
+        rec["error"] = "%s: %s" % (exc.__class__.__name__, str(exc))
+        return rec
+    finally:
+        plt.close("all")
+
+    # Memory run.
+    clear_caches()
+    tracemalloc.start()
+    try:
+        encode_figure(get_figure(closure(**kwargs)), fmt="png")
+        rec["peak_mem"] = tracemalloc.get_traced_memory()[1]
+    except Exception as exc:
+        rec["error"] = "%s: %s" % (exc.__class__.__name__, str(exc))
+    finally:
+        tracemalloc.stop()
+        plt.close("all")
+
+    return rec
+
+
+def run(sizes, functions, outpath, max_time=60.0, verbose=1):
+    """
+    Run the benchmarks and append the results to `outpath`.
+    Larger sizes of a case are skipped once the wall time of the case exceeds `max_time`.
+    """
+    from df_widgets.render import render_executor
+    render_executor.enabled = False
+
+    meta = OrderedDict([
+        ("version", _version()),
+        ("commit", _git_commit()),
+        ("python", platform.python_version()),
+        ("machine", platform.machine()),
+        ("timestamp", time.strftime("%Y-%m-%dT%H:%M:%S")),
+    ])
+    skip = set()
+    records = []
+    with open(outpath, "at") as fh:
+        for nrows in sizes:
+            data = make_frame(nrows)
+            for funcname in functions:
+                for params in CASES[funcname]:
+                    case = (funcname, json.dumps(params, sort_keys=True))
+                    if case in skip: continue
+                    rec = OrderedDict(meta)
+                    rec.update([("function", funcname), ("params", params), ("nrows", nrows)])
+                    rec.update(run_case(data, funcname, params))
+                    if rec["wall_time"] is not None and rec["wall_time"] > max_time: skip.add(case)
+                    fh.write(json.dumps(rec) + "\n")
+                    fh.flush()
+                    records.append(rec)
+                    if verbose:
+                        print("%-10s %-45s %9d %8s s %8s s %10s B %s" % (
+                              funcname, case[1][:45], nrows,
+                              "%.3f" % rec["wall_time"] if rec["wall_time"] is not None else "-",
+                              "%.3f" % rec["encode_time"] if rec["encode_time"] is not None else "-",
+                              rec["peak_mem"], rec["error"] or ""))
+
+    return records
+
+
+def _heights(fig):
+    """Heights of the bars (or y values of the points) drawn in the axes of `fig`."""
+    import numpy as np
+    ax = fig.axes[0]
+    if ax.patches: return np.array([p.get_height() for p in ax.patches])
+    return np.concatenate([np.asarray(l.get_ydata(), dtype=float) for l in ax.lines if len(l.get_ydata())])
+
+
+def check_streaming(nrows=10 ** 4, functions=("barplot", "pointplot"), rtol=1e-6, verbose=1):
+    """
+    Check that the streaming path (DataSource) and the in-memory path (DataFrame) of `functions`
+    draw the same estimates. `num_big` has a large mean to check the precision of the streaming moments.
+    Return the number of mismatches.
+    """
+    import shutil
+    import tempfile
+    import itertools
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from df_widgets.batch import get_closure
+    from df_widgets.render import render_executor, get_figure
+    from scipy.stats import norm
+    from df_widgets.sources import open_source, grouped_estimates, STREAMING_ESTIMATORS
+    render_executor.enabled = False
+
+    frame = make_frame(nrows)
+    frame["num_big"] = 1e8 + np.random.RandomState(1).randn(nrows)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "frame.parquet")
+        frame.to_parquet(path)
+        source = open_source(path)
+        nerrs = 0
+        for funcname, value, estimator in itertools.product(functions, ("num1", "num_big"), STREAMING_ESTIMATORS):
+            heights = []
+            for data in (frame, source):
+                closure, defaults = get_closure(data, funcname)
+                kwargs = dict(defaults)
+                kwargs.update(x="cat_lo", y=value, estimator=estimator, n_boot=0)
+                heights.append(_heights(get_figure(closure(**kwargs))))
+                plt.close("all")
+            ok = heights[0].shape == heights[1].shape and np.allclose(heights[0], heights[1], rtol=rtol,
+                                                                      equal_nan=True)
+            nerrs += not ok
+            if verbose: print("%-10s %-8s %-5s %s" % (funcname, value, estimator, "OK" if ok else "MISMATCH"))
+
+        # Normal-approximation intervals of the mean computed by pandas.
+        for value in ("num1", "num_big"):
+            ci = grouped_estimates(source, "cat_lo", value, estimator="mean", ci=95)
+            g = frame.groupby("cat_lo", observed=True)[value]
+            half = norm.ppf(0.975) * (g.std(ddof=1) / np.sqrt(g.size())).reindex(ci.order).values
+            ok = np.allclose(ci.hi[:, 0] - ci.est[:, 0], half, rtol=1e-4)
+            nerrs += not ok
+            if verbose: print("%-10s %-8s %-5s %s" % ("ci", value, "mean", "OK" if ok else "MISMATCH"))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return nerrs
+
+
+def load_results(path):
+    """Read JSON-lines file. Return dict (function, params, nrows) --> last record."""
+    results = OrderedDict()
+    with open(path, "rt") as fh:
+        for line in fh:
+            if not line.strip(): continue
+            rec = json.loads(line)
+            results[(rec["function"], json.dumps(rec["params"], sort_keys=True), rec["nrows"])] = rec
+    return results
+
+
+def compare(new_path, old_path, threshold=1.2):
+    """Print the ratio new/old of wall time and peak memory. Return the number of regressions."""
+    new, old = load_results(new_path), load_results(old_path)
+    nregs = 0
+    print("%-10s %-45s %9s %10s %10s" % ("function", "params", "nrows", "time ratio", "mem ratio"))
+    for key, rec in new.items():
+        ref = old.get(key)
+        if ref is None or not rec["wall_time"] or not ref["wall_time"]: continue
+        tratio = rec["wall_time"] / ref["wall_time"]
+        mratio = rec["peak_mem"] / ref["peak_mem"] if ref["peak_mem"] else float("nan")
+        flag = ""
+        if tratio > threshold or mratio > threshold:
+            flag = "REGRESSION"
+            nregs += 1
+        print("%-10s %-45s %9d %10.2f %10.2f %s" % (key[0], key[1][:45], key[2], tratio, mratio, flag))
+    return nregs
+
+
+def main():
+    import argparse
+    import matplotlib
+    matplotlib.use("Agg")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", default="bench_results.jsonl", help="JSON-lines file with the results.")
+    parser.add_argument("--sizes", nargs="+", type=float, default=SIZES, help="Number of rows.")
+    parser.add_argument("--functions", nargs="+", default=list(CASES.keys()), choices=list(CASES.keys()))
+    parser.add_argument("--max-time", type=float, default=60.0,
+                        help="Skip larger sizes of a case once its wall time exceeds this value (s).")
+    parser.add_argument("--compare", default=None, help="Previous results. Report regressions.")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Max ratio new/old before flagging.")
+    parser.add_argument("--no-run", action="store_true", help="Only compare existing results.")
+    parser.add_argument("--check-streaming", action="store_true",
+                        help="Check that DataSources and DataFrames give the same estimates and exit.")
+    options = parser.parse_args()
+
+    if options.check_streaming:
+        return 1 if check_streaming() else 0
+
+    if not options.no_run:
+        run([int(s) for s in options.sizes], options.functions, options.output, max_time=options.max_time)
+    if options.compare:
+        return 1 if compare(options.output, options.compare, threshold=options.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
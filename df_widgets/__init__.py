@@ -0,0 +1,54 @@
+# coding: utf-8
+"""
+Widgets for Pandas Dataframes.
+
+Submodules are imported on first access so that `import df_widgets`
+does not pull in matplotlib.pyplot, seaborn and their dependencies.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+_SUBMODULES = (
+    "utils",
+    "render",
+    "figures",
+    "decimate",
+    "stats",
+    "schema",
+    "batch",
+    "timing",
+    "swarm",
+    "kde",
+    "raster",
+    "cluster",
+    "matrix",
+    "pairs",
+    "compact",
+    "pyramid",
+    "sources",
+    "facets",
+    "client",
+    "encoding",
+    "styles",
+    "selection",
+    "pandasw",
+    "seabornw",
+)
+
+# Public functions exported at the package level --> submodule.
+_LAZY_ATTRS = {
+    "dfw_plot": "pandasw",
+    "api_selector": "seabornw",
+}
+
+
+def __getattr__(name):
+    import importlib
+    if name in _SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module("." + _LAZY_ATTRS[name], __name__), name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_SUBMODULES) + list(_LAZY_ATTRS.keys()))
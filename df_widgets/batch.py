@@ -0,0 +1,240 @@
+# coding: utf-8
+"""
+Headless batch export of the widgets. Render all the combinations of a parameter grid
+for `dfw_plot` or one of the functions in `seabornw.__all__` with a pool of processes.
+
+Usage:
+
+    python -m df_widgets.batch data.parquet boxplot --grid '{"x": ["a", "b"], "y": ["c"]}' -o outdir -j 4
+
+The DataFrame is loaded once: workers inherit it via fork or read the file in the pool initializer
+so that it is never pickled for each task. A `manifest.json` file with the outputs and the timings
+is written in the output directory.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import re
+import sys
+import json
+import time
+import itertools
+import contextlib
+
+from collections import OrderedDict
+
+# Set in the parent process (fork) or in the pool initializer.
+_DATA = None
+# funcname --> (plotting closure, default values of the widgets)
+_CLOSURES = {}
+
+
+def load_frame(path, lazy=False):
+    """
+    Read DataFrame from file. The format is detected from the extension.
+    If `lazy`, return a :class:`DataSource` that reads only the columns used by the plots.
+    """
+    import pandas as pd
+    if lazy:
+        from df_widgets.sources import open_source
+        return open_source(path)
+    ext = os.path.splitext(path)[1].lower()
+    readers = {
+        ".csv": pd.read_csv,
+        ".parquet": pd.read_parquet,
+        ".pq": pd.read_parquet,
+        ".feather": pd.read_feather,
+        ".h5": pd.read_hdf,
+        ".hdf5": pd.read_hdf,
+        ".pkl": pd.read_pickle,
+        ".pickle": pd.read_pickle,
+        ".json": pd.read_json,
+    }
+    if ext not in readers:
+        raise ValueError("Don't know how to read %s. Supported extensions: %s" % (path, list(readers.keys())))
+    return readers[ext](path)
+
+
+def widget_functions():
+    """Return OrderedDict name --> widget function with `dfw_plot` and the functions in `seabornw.__all__`."""
+    from df_widgets import pandasw, seabornw
+    d = OrderedDict([("dfw_plot", pandasw.dfw_plot)])
+    for name in seabornw.__all__:
+        if name == "api_selector": continue
+        func = seabornw.__dict__.get(name)
+        if callable(func): d[name] = func
+    return d
+
+
+def get_closure(data, funcname):
+    """
+    Build the widget `funcname` for `data` without displaying it.
+    Return the undecorated plotting closure and the dictionary with the default values of the widgets.
+    """
+    functions = widget_functions()
+    if funcname not in functions:
+        raise ValueError("Unknown function %s. Choose among %s" % (funcname, list(functions.keys())))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        f = functions[funcname](data)
+    defaults = OrderedDict((w._kwarg, w.value) for w in f.widget.kwargs_widgets)
+    f.widget.close()
+    # Skip the render cache and the background executor.
+    return getattr(f, "__wrapped__", f), defaults
+
+
+def expand_grid(grid):
+    """
+    Cartesian product of the parameter grid. `grid` is a dictionary param --> list of values
+    (scalars are treated as lists with one element). Return list of dictionaries.
+    """
+    names = list(grid.keys())
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [OrderedDict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def _slug(params, maxlen=80):
+    s = "_".join("%s=%s" % (k, v) for k, v in params.items())
+    return re.sub(r"[^A-Za-z0-9=._-]+", "-", s)[:maxlen]
+
+
+def _init_worker(path, lazy=False):
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+    global _DATA
+    if _DATA is None: _DATA = load_frame(path, lazy=lazy)
+
+
+def render_task(task):
+    """Render one combination of parameters in the worker. Return record for the manifest."""
+    import matplotlib.pyplot as plt
+    from df_widgets.render import get_figure, encode_figure
+    index, funcname, params, outdir, fmt, dpi = task
+    record = OrderedDict([("index", index), ("params", params), ("file", None),
+                          ("render_time", None), ("encode_time", None), ("nbytes", None), ("error", None)])
+    try:
+        if funcname not in _CLOSURES: _CLOSURES[funcname] = get_closure(_DATA, funcname)
+        closure, defaults = _CLOSURES[funcname]
+        kwargs = dict(defaults)
+        unknown = set(params) - set(defaults)
+        if unknown: raise ValueError("Unknown parameters for %s: %s" % (funcname, sorted(unknown)))
+        # JSON null is equivalent to "None" in the widgets.
+        kwargs.update((k, "None" if v is None else v) for k, v in params.items())
+
+        start = time.time()
+        fig = get_figure(closure(**kwargs))
+        record["render_time"] = time.time() - start
+        start = time.time()
+        payload = encode_figure(fig, fmt=fmt, dpi=dpi)
+        record["encode_time"] = time.time() - start
+        plt.close("all")
+
+        path = os.path.join(outdir, "%s-%04d-%s.%s" % (funcname, index, _slug(params), fmt))
+        with open(path, "wb") as fh:
+            fh.write(payload)
+        record["file"], record["nbytes"] = os.path.basename(path), len(payload)
+
+    except Exception as exc:
+        plt.close("all")
+        record["error"] = "%s: %s" % (exc.__class__.__name__, str(exc))
+
+    return record
+
+
+def run_batch(path, funcname, grid, outdir, fmt="png", dpi=None, nprocs=None, lazy=False, verbose=0):
+    """
+    Render all the combinations of `grid` for widget `funcname` with the DataFrame stored in `path`.
+
+    Args:
+        path: File with the DataFrame (csv, parquet, feather, hdf5, pickle, json).
+        funcname: "dfw_plot" or name of a function in `seabornw.__all__`.
+        grid: Dictionary param --> list of values.
+        outdir: Output directory.
+        fmt: Image format ("png", "svg", "pdf" ...).
+        dpi: Resolution of the images. None for matplotlib default.
+        nprocs: Number of processes. Default: number of CPUs.
+        lazy: Open parquet, feather, hdf5 files (or a directory with .npy columns) as data sources.
+
+    Returns: Manifest (dictionary) also written to `outdir/manifest.json`.
+    """
+    import multiprocessing
+    if not os.path.isdir(outdir): os.makedirs(outdir)
+    combos = expand_grid(grid)
+    tasks = [(i, funcname, params, outdir, fmt, dpi) for i, params in enumerate(combos)]
+    nprocs = min(nprocs or multiprocessing.cpu_count(), max(len(tasks), 1))
+
+    start = time.time()
+    global _DATA
+    records = []
+    try:
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Workers inherit the DataFrame from the parent process.
+            _DATA = load_frame(path, lazy=lazy)
+            ctx = multiprocessing.get_context("fork")
+        else:
+            ctx = multiprocessing.get_context()
+        load_time = time.time() - start
+
+        pool = ctx.Pool(processes=nprocs, initializer=_init_worker, initargs=(path, lazy))
+        try:
+            for rec in pool.imap_unordered(render_task, tasks):
+                if verbose: print("[%d/%d] %s %s" % (len(records) + 1, len(tasks), rec["file"] or "", rec["error"] or ""))
+                records.append(rec)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        # Release the frame in the parent process.
+        _DATA = None
+
+    records.sort(key=lambda r: r["index"])
+    manifest = OrderedDict([
+        ("function", funcname),
+        ("data", os.path.abspath(path)),
+        ("format", fmt),
+        ("dpi", dpi),
+        ("nprocs", nprocs),
+        ("ntasks", len(tasks)),
+        ("nerrors", sum(1 for r in records if r["error"] is not None)),
+        ("load_time", load_time),
+        ("wall_time", time.time() - start),
+        ("tasks", records),
+    ])
+    with open(os.path.join(outdir, "manifest.json"), "wt") as fh:
+        json.dump(manifest, fh, indent=2, default=str)
+
+    return manifest
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="File with the DataFrame (csv, parquet, feather, hdf5, pickle, json).")
+    parser.add_argument("funcname", help="dfw_plot or function in seabornw.__all__.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--grid", default="{}", help="Parameter grid in JSON format.")
+    group.add_argument("--grid-file", help="JSON file with the parameter grid.")
+    parser.add_argument("-o", "--outdir", default="df_widgets_batch", help="Output directory.")
+    parser.add_argument("-f", "--format", default="png", help="Image format e.g. png, svg.")
+    parser.add_argument("--dpi", type=float, default=None, help="Resolution of the images.")
+    parser.add_argument("-j", "--nprocs", type=int, default=None, help="Number of processes.")
+    parser.add_argument("--lazy", action="store_true", default=False,
+                        help="Read only the columns used by the plots (parquet, feather, hdf5, .npy directory).")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Verbose mode.")
+    options = parser.parse_args(argv)
+
+    if options.grid_file:
+        with open(options.grid_file, "rt") as fh:
+            grid = json.load(fh, object_pairs_hook=OrderedDict)
+    else:
+        grid = json.loads(options.grid, object_pairs_hook=OrderedDict)
+
+    manifest = run_batch(options.data, options.funcname, grid, options.outdir, fmt=options.format,
+                         dpi=options.dpi, nprocs=options.nprocs, lazy=options.lazy, verbose=options.verbose)
+    print("Rendered %d/%d images in %.2f s with %d processes. Manifest: %s" % (
+          manifest["ntasks"] - manifest["nerrors"], manifest["ntasks"], manifest["wall_time"],
+          manifest["nprocs"], os.path.join(options.outdir, "manifest.json")))
+    return 1 if manifest["nerrors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
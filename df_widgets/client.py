@@ -0,0 +1,511 @@
+# coding: utf-8
+"""
+Client-side rendering backend.
+
+When the backend is enabled, the widgets that support it do not draw a matplotlib figure:
+the pre-aggregated data of the plot (bar heights and error bars, box quartiles, binned densities,
+decimated series, raster images) is stored in a :class:`Scene`, encoded as a single binary payload
+(JSON header followed by float32 arrays, each copied once into the payload) and sent to
+:class:`ClientPlot` as binary widget buffers that are memoryviews of the payload.
+The browser draws the scene on a canvas so that pan (drag), zoom (wheel), reset (double click)
+and hover do not require the kernel. Payloads are stored in the render cache as the encoded images.
+
+The widget requires `anywidget` (`pip install df_widgets[client]`). Usage:
+
+    from df_widgets import client
+    client.backend.enabled = True
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import json
+import struct
+import numpy as np
+
+from collections import OrderedDict
+
+MAGIC = b"DFWSCENE"
+
+
+class ClientBackend(object):
+    """Global switch of the client-side backend. `width` and `height` are the size of the canvas in pixels."""
+
+    def __init__(self, enabled=False, width=640, height=420):
+        self.enabled = enabled
+        self.width, self.height = width, height
+
+    def plot_shape(self):
+        """(nrows, ncols) of the plot area in pixels (canvas without the margins used by the front end)."""
+        return self.height - 76, self.width - 174
+
+
+backend = ClientBackend()
+
+
+class Scene(object):
+    """
+    Pre-aggregated plot data. Each mark has a kind (rects, segments, lines, points, polygons, image),
+    optional label and color and float32 arrays:
+
+        rects: x0, x1, y0, y1 and optional value (shown on hover).
+        segments: x0, y0, x1, y1.
+        lines, points: x, y.
+        polygons: x, y and starts (index of the first vertex of each polygon).
+        image: values (2D, row 0 at the bottom) and lut (256 x 3 colors in [0, 1]). extent in the metadata.
+
+    The x arrays are kept in float64 and encoded relative to `xoffset` (stored in the header)
+    so that float32 does not lose the resolution of large coordinates (e.g. datetimes in ns).
+    """
+
+    def __init__(self, xlabel="", ylabel="", title="", xticks=None, yticks=None):
+        self.meta = OrderedDict([("xlabel", xlabel), ("ylabel", ylabel), ("title", title)])
+        # Categorical axes: (positions, labels)
+        for name, ticks in (("xticks", xticks), ("yticks", yticks)):
+            if ticks is not None: self.meta[name] = [list(map(float, ticks[0])), [str(t) for t in ticks[1]]]
+        self.marks = []
+
+    def add(self, kind, label=None, color=None, meta=None, **arrays):
+        """Add mark. Colors are converted to hex strings."""
+        import matplotlib as mpl
+        mark = OrderedDict([("kind", kind), ("label", None if label is None else str(label)),
+                            ("color", mpl.colors.to_hex(color) if color is not None else None),
+                            ("meta", meta or {})])
+        mark["arrays"] = OrderedDict((k, np.ascontiguousarray(v, dtype="<f8" if k.startswith("x") else "<f4"))
+                                     for k, v in arrays.items())
+        self.marks.append(mark)
+        return mark
+
+    def bounds(self, margin=0.05):
+        """(x0, x1, y0, y1) of the data with a relative margin."""
+        xs, ys = [], []
+        for m in self.marks:
+            a = m["arrays"]
+            if m["kind"] == "image":
+                x0, x1, y0, y1 = m["meta"]["extent"]
+                xs += [x0, x1]
+                ys += [y0, y1]
+                continue
+            for k, v in a.items():
+                v = v[np.isfinite(v)]
+                if not v.size or k in ("starts", "value"): continue
+                (xs if k.startswith("x") else ys).extend([v.min(), v.max()])
+        x0, x1 = (min(xs), max(xs)) if xs else (0, 1)
+        y0, y1 = (min(ys), max(ys)) if ys else (0, 1)
+        dx, dy = (x1 - x0) or 1, (y1 - y0) or 1
+        return [float(x0 - margin * dx), float(x1 + margin * dx), float(y0 - margin * dy), float(y1 + margin * dy)]
+
+    def xoffset(self):
+        """First finite x value of the marks (0 if none). The x coordinates are encoded relative to it."""
+        for m in self.marks:
+            if m["kind"] == "image": return float(m["meta"]["extent"][0])
+            for k, v in m["arrays"].items():
+                if not k.startswith("x"): continue
+                v = v[np.isfinite(v)]
+                if v.size: return float(v[0])
+        return 0.0
+
+    def encode(self):
+        """
+        Return a bytearray: MAGIC, length of the JSON header, header and arrays aligned to 8 bytes.
+        The arrays are copied once, directly into the preallocated payload.
+        """
+        xoff = self.xoffset()
+        x0, x1, y0, y1 = self.bounds()
+        meta = dict(self.meta, bounds=[x0 - xoff, x1 - xoff, y0, y1], xoffset=xoff)
+        if "xticks" in meta: meta["xticks"] = [[p - xoff for p in meta["xticks"][0]], meta["xticks"][1]]
+        header = OrderedDict([("meta", meta), ("marks", [])])
+        values, offset = [], 0
+        for i, m in enumerate(self.marks):
+            entry = OrderedDict((k, v) for k, v in m.items() if k != "arrays")
+            if "extent" in m["meta"]:
+                e = m["meta"]["extent"]
+                entry["meta"] = dict(m["meta"], extent=[e[0] - xoff, e[1] - xoff, e[2], e[3]])
+            entry["arrays"] = OrderedDict()
+            for k, v in m["arrays"].items():
+                if k.startswith("x"): v = np.ascontiguousarray(v - xoff, dtype="<f4")
+                entry["arrays"][k] = [offset, v.nbytes, list(v.shape)]
+                values.append((offset, v))
+                offset += v.nbytes + (-v.nbytes % 8)
+            header["marks"].append(entry)
+        text = json.dumps(header).encode("utf-8")
+        text += b" " * (-(len(MAGIC) + 4 + len(text)) % 8)
+        start = len(MAGIC) + 4 + len(text)
+        payload = bytearray(start + offset)
+        payload[:start] = MAGIC + struct.pack("<I", len(text)) + text
+        for offset, v in values:
+            out = np.frombuffer(payload, dtype=v.dtype, count=v.size, offset=start + offset)
+            out[...] = v.ravel()
+        return payload
+
+
+def is_scene(obj):
+    return isinstance(obj, Scene)
+
+
+def is_payload(payload):
+    return bytes(payload[:len(MAGIC)]) == MAGIC
+
+
+def decode(payload):
+    """
+    Return (header, arrays) where arrays maps "mark index/name" to memoryviews of `payload` (no copy).
+    """
+    n = struct.unpack("<I", payload[len(MAGIC):len(MAGIC) + 4])[0]
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(payload[start:start + n]).decode("utf-8"))
+    data = memoryview(payload)[start + n:]
+    arrays = OrderedDict()
+    for i, m in enumerate(header["marks"]):
+        for k, (offset, nbytes, shape) in m["arrays"].items():
+            arrays["%d/%s" % (i, k)] = data[offset:offset + nbytes]
+    return header, arrays
+
+
+_ESM = r"""
+function niceTicks(a, b, n) {
+  const span = b - a; if (!(span > 0)) return [a];
+  const step0 = span / n, mag = Math.pow(10, Math.floor(Math.log10(step0)));
+  const step = [1, 2, 5, 10].map(s => s * mag).find(s => s >= step0);
+  const ticks = []; for (let t = Math.ceil(a / step) * step; t <= b + 1e-9 * span; t += step) ticks.push(t);
+  return ticks;
+}
+function fmt(v) { return Math.abs(v) >= 1e4 || (Math.abs(v) < 1e-3 && v !== 0) ? v.toExponential(2) : +v.toPrecision(4) + ""; }
+
+function render({ model, el }) {
+  const W = model.get("width"), H = model.get("height"), M = { l: 64, r: 110, t: 28, b: 48 };
+  const dpr = window.devicePixelRatio || 1;
+  const root = document.createElement("div"); root.className = "dfw-client";
+  const canvas = document.createElement("canvas");
+  canvas.width = W * dpr; canvas.height = H * dpr; canvas.style.width = W + "px"; canvas.style.height = H + "px";
+  const tip = document.createElement("div"); tip.className = "dfw-tip";
+  root.append(canvas, tip); el.appendChild(root);
+  const ctx = canvas.getContext("2d");
+  // The x arrays are relative to xoff (added back in the tick labels and in the hover text).
+  let spec, arr, home, view, images, xoff;
+
+  function load() {
+    spec = model.get("spec"); arr = {}; images = {};
+    const raw = model.get("arrays");
+    for (const k in raw) {
+      const dv = raw[k];
+      arr[k] = dv.byteOffset % 4 ? new Float32Array(dv.buffer.slice(dv.byteOffset, dv.byteOffset + dv.byteLength))
+                                 : new Float32Array(dv.buffer, dv.byteOffset, dv.byteLength / 4);
+    }
+    spec.marks.forEach((m, i) => { if (m.kind === "image") images[i] = makeImage(m, i); });
+    home = spec.meta.bounds.slice(); view = home.slice(); xoff = spec.meta.xoffset || 0;
+  }
+  const A = (i, k) => arr[i + "/" + k];
+  const pw = () => W - M.l - M.r, ph = () => H - M.t - M.b;
+  const sx = v => M.l + (v - view[0]) / (view[1] - view[0]) * pw();
+  const sy = v => M.t + ph() - (v - view[2]) / (view[3] - view[2]) * ph();
+  const ix = p => view[0] + (p - M.l) / pw() * (view[1] - view[0]);
+  const iy = p => view[2] + (M.t + ph() - p) / ph() * (view[3] - view[2]);
+
+  function makeImage(m, i) {
+    const shape = m.arrays.values[2], v = A(i, "values"), lut = A(i, "lut");
+    const [vmin, vmax] = [m.meta.vmin, m.meta.vmax];
+    const off = document.createElement("canvas"); off.width = shape[1]; off.height = shape[0];
+    const octx = off.getContext("2d"), img = octx.createImageData(shape[1], shape[0]);
+    for (let r = 0; r < shape[0]; r++) for (let c = 0; c < shape[1]; c++) {
+      const val = v[r * shape[1] + c], o = ((shape[0] - 1 - r) * shape[1] + c) * 4;
+      if (!isFinite(val)) continue;
+      const k = Math.max(0, Math.min(255, Math.round((val - vmin) / ((vmax - vmin) || 1) * 255)));
+      img.data[o] = lut[3 * k] * 255; img.data[o + 1] = lut[3 * k + 1] * 255; img.data[o + 2] = lut[3 * k + 2] * 255;
+      img.data[o + 3] = 255;
+    }
+    octx.putImageData(img, 0, 0); return off;
+  }
+
+  function draw() {
+    ctx.setTransform(dpr, 0, 0, dpr, 0, 0); ctx.clearRect(0, 0, W, H);
+    ctx.save(); ctx.beginPath(); ctx.rect(M.l, M.t, pw(), ph()); ctx.clip();
+    spec.marks.forEach((m, i) => {
+      const c = m.color || "#333"; ctx.fillStyle = c; ctx.strokeStyle = c; ctx.lineWidth = m.meta.linewidth || 1.5;
+      if (m.kind === "rects") {
+        const x0 = A(i, "x0"), x1 = A(i, "x1"), y0 = A(i, "y0"), y1 = A(i, "y1");
+        for (let k = 0; k < x0.length; k++) {
+          const a = sx(x0[k]), b = sx(x1[k]), p = sy(y1[k]), q = sy(y0[k]);
+          ctx.fillRect(Math.min(a, b), Math.min(p, q), Math.abs(b - a), Math.abs(q - p));
+          if (m.meta.edgecolor) { ctx.strokeStyle = m.meta.edgecolor; ctx.strokeRect(Math.min(a, b), Math.min(p, q), Math.abs(b - a), Math.abs(q - p)); }
+        }
+      } else if (m.kind === "segments") {
+        const x0 = A(i, "x0"), x1 = A(i, "x1"), y0 = A(i, "y0"), y1 = A(i, "y1");
+        ctx.beginPath();
+        for (let k = 0; k < x0.length; k++) { ctx.moveTo(sx(x0[k]), sy(y0[k])); ctx.lineTo(sx(x1[k]), sy(y1[k])); }
+        ctx.stroke();
+      } else if (m.kind === "lines") {
+        const x = A(i, "x"), y = A(i, "y"); ctx.beginPath(); let pen = false;
+        for (let k = 0; k < x.length; k++) {
+          if (!isFinite(x[k]) || !isFinite(y[k])) { pen = false; continue; }
+          pen ? ctx.lineTo(sx(x[k]), sy(y[k])) : ctx.moveTo(sx(x[k]), sy(y[k])); pen = true;
+        }
+        ctx.stroke();
+      } else if (m.kind === "points") {
+        const x = A(i, "x"), y = A(i, "y"), r = m.meta.radius || 2;
+        for (let k = 0; k < x.length; k++) ctx.fillRect(sx(x[k]) - r, sy(y[k]) - r, 2 * r, 2 * r);
+      } else if (m.kind === "polygons") {
+        const x = A(i, "x"), y = A(i, "y"), st = A(i, "starts");
+        for (let p = 0; p < st.length; p++) {
+          const end = p + 1 < st.length ? st[p + 1] : x.length; ctx.beginPath();
+          for (let k = st[p]; k < end; k++) k === st[p] ? ctx.moveTo(sx(x[k]), sy(y[k])) : ctx.lineTo(sx(x[k]), sy(y[k]));
+          ctx.closePath(); ctx.fill(); ctx.strokeStyle = m.meta.edgecolor || c; ctx.stroke();
+        }
+      } else if (m.kind === "image") {
+        const [x0, x1, y0, y1] = m.meta.extent; ctx.imageSmoothingEnabled = false;
+        ctx.drawImage(images[i], sx(x0), sy(y1), sx(x1) - sx(x0), sy(y0) - sy(y1));
+      }
+    });
+    ctx.restore();
+    axes();
+  }
+
+  function axes() {
+    ctx.strokeStyle = "#444"; ctx.fillStyle = "#222"; ctx.lineWidth = 1; ctx.font = "11px sans-serif";
+    ctx.strokeRect(M.l, M.t, pw(), ph());
+    const xt = spec.meta.xticks, yt = spec.meta.yticks;
+    ctx.textAlign = "center"; ctx.textBaseline = "top";
+    const xs = xt ? xt[0].map((p, k) => [p, xt[1][k]]) : niceTicks(view[0] + xoff, view[1] + xoff, 6).map(t => [t - xoff, fmt(t)]);
+    xs.forEach(([p, l]) => { const q = sx(p); if (q < M.l - 1 || q > M.l + pw() + 1) return;
+      ctx.beginPath(); ctx.moveTo(q, M.t + ph()); ctx.lineTo(q, M.t + ph() + 4); ctx.stroke(); ctx.fillText(l, q, M.t + ph() + 6); });
+    ctx.textAlign = "right"; ctx.textBaseline = "middle";
+    const ys = yt ? yt[0].map((p, k) => [p, yt[1][k]]) : niceTicks(view[2], view[3], 6).map(t => [t, fmt(t)]);
+    ys.forEach(([p, l]) => { const q = sy(p); if (q < M.t - 1 || q > M.t + ph() + 1) return;
+      ctx.beginPath(); ctx.moveTo(M.l - 4, q); ctx.lineTo(M.l, q); ctx.stroke(); ctx.fillText(l, M.l - 6, q); });
+    ctx.textAlign = "center"; ctx.textBaseline = "bottom"; ctx.fillText(spec.meta.xlabel || "", M.l + pw() / 2, H - 4);
+    ctx.fillText(spec.meta.title || "", M.l + pw() / 2, M.t - 8);
+    ctx.save(); ctx.translate(14, M.t + ph() / 2); ctx.rotate(-Math.PI / 2); ctx.textBaseline = "middle";
+    ctx.fillText(spec.meta.ylabel || "", 0, 0); ctx.restore();
+    // Legend with the labelled marks.
+    const seen = {}; let row = 0; ctx.textAlign = "left";
+    spec.marks.forEach(m => { if (!m.label || seen[m.label]) return; seen[m.label] = 1;
+      const y = M.t + 8 + 16 * row++; ctx.fillStyle = m.color || "#333"; ctx.fillRect(W - M.r + 10, y - 5, 10, 10);
+      ctx.fillStyle = "#222"; ctx.fillText(m.label, W - M.r + 26, y); });
+  }
+
+  function hover(px, py) {
+    const x = ix(px), y = iy(py);
+    for (let i = spec.marks.length - 1; i >= 0; i--) {
+      const m = spec.marks[i], lab = m.label ? m.label + ": " : "";
+      if (m.kind === "rects") {
+        const x0 = A(i, "x0"), x1 = A(i, "x1"), y0 = A(i, "y0"), y1 = A(i, "y1"), v = A(i, "value");
+        for (let k = 0; k < x0.length; k++)
+          if (x >= Math.min(x0[k], x1[k]) && x <= Math.max(x0[k], x1[k]) && y >= Math.min(y0[k], y1[k]) && y <= Math.max(y0[k], y1[k]))
+            return lab + (v ? fmt(v[k]) : fmt(y1[k]));
+      } else if (m.kind === "points" || m.kind === "lines") {
+        const xs = A(i, "x"), ys = A(i, "y"); let best = 36, hit = -1;
+        for (let k = 0; k < xs.length; k++) { const d = (sx(xs[k]) - px) ** 2 + (sy(ys[k]) - py) ** 2; if (d < best) { best = d; hit = k; } }
+        if (hit >= 0) return lab + "(" + fmt(xs[hit] + xoff) + ", " + fmt(ys[hit]) + ")";
+      } else if (m.kind === "image") {
+        const [x0, x1, y0, y1] = m.meta.extent, shape = m.arrays.values[2];
+        const c = Math.floor((x - x0) / (x1 - x0) * shape[1]), r = Math.floor((y - y0) / (y1 - y0) * shape[0]);
+        if (r >= 0 && r < shape[0] && c >= 0 && c < shape[1]) return fmt(A(i, "values")[r * shape[1] + c]);
+      }
+    }
+    return null;
+  }
+
+  let drag = null;
+  canvas.addEventListener("mousedown", e => { drag = [e.offsetX, e.offsetY, view.slice()]; });
+  window.addEventListener("mouseup", () => { drag = null; });
+  canvas.addEventListener("mousemove", e => {
+    if (drag) {
+      const [x0, y0, v] = drag, dx = (e.offsetX - x0) / pw() * (v[1] - v[0]), dy = (e.offsetY - y0) / ph() * (v[3] - v[2]);
+      view = [v[0] - dx, v[1] - dx, v[2] + dy, v[3] + dy]; draw(); return;
+    }
+    const text = hover(e.offsetX, e.offsetY);
+    tip.style.display = text ? "block" : "none";
+    if (text) { tip.textContent = text; tip.style.left = (e.offsetX + 12) + "px"; tip.style.top = (e.offsetY + 12) + "px"; }
+  });
+  canvas.addEventListener("wheel", e => {
+    e.preventDefault();
+    const f = Math.exp(e.deltaY * 0.001), x = ix(e.offsetX), y = iy(e.offsetY);
+    view = [x + (view[0] - x) * f, x + (view[1] - x) * f, y + (view[2] - y) * f, y + (view[3] - y) * f]; draw();
+  }, { passive: false });
+  canvas.addEventListener("dblclick", () => { view = home.slice(); draw(); });
+  canvas.addEventListener("mouseleave", () => { tip.style.display = "none"; });
+  model.on("change:arrays", () => { load(); draw(); });
+  load(); draw();
+}
+export default { render };
+"""
+
+_CSS = """
+.dfw-client { position: relative; display: inline-block; }
+.dfw-client canvas { cursor: crosshair; }
+.dfw-tip { position: absolute; display: none; pointer-events: none; background: rgba(255, 255, 255, 0.9);
+           border: 1px solid #aaa; padding: 2px 5px; font: 11px sans-serif; white-space: nowrap; }
+"""
+
+_WIDGET_CLASS = []
+
+
+def widget_class():
+    """Return the ClientPlot widget class (created on first use since anywidget is optional)."""
+    if not _WIDGET_CLASS:
+        try:
+            import anywidget
+        except ImportError:
+            raise ImportError("The client-side backend requires anywidget. Install it with `pip install df_widgets[client]`")
+        import traitlets
+
+        class ClientPlot(anywidget.AnyWidget):
+            """Canvas drawing a :class:`Scene` sent as JSON header (spec) and binary buffers (arrays)."""
+            _esm = _ESM
+            _css = _CSS
+            spec = traitlets.Dict().tag(sync=True)
+            arrays = traitlets.Dict().tag(sync=True)
+            width = traitlets.Int(640).tag(sync=True)
+            height = traitlets.Int(420).tag(sync=True)
+
+        _WIDGET_CLASS.append(ClientPlot)
+    return _WIDGET_CLASS[0]
+
+
+def client_plot(payload):
+    """Build the ClientPlot widget from the encoded scene. Arrays are sent as memoryviews of `payload`."""
+    header, arrays = decode(payload)
+    return widget_class()(spec=header, arrays=dict(arrays), width=backend.width, height=backend.height)
+
+
+####################
+# Scene builders   #
+####################
+
+def _palette(ng, nh, hue, color, saturation=1):
+    """Colors [g][h] with the rules used by the matplotlib widgets."""
+    import matplotlib as mpl
+    from df_widgets.kde import _desaturate
+    cycle = mpl.rcParams["axes.prop_cycle"].by_key()["color"]
+    if hue is None and color is None:
+        return [[_desaturate(cycle[g % len(cycle)], saturation)] for g in range(ng)]
+    if hue is None:
+        return [[_desaturate(color, saturation)]] * ng
+    return [[_desaturate(cycle[h % len(cycle)], saturation) for h in range(nh)]] * ng
+
+
+def _orient(orient, a, b):
+    """(x, y) arrays from (categorical axis, value axis)."""
+    return (a, b) if orient == "v" else (b, a)
+
+
+def _rects(scene, orient, pos0, pos1, val0, val1, **kwargs):
+    x0, y0 = _orient(orient, pos0, val0)
+    x1, y1 = _orient(orient, pos1, val1)
+    return scene.add("rects", x0=x0, x1=x1, y0=y0, y1=y1, **kwargs)
+
+
+def _segments(scene, orient, pos0, pos1, val0, val1, **kwargs):
+    x0, y0 = _orient(orient, pos0, val0)
+    x1, y1 = _orient(orient, pos1, val1)
+    return scene.add("segments", x0=x0, x1=x1, y0=y0, y1=y1, **kwargs)
+
+
+def _categorical_scene(orient, order, group, value):
+    ticks = (np.arange(len(order)), order)
+    if orient == "v": return Scene(xlabel=group or "", ylabel=value or "", xticks=ticks)
+    return Scene(xlabel=value or "", ylabel=group or "", yticks=ticks)
+
+
+def bars(ci, group, value, hue=None, color=None, saturation=0.75, width=0.8):
+    """Scene with the bars and the error bars of the :class:`GroupedCI` `ci`."""
+    order = ci.order if ci.order is not None else [""]
+    ng, nh = ci.est.shape
+    colors = _palette(ng, nh, hue, color, saturation)
+    pos = ci.positions(width=width, dodge=True)
+    half = width / nh / 2
+    scene = _categorical_scene(ci.orient, order, group, value)
+    for h in range(nh):
+        label = ci.hue_order[h] if ci.hue_order is not None else None
+        if hue is None and color is None:
+            # One color per category.
+            for g in range(ng):
+                _rects(scene, ci.orient, pos[g:g + 1, h] - half, pos[g:g + 1, h] + half, [0], ci.est[g:g + 1, h],
+                       color=colors[g][0], value=ci.est[g:g + 1, h])
+        else:
+            _rects(scene, ci.orient, pos[:, h] - half, pos[:, h] + half, np.zeros(ng), ci.est[:, h],
+                   label=label, color=colors[0][h], value=ci.est[:, h])
+    ok = np.isfinite(ci.lo) & np.isfinite(ci.hi)
+    if ok.any():
+        _segments(scene, ci.orient, pos[ok], pos[ok], ci.lo[ok], ci.hi[ok], color=".26", meta=dict(linewidth=2.5))
+    return scene
+
+
+def boxes(vs, hue=None, color=None, saturation=0.75, width=0.8):
+    """Scene with the boxes and the whiskers computed by :class:`ViolinStats` `vs`."""
+    ng, nh = len(vs.order), len(vs.hue_order)
+    colors = _palette(ng, nh, hue, color, saturation)
+    scene = _categorical_scene(vs.orient, vs.order, vs.group, vs.value)
+    half = width / nh / 2
+    pos = lambda g, h: g + (-width / 2 + width / nh * (h + 0.5) if nh > 1 else 0)
+    for (g, h), c in vs.curves.items():
+        p = pos(g, h)
+        q25, q50, q75 = c["quartiles"]
+        label = vs.hue_order[h] if hue is not None else None
+        _rects(scene, vs.orient, [p - half * 0.9], [p + half * 0.9], [q25], [q75], label=label, color=colors[g][h],
+               value=[q50], meta=dict(edgecolor="#424242"))
+        lo, hi = c["whiskers"]
+        _segments(scene, vs.orient, [p, p, p - half * 0.9], [p, p, p + half * 0.9], [lo, q75, q50], [q25, hi, q50],
+                  color=".26")
+    return scene
+
+
+def violins(vs, hue=None, color=None, saturation=0.75, width=0.8, scale="area"):
+    """Scene with the densities of :class:`ViolinStats` `vs` drawn as polygons."""
+    curves = vs.curves
+    ng, nh = len(vs.order), len(vs.hue_order)
+    colors = _palette(ng, nh, hue, color, saturation)
+    scene = _categorical_scene(vs.orient, vs.order, vs.group, vs.value)
+    if not curves: return scene
+    dmax = max(c["density"].max() for c in curves.values())
+    nmax = max(c["n"] for c in curves.values())
+    half = width / 2 / nh
+    for (g, h), c in curves.items():
+        p = g + (-width / 2 + width / nh * (h + 0.5) if nh > 1 else 0)
+        norm = {"area": dmax, "count": c["density"].max() * nmax / c["n"], "width": c["density"].max()}[scale]
+        hw = c["density"] / norm * half if norm > 0 else c["density"] * 0
+        pos = np.r_[p - hw, (p + hw)[::-1]]
+        val = np.r_[c["support"], c["support"][::-1]]
+        x, y = _orient(vs.orient, pos, val)
+        scene.add("polygons", label=vs.hue_order[h] if hue is not None else None, color=colors[g][h],
+                  x=x, y=y, starts=[0], meta=dict(edgecolor="#424242"))
+        q25, q50, q75 = c["quartiles"]
+        _segments(scene, vs.orient, [p, p - half / 4], [p, p + half / 4], [q25, q50], [q75, q50], color=".26",
+                  meta=dict(linewidth=3))
+    return scene
+
+
+def series(frame, x=None, xlabel="", ylabel="", kind="line"):
+    """Scene with one line (or set of points) per column of `frame` versus the index (or the column `x`)."""
+    import matplotlib as mpl
+    from df_widgets.decimate import _as_float
+    cycle = mpl.rcParams["axes.prop_cycle"].by_key()["color"]
+    xs = _as_float(frame[x]) if x is not None else _as_float(frame.index.to_series())
+    scene = Scene(xlabel=xlabel or (x or frame.index.name or ""), ylabel=ylabel)
+    columns = [c for c in frame.columns if c != x]
+    for i, c in enumerate(columns):
+        scene.add("lines" if kind == "line" else "points", label=c if len(columns) > 1 else None,
+                  color=cycle[i % len(cycle)], x=xs, y=_as_float(frame[c]))
+    return scene
+
+
+def histogram(edges, counts, xlabel=""):
+    """Scene with the histograms `counts` (dictionary name --> counts) with common `edges`."""
+    import matplotlib as mpl
+    cycle = mpl.rcParams["axes.prop_cycle"].by_key()["color"]
+    scene = Scene(xlabel=xlabel, ylabel="Frequency")
+    for i, (name, n) in enumerate(counts.items()):
+        scene.add("rects", label=name if len(counts) > 1 else None, color=mpl.colors.to_rgba(cycle[i % len(cycle)]),
+                  x0=edges[:-1], x1=edges[1:], y0=np.zeros(len(n)), y1=n, value=n)
+    return scene
+
+
+def image(values, extent, cmap="viridis", xlabel="", ylabel="", vmin=None, vmax=None):
+    """Scene with the 2D array `values` (row 0 at the bottom) covering `extent` (x0, x1, y0, y1)."""
+    import matplotlib.pyplot as plt
+    finite = values[np.isfinite(values)]
+    vmin = float(finite.min()) if vmin is None and finite.size else (vmin or 0.0)
+    vmax = float(finite.max()) if vmax is None and finite.size else (vmax or 1.0)
+    lut = plt.get_cmap(cmap)(np.linspace(0, 1, 256))[:, :3]
+    scene = Scene(xlabel=xlabel, ylabel=ylabel)
+    scene.add("image", values=values, lut=lut.ravel(),
+              meta=dict(extent=[float(e) for e in extent], vmin=vmin, vmax=vmax))
+    return scene
@@ -0,0 +1,197 @@
+# coding: utf-8
+"""
+Hierarchical clustering for clustermap.
+
+Linkage matrices are cached with the fingerprint of the data and the clustering options
+so that seaborn receives them via `row_linkage`/`col_linkage` and only draws the figure.
+Large frames can be clustered on a random subsample: the remaining rows are assigned
+to the nearest row of the sample and merged with it at distance zero so that the final linkage
+still has one leaf per row. For the euclidean, cosine and correlation metrics the nearest rows are found
+with float32 matrix products computed in chunks. The linkage of the sample (or of all the rows) is computed
+by scipy from the condensed float64 distance matrix (8 * n**2 / 2 bytes): clustering all the rows is limited
+to MAX_FULL_ROWS rows, larger frames are clustered on a subsample of MAX_FULL_ROWS rows.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import warnings
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+METHODS = ["average", "single", "complete", "weighted", "centroid", "median", "ward"]
+METRICS = ["euclidean", "cityblock", "cosine", "correlation", "chebyshev"]
+
+# Max number of rows clustered with the full distance matrix (about 1.6 GB in float64).
+MAX_FULL_ROWS = 20000
+
+# Max size in bytes of the blocks of the distance matrix used to assign the rows to the sample.
+CHUNK_BYTES = 64 * 1024 ** 2
+
+# Metrics for which the nearest row is found with float32 matrix products.
+_DOT_METRICS = ("euclidean", "cosine", "correlation")
+
+
+def standardize(values, z_score=None, standard_scale=None):
+    """
+    Apply the normalization of seaborn.clustermap to the 2D array `values`.
+    0 normalizes the rows, 1 the columns.
+    """
+    if z_score is not None and standard_scale is not None:
+        raise ValueError("Cannot perform both z-scoring and standard-scaling on data")
+    values = np.asarray(values, dtype=float)
+    for axis, func in ((z_score, "z"), (standard_scale, "s")):
+        if axis is None: continue
+        v = values if axis == 1 else values.T
+        if func == "z":
+            v = (v - v.mean(axis=0)) / v.std(axis=0, ddof=1)
+        else:
+            vmin = v.min(axis=0)
+            v = (v - vmin) / (v.max(axis=0) - vmin)
+        values = v if axis == 1 else v.T
+    return values
+
+
+def _normalize_rows(values):
+    norm = np.sqrt(np.einsum("ij,ij->i", values, values))
+    return values / np.where(norm > 0, norm, 1)[:, None]
+
+
+@tm.timed("stats")
+def nearest(X, sample, metric="euclidean"):
+    """
+    Index of the nearest row of `sample` for each row of `X`.
+    Distances are computed in blocks of rows so that the temporary matrix has at most CHUNK_BYTES.
+    euclidean, cosine and correlation use float32 matrix products:
+    argmin |x - s|^2 = argmin |s|^2 - 2 x.s and argmin (1 - cos) = argmax x.s for normalized rows.
+    The other metrics use `scipy.spatial.distance.cdist` (float64).
+    """
+    X, sample = np.asarray(X, dtype=float), np.asarray(sample, dtype=float)
+    out = np.empty(len(X), dtype=np.int64)
+    if metric not in _DOT_METRICS:
+        from scipy.spatial.distance import cdist
+        step = max(1, CHUNK_BYTES // (8 * max(len(sample), 1)))
+        for start in range(0, len(X), step):
+            out[start:start + step] = cdist(X[start:start + step], sample, metric=metric).argmin(axis=1)
+        return out
+
+    with tm.phase("prepare"):
+        if metric == "euclidean":
+            # Centering does not change the distances and reduces the cancellation in float32.
+            center = sample.mean(axis=0)
+            X, sample = X - center, sample - center
+        else:
+            if metric == "correlation":
+                X = X - X.mean(axis=1, keepdims=True)
+                sample = sample - sample.mean(axis=1, keepdims=True)
+            X, sample = _normalize_rows(X), _normalize_rows(sample)
+        X, sample = X.astype(np.float32), sample.astype(np.float32)
+        sq = np.einsum("ij,ij->i", sample, sample)
+    step = max(1, CHUNK_BYTES // (4 * max(len(sample), 1)))
+    for start in range(0, len(X), step):
+        dots = np.dot(X[start:start + step], sample.T)
+        if metric == "euclidean":
+            dots *= -2
+            dots += sq
+            out[start:start + step] = dots.argmin(axis=1)
+        else:
+            out[start:start + step] = dots.argmax(axis=1)
+    return out
+
+
+def expand_linkage(Z_sample, sample, assign, n):
+    """
+    Build the linkage of `n` leaves from the linkage `Z_sample` of the rows `sample`.
+    `assign[i]` is the position in `sample` of the representative of the row `other[i]`
+    where `other` are the rows not in the sample (sorted).
+    The rows of each representative are merged at distance zero before the merges of `Z_sample`.
+    """
+    k = len(sample)
+    other = np.setdiff1d(np.arange(n), sample)
+    order = np.argsort(assign, kind="mergesort")
+    reps, members = assign[order], other[order]
+
+    # Chain merges: (previous group, member) for the members of each representative.
+    m = len(members)
+    steps = np.arange(m)
+    first = np.r_[True, reps[1:] != reps[:-1]] if m else np.zeros(0, dtype=bool)
+    prev = np.where(first, sample[reps], n + steps - 1)
+    group_start = np.maximum.accumulate(np.where(first, steps, 0)) if m else steps
+    chain = np.column_stack([prev, members, np.zeros(m), steps - group_start + 2]).astype(float)
+
+    # Id of the group of each sample leaf: last chain merge or the leaf itself.
+    leaf_ids = sample.astype(np.int64).copy()
+    if m:
+        last = np.r_[reps[1:] != reps[:-1], True]
+        leaf_ids[reps[last]] = n + steps[last]
+    counts = np.ones(k, dtype=np.int64)
+    if m: counts += np.bincount(assign, minlength=k)
+
+    top = np.array(Z_sample, dtype=float)
+    sizes = list(counts)
+    for i, (a, b) in enumerate(top[:, :2].astype(np.int64)):
+        ids = []
+        for j in (a, b):
+            ids.append(leaf_ids[j] if j < k else n + m + (j - k))
+        top[i, 0], top[i, 1] = ids
+        sizes.append(sizes[a] + sizes[b])
+        top[i, 3] = sizes[-1]
+
+    return np.vstack([chain, top]) if m else top
+
+
+# Cache (fingerprint, options) --> linkage matrix
+_LINKAGES = OrderedDict()
+_MAX_LINKAGES = 32
+
+
+@tm.timed("stats")
+def _compute_linkage(values, method, metric, max_rows, seed):
+    from scipy.cluster import hierarchy
+    from scipy.spatial.distance import pdist
+    n = len(values)
+    if max_rows is None or n <= max_rows:
+        return hierarchy.linkage(pdist(values, metric=metric), method=method)
+
+    rng = np.random.RandomState(seed)
+    sample = np.sort(rng.choice(n, size=max_rows, replace=False))
+    Z_sample = hierarchy.linkage(pdist(values[sample], metric=metric), method=method)
+    mask = np.ones(n, dtype=bool)
+    mask[sample] = False
+    assign = nearest(values[mask], values[sample], metric=metric)
+    return expand_linkage(Z_sample, sample, assign, n)
+
+
+def linkage(data, axis=0, method="average", metric="euclidean", z_score=None, standard_scale=None,
+            max_rows=None, seed=0):
+    """
+    Linkage matrix of the rows (axis=0) or of the columns (axis=1) of the numeric DataFrame `data`.
+
+    Args:
+        method, metric: Passed to scipy.
+        z_score, standard_scale: Normalization applied by seaborn.clustermap (0 for rows, 1 for columns).
+        max_rows: Cluster a random subsample with at most `max_rows` rows and assign the others
+            to the nearest row of the sample. None to cluster all the rows (at most MAX_FULL_ROWS,
+            larger frames are subsampled with a warning).
+
+    Results are cached with the fingerprint of `data` and the options.
+    """
+    from df_widgets.render import fingerprint
+    n = data.shape[axis]
+    if n > MAX_FULL_ROWS and (max_rows is None or max_rows > MAX_FULL_ROWS):
+        warnings.warn("Clustering %d rows requires a %.1f GB distance matrix: using a subsample of %d rows." % (
+                      n, 4e-9 * n * n, MAX_FULL_ROWS))
+        max_rows = MAX_FULL_ROWS
+    key = (fingerprint(data), axis, method, metric, z_score, standard_scale, max_rows, seed)
+    Z = _LINKAGES.get(key)
+    if Z is None:
+        with tm.phase("prepare"):
+            values = standardize(data.values, z_score=z_score, standard_scale=standard_scale)
+            if axis == 1: values = values.T
+        Z = _compute_linkage(values, method, metric, max_rows, seed)
+        _LINKAGES[key] = Z
+        while len(_LINKAGES) > _MAX_LINKAGES:
+            _LINKAGES.popitem(last=False)
+    else:
+        _LINKAGES.move_to_end(key)
+    return Z
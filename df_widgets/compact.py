@@ -0,0 +1,109 @@
+# coding: utf-8
+"""
+Column projection and compact dtypes.
+
+The plotting functions only receive the columns referenced by the widget. In the projected view
+low-cardinality object columns are converted to `category` (the categories keep the order of appearance
+so that seaborn draws the levels in the same order) and numeric columns are downcast when the conversion
+is exact. Views are cached per (fingerprint of the frame, columns) and `report()` gives the memory saved.
+Views of data sources are not cached: they hold references to the loaded columns and would keep them
+alive after their eviction from the cache of the source (bounded by `DataSource.cache_bytes`).
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Object columns are converted to category if the number of levels is below this fraction of the rows.
+CATEGORY_MAX_FRACTION = 0.5
+
+# Cache (fingerprint, columns) --> (view, report)
+_VIEWS = OrderedDict()
+_MAX_VIEWS = 16
+
+
+def compact_column(s, cardinality=None):
+    """
+    Return Series with compact dtype. `cardinality` is the number of distinct values
+    (computed if None). Integers are downcast, floats are converted to float32 only if exact.
+    """
+    import pandas as pd
+    if pd.api.types.is_bool_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if pd.api.types.is_integer_dtype(s):
+        return pd.to_numeric(s, downcast="integer")
+    if pd.api.types.is_float_dtype(s):
+        if s.dtype == np.float32: return s
+        values = s.values
+        f32 = values.astype(np.float32)
+        with np.errstate(over="ignore", invalid="ignore"):
+            exact = np.array_equal(f32.astype(values.dtype), values, equal_nan=True)
+        return pd.Series(f32, index=s.index, name=s.name) if exact else s
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        if cardinality is None: cardinality = s.nunique(dropna=True)
+        if cardinality < CATEGORY_MAX_FRACTION * len(s):
+            return pd.Series(pd.Categorical(s, categories=pd.unique(s.dropna())), index=s.index, name=s.name)
+    return s
+
+
+def compact(data, *columns):
+    """
+    Return DataFrame with the columns of `data` referenced by the widget (None entries are ignored)
+    converted to compact dtypes. Return `data` if no column is given.
+    Only the referenced columns are read from data sources (all the columns if no column is given).
+    In the renders of the widgets, the rows are restricted to the selection of the other widgets.
+    """
+    from df_widgets.render import fingerprint
+    from df_widgets.schema import profile
+    from df_widgets.sources import is_source
+    from df_widgets.selection import filter_frame
+    cols = []
+    for c in columns:
+        if c is not None and c not in cols: cols.append(c)
+    if not cols: return filter_frame(data, data.load() if is_source(data) else data)
+
+    key = (fingerprint(data), tuple(cols))
+    entry = _VIEWS.get(key)
+    if entry is not None:
+        _VIEWS.move_to_end(key)
+        return filter_frame(data, entry[0], cols)
+
+    with tm.phase("prepare"):
+        prof = profile(data)
+        projected = data[cols]
+        view = projected.copy(deep=False)
+        for c in cols:
+            card = prof.loc[c, "cardinality"] if c in prof.index else None
+            if card is not None and np.isnan(card): card = None
+            view[c] = compact_column(projected[c], cardinality=card)
+
+        # The size of the full frame is not known without reading the data source.
+        frame_nbytes = None if is_source(data) else int(data.memory_usage(index=False, deep=False).sum())
+        before = int(projected.memory_usage(index=False, deep=True).sum())
+        after = int(view.memory_usage(index=False, deep=True).sum())
+        rep = OrderedDict([
+            ("columns", ", ".join(str(c) for c in cols)),
+            ("frame_ncols", data.shape[1]),
+            ("frame_nbytes", frame_nbytes),
+            ("before", before),
+            ("after", after),
+            ("saved", before - after),
+        ])
+
+    if not is_source(data):
+        _VIEWS[key] = (view, rep)
+        while len(_VIEWS) > _MAX_VIEWS:
+            _VIEWS.popitem(last=False)
+    return filter_frame(data, view, cols)
+
+
+def report():
+    """
+    DataFrame with the cached views: columns, number of columns and (shallow) size of the full frame,
+    size in bytes of the projected columns before and after the conversion and memory saved.
+    """
+    import pandas as pd
+    return pd.DataFrame([rep for _, rep in _VIEWS.values()],
+                        columns=["columns", "frame_ncols", "frame_nbytes", "before", "after", "saved"])
@@ -0,0 +1,172 @@
+# coding: utf-8
+"""
+Point-count-aware downsampling of DataFrames before plotting.
+A line plot of 10M rows rasterizes to ~1000 pixel columns so we can keep
+only the points that are visible at the resolution of the figure.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+import df_widgets.timing as tm
+
+from functools import reduce
+
+
+def point_budget(figsize=None, dpi=None, points_per_pixel=2):
+    """
+    Target number of points derived from the width of the figure in pixels.
+    Use matplotlib rcParams if `figsize` or `dpi` are None.
+    """
+    import matplotlib as mpl
+    if figsize is None: figsize = mpl.rcParams["figure.figsize"]
+    if dpi is None: dpi = mpl.rcParams["figure.dpi"]
+    return int(figsize[0] * dpi * points_per_pixel)
+
+
+def _as_float(values):
+    """Convert pandas Series/Index to float array. Datetimes are converted to ns, non-numeric values to positions."""
+    import pandas as pd
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return np.asarray(values.values.astype("datetime64[ns]").astype(np.int64), dtype=float)
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.arange(len(values), dtype=float)
+
+
+def _bucket_edges(n, nbuckets):
+    """Start indices of `nbuckets` contiguous buckets covering range(n)."""
+    return np.unique(np.linspace(0, n, nbuckets + 1).astype(np.int64)[:-1])
+
+
+def _first_in_bucket(mask, bucket_ids):
+    """Index of the first True entry of `mask` in each bucket."""
+    pos = np.flatnonzero(mask)
+    _, first = np.unique(bucket_ids[pos], return_index=True)
+    return pos[first]
+
+
+def minmax_indices(y, nbuckets):
+    """
+    Indices of the min and max of `y` in each of the `nbuckets` buckets (plus first and last point).
+    Returns sorted array with at most 2 * nbuckets + 2 indices.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * nbuckets: return np.arange(n)
+    starts = _bucket_edges(n, nbuckets)
+    bucket_ids = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    # fmin/fmax ignore NaNs. All-NaN buckets do not contribute.
+    ymin = np.fmin.reduceat(y, starts)[bucket_ids]
+    ymax = np.fmax.reduceat(y, starts)[bucket_ids]
+    idx = np.concatenate([_first_in_bucket(y == ymin, bucket_ids),
+                          _first_in_bucket(y == ymax, bucket_ids), [0, n - 1]])
+    return np.unique(idx)
+
+
+def lttb_indices(x, y, nout):
+    """
+    Largest-triangle-three-buckets downsampling. Returns sorted array with `nout` indices at most.
+
+    The first and last points are always selected, the others are divided in `nout - 2` buckets
+    and, for each bucket, we select the point forming the largest triangle with the average points
+    of the previous and the next bucket. Using the average of the previous bucket instead of the
+    point selected at the previous step allows us to process all buckets in a single vectorized pass.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(y)
+    if nout >= n or nout < 3: return np.arange(n)
+
+    starts = 1 + _bucket_edges(n - 2, nout - 2)
+    sizes = np.diff(np.append(starts, n - 1))
+    bucket_ids = np.repeat(np.arange(len(starts)), sizes)
+    inner = slice(1, n - 1)
+    with np.errstate(invalid="ignore"):
+        xm = np.add.reduceat(x[inner], starts - 1) / sizes
+        ym = np.add.reduceat(y[inner], starts - 1) / sizes
+    # Anchors: previous bucket (first point for the first bucket) and next bucket (last point for the last one).
+    ax, ay = np.append(x[0], xm[:-1])[bucket_ids], np.append(y[0], ym[:-1])[bucket_ids]
+    cx, cy = np.append(xm[1:], x[-1])[bucket_ids], np.append(ym[1:], y[-1])[bucket_ids]
+    area = np.abs((ax - cx) * (y[inner] - ay) - (ax - x[inner]) * (cy - ay))
+    amax = np.fmax.reduceat(area, starts - 1)[bucket_ids]
+    idx = 1 + _first_in_bucket(area == amax, bucket_ids)
+
+    return np.concatenate([[0], idx, [n - 1]])
+
+
+def _bin_codes(values, nbins):
+    """Assign each value to one of `nbins` equally-spaced bins. Non finite values go to the first bin."""
+    finite = np.isfinite(values)
+    if not finite.any(): return np.zeros(len(values), dtype=np.int64)
+    lo, hi = values[finite].min(), values[finite].max()
+    if hi == lo: return np.zeros(len(values), dtype=np.int64)
+    codes = np.floor((np.where(finite, values, lo) - lo) / (hi - lo) * nbins)
+    return np.clip(codes, 0, nbins - 1).astype(np.int64)
+
+
+def stratified_indices(x, y, nout, nbins=32, seed=0):
+    """
+    Stratified sampling for scatter plots. The x-y plane is divided in nbins x nbins cells
+    and each cell keeps a random subset of points proportional to its population.
+    The first point of each non-empty cell is always kept so that outliers remain visible.
+    A fixed `seed` is used so that redraws with the same parameters are identical.
+    Returns sorted array of indices.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(x)
+    if nout >= n: return np.arange(n)
+
+    cells = _bin_codes(x, nbins) * nbins + _bin_codes(y, nbins)
+    ncells = nbins * nbins
+    occupied = np.bincount(cells, minlength=ncells) > 0
+    # Same probability for all points (discounting the points that are always kept).
+    prob = max(nout - occupied.sum(), 0) / n
+
+    rng = np.random.RandomState(seed)
+    keep = rng.random_sample(n) < prob
+    # Assignment in reverse order: the last write wins so we get the first index of each cell.
+    first = np.empty(ncells, dtype=np.int64)
+    first[cells[::-1]] = np.arange(n - 1, -1, -1)
+    keep[first[occupied]] = True
+
+    return np.flatnonzero(keep)
+
+
+@tm.timed("prepare")
+def decimate_frame(data, x, y, kind, method, budget):
+    """
+    Downsample DataFrame `data` before calling `data.plot(x=x, y=y, kind=kind)`.
+
+    Args:
+        method: "minmax" or "lttb" for line and area plots. Scatter plots always use stratified sampling.
+        budget: Target number of points per series.
+
+    Returns: DataFrame with the selected rows (`data` if no downsampling is needed).
+    """
+    n = len(data)
+    if method is None or n <= budget: return data
+
+    if kind == "scatter":
+        if x is None or y is None: return data
+        idx = stratified_indices(_as_float(data[x]), _as_float(data[y]), budget)
+
+    elif kind in ("line", "area"):
+        xs = _as_float(data[x]) if x is not None else _as_float(data.index.to_series())
+        if y is not None:
+            ycols = [y]
+        else:
+            ycols = [c for c in data.select_dtypes(include=[np.number]).columns if c != x]
+        if not ycols: return data
+
+        if method == "lttb":
+            indices = [lttb_indices(xs, _as_float(data[c]), budget) for c in ycols]
+        elif method == "minmax":
+            indices = [minmax_indices(_as_float(data[c]), budget // 2) for c in ycols]
+        else:
+            raise ValueError("Invalid downsampling method: %s" % str(method))
+        idx = reduce(np.union1d, indices)
+
+    else:
+        return data
+
+    return data.iloc[idx]
@@ -0,0 +1,196 @@
+# coding: utf-8
+"""
+Output pipeline of the widgets: image format, resolution and encoding.
+
+Raster formats (png, jpeg, webp) are encoded from the pixels of the Agg canvas: the figure is drawn once
+on the render thread, the RGBA buffer (cropped to the tight bounding box) is copied and compressed with
+Pillow on a separate encoder thread so that the render thread can process the next request.
+The DPI is chosen from the width of the output in pixels. For vector formats (svg), the collections
+and lines with many elements are rasterized so that the payload does not contain millions of paths.
+
+Usage:
+
+    from df_widgets.encoding import pipeline
+    pipeline.fmt, pipeline.width = "webp", 900
+    display(pipeline.controls())
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import io
+import threading
+import numpy as np
+import df_widgets.timing as tm
+
+FORMATS = ["png", "jpeg", "webp", "svg"]
+VECTOR_FORMATS = ("svg", "pdf")
+
+# Collections and lines with at least this number of elements are rasterized in vector output.
+RASTERIZE_MIN_ELEMENTS = 2000
+
+
+class OutputPipeline(object):
+    """
+    Encoding options used by the widgets.
+
+    Args:
+        fmt: Image format (png, jpeg, webp, svg).
+        width: Width of the output in CSS pixels. The DPI is chosen so that the image has `width * scale`
+            pixels and the image is displayed with this width. None to use the DPI of the figure.
+        scale: Pixel density of the display (2 for HiDPI screens).
+        quality: Quality of jpeg and webp images (1-100).
+        rasterize_min: Min number of elements of the artists rasterized in vector output. None to disable.
+        threaded: Encode on the encoder thread when the widgets are rendered in background.
+    """
+
+    def __init__(self, fmt="png", width=None, scale=1, quality=85, min_dpi=40, max_dpi=300,
+                 rasterize_min=RASTERIZE_MIN_ELEMENTS, threaded=True):
+        self.fmt = fmt
+        self.width = width
+        self.scale = scale
+        self.quality = quality
+        self.min_dpi, self.max_dpi = min_dpi, max_dpi
+        self.rasterize_min = rasterize_min
+        self.threaded = threaded
+
+    def key(self):
+        """Options that change the payload (used in the key of the render cache)."""
+        return (self.fmt, self.width, self.scale, self.quality, self.rasterize_min)
+
+    def dpi(self, fig):
+        """DPI of `fig` for the output width. None if width is not set."""
+        if self.width is None: return None
+        return float(np.clip(self.width * self.scale / fig.get_figwidth(), self.min_dpi, self.max_dpi))
+
+    def controls(self):
+        """Widgets to change the format, width and quality."""
+        import ipywidgets as ipw
+        fmt = ipw.Dropdown(options=FORMATS, value=self.fmt, description="format")
+        width = ipw.IntSlider(value=self.width or 0, min=0, max=2000, step=50, description="width",
+                              tooltip="0 for the DPI of the figure")
+        quality = ipw.IntSlider(value=self.quality, min=10, max=100, step=5, description="quality")
+        fmt.observe(lambda change: setattr(self, "fmt", change["new"]), names="value")
+        width.observe(lambda change: setattr(self, "width", change["new"] or None), names="value")
+        quality.observe(lambda change: setattr(self, "quality", change["new"]), names="value")
+        return ipw.HBox(children=[fmt, width, quality])
+
+
+# Global pipeline used by the widgets.
+pipeline = OutputPipeline()
+
+
+def count_elements(artist):
+    """Number of markers/paths/vertices drawn by a collection or a line."""
+    from matplotlib.collections import Collection
+    from matplotlib.lines import Line2D
+    if isinstance(artist, Collection):
+        return max(len(artist.get_offsets()), len(artist.get_paths()))
+    if isinstance(artist, Line2D):
+        return len(artist.get_xydata())
+    return 0
+
+
+def rasterize_heavy(fig, min_elements=RASTERIZE_MIN_ELEMENTS):
+    """Call `set_rasterized(True)` on the collections and lines of `fig` with many elements. Return the count."""
+    count = 0
+    for ax in fig.axes:
+        for artist in list(ax.collections) + list(ax.lines):
+            if count_elements(artist) >= min_elements:
+                artist.set_rasterized(True)
+                count += 1
+    return count
+
+
+class Frame(object):
+    """
+    Output captured from a figure on the render thread: RGBA pixels to be compressed
+    or `data` already encoded (vector formats or figures that cannot be captured from the canvas).
+    """
+
+    def __init__(self, fmt, rgba=None, data=None, quality=85):
+        self.fmt, self.rgba, self.data, self.quality = fmt, rgba, data, quality
+
+
+def _savefig(fig, fmt, dpi, quality):
+    buf = io.BytesIO()
+    kwargs = dict(pil_kwargs={"quality": quality}) if fmt in ("jpeg", "webp") else {}
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight", **kwargs)
+    return buf.getvalue()
+
+
+def capture(fig, options=None, fmt=None):
+    """
+    Draw `fig` and return :class:`Frame`. Must be called on the thread that owns the figure.
+    The pixels are cropped to the tight bounding box (with the padding used by savefig).
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    options = options or pipeline
+    fmt = fmt or options.fmt
+    dpi = options.dpi(fig)
+
+    if fmt in VECTOR_FORMATS:
+        if options.rasterize_min is not None: rasterize_heavy(fig, options.rasterize_min)
+        with tm.phase("encode"):
+            return Frame(fmt, data=_savefig(fig, fmt, dpi, options.quality))
+
+    if dpi is not None: fig.set_dpi(dpi)
+    canvas = fig.canvas
+    with tm.phase("draw"):
+        if not isinstance(canvas, FigureCanvasAgg):
+            return Frame(fmt, data=_savefig(fig, fmt, dpi, options.quality))
+        canvas.draw()
+        renderer = canvas.get_renderer()
+        bbox = fig.get_tightbbox(renderer).padded(0.1)
+        rgba = np.asarray(canvas.buffer_rgba())
+        height, width = rgba.shape[:2]
+        d = fig.dpi
+        x0, x1 = int(np.floor(bbox.x0 * d)), int(np.ceil(bbox.x1 * d))
+        y0, y1 = height - int(np.ceil(bbox.y1 * d)), height - int(np.floor(bbox.y0 * d))
+        if x0 < 0 or y0 < 0 or x1 > width or y1 > height:
+            # Artists outside the figure: savefig enlarges the canvas.
+            return Frame(fmt, data=_savefig(fig, fmt, dpi, options.quality))
+        return Frame(fmt, rgba=rgba[y0:y1, x0:x1].copy(), quality=options.quality)
+
+
+def encode(frame):
+    """Return the bytes of the image. Pixels are compressed with Pillow (this releases the GIL)."""
+    if frame.data is not None: return frame.data
+    from PIL import Image
+    image = Image.fromarray(frame.rgba, mode="RGBA")
+    kwargs = {}
+    if frame.fmt == "jpeg":
+        # No alpha channel in jpeg: composite on white.
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[3])
+        image = background
+        kwargs = dict(quality=frame.quality)
+    elif frame.fmt == "webp":
+        kwargs = dict(quality=frame.quality)
+    elif frame.fmt == "png":
+        kwargs = dict(compress_level=6)
+    buf = io.BytesIO()
+    image.save(buf, format=frame.fmt.upper(), **kwargs)
+    return buf.getvalue()
+
+
+class Encoder(object):
+    """Single thread compressing the frames captured by the render thread."""
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """Execute `func(*args)` on the encoder thread. Return Future."""
+        from concurrent.futures import ThreadPoolExecutor
+        with self._lock:
+            if self._pool is None: self._pool = ThreadPoolExecutor(max_workers=1)
+            return self._pool.submit(func, *args)
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+# Global encoder used by the widgets.
+encoder = Encoder()
@@ -0,0 +1,140 @@
+# coding: utf-8
+"""
+Facet statistics computed in parallel.
+
+The rows of each facet of a row/col grid are found once with a stable sort of the combined
+category codes (the partition is cached with the fingerprint of the data). The statistics
+of the facets (bootstrap regression bands, estimates and confidence intervals) are then computed
+with a pool of threads (the heavy parts are NumPy operations that release the GIL) and
+drawn on the axes of the FacetGrid built by seaborn with the same row/col/hue order.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Cache (fingerprint, row, col) --> FacetPartition
+_PARTITIONS = OrderedDict()
+_MAX_PARTITIONS = 16
+
+
+class FacetPartition(object):
+    """
+    Rows of the facets of a grid.
+    `indices[(i, j)]` are the positions of the rows in the facet with row level i and col level j.
+    `row_order` and `col_order` are [None] if the variable is not used.
+    """
+
+    @tm.timed("prepare")
+    def __init__(self, data, row=None, col=None):
+        from df_widgets.stats import categorical_order
+        n = len(data)
+        rcodes, self.row_order = categorical_order(data[row]) if row is not None else (np.zeros(n, np.int64), [None])
+        ccodes, self.col_order = categorical_order(data[col]) if col is not None else (np.zeros(n, np.int64), [None])
+        nr, nc = len(self.row_order), len(self.col_order)
+
+        codes = np.where((rcodes >= 0) & (ccodes >= 0), rcodes * nc + ccodes, -1)
+        order = np.argsort(codes, kind="stable")
+        # Rows with missing values are at the beginning of `order`.
+        bounds = np.r_[0, np.cumsum(np.bincount(codes[codes >= 0], minlength=nr * nc))] + np.count_nonzero(codes < 0)
+        self.indices = OrderedDict()
+        for k in range(nr * nc):
+            self.indices[divmod(k, nc)] = order[bounds[k]:bounds[k + 1]]
+
+    @property
+    def shape(self):
+        return len(self.row_order), len(self.col_order)
+
+    def orders(self):
+        """(row_order, col_order) to be passed to seaborn (None if the variable is not used)."""
+        return [o if o != [None] else None for o in (self.row_order, self.col_order)]
+
+
+def partition(data, row=None, col=None):
+    """Return the (cached) :class:`FacetPartition` of `data`."""
+    from df_widgets.render import fingerprint
+    key = (fingerprint(data), row, col)
+    part = _PARTITIONS.get(key)
+    if part is None:
+        part = FacetPartition(data, row=row, col=col)
+        _PARTITIONS[key] = part
+        while len(_PARTITIONS) > _MAX_PARTITIONS:
+            _PARTITIONS.popitem(last=False)
+    else:
+        _PARTITIONS.move_to_end(key)
+    return part
+
+
+def map_tasks(func, tasks, nprocs=None):
+    """Return list with `func(task)` for all the tasks computed with a pool of threads."""
+    from concurrent.futures import ThreadPoolExecutor
+    tasks = list(tasks)
+    nprocs = min(nprocs or os.cpu_count() or 1, max(len(tasks), 1))
+    if nprocs == 1: return [func(t) for t in tasks]
+    with ThreadPoolExecutor(max_workers=nprocs) as pool:
+        return list(pool.map(func, tasks))
+
+
+@tm.timed("stats")
+def regression_bands(data, x, y, grid, part, hue=None, n_boot=1000, ci=95, nprocs=None):
+    """
+    Bootstrap confidence bands of the linear regression for each facet and hue level evaluated on `grid`.
+    Returns: (hue_order, dictionary (i, j, h) --> (lo, hi)).
+    """
+    from df_widgets.stats import bootstrap_linregress, categorical_order
+    xv, yv = np.asarray(data[x], dtype=float), np.asarray(data[y], dtype=float)
+    hcodes, hue_order = categorical_order(data[hue]) if hue is not None else (np.zeros(len(data), np.int64), [None])
+
+    def band(task):
+        i, j, h = task
+        idx = part.indices[(i, j)]
+        idx = idx[hcodes[idx] == h]
+        _, lo, hi = bootstrap_linregress(xv[idx], yv[idx], grid, n_boot=n_boot, ci=ci)
+        return lo, hi
+
+    tasks = [(i, j, h) for (i, j) in part.indices for h in range(len(hue_order))]
+    return hue_order, OrderedDict(zip(tasks, map_tasks(band, tasks, nprocs=nprocs)))
+
+
+@tm.timed("stats")
+def grouped_ci(data, x, y, part, hue=None, orient=None, estimator="mean", n_boot=1000, ci=95, nprocs=None):
+    """
+    :class:`GroupedCI` of each facet. The categorical order and the hue order are computed once
+    on the whole frame so that all the facets share the same positions.
+    Returns: dictionary (i, j) --> GroupedCI.
+    """
+    from df_widgets.stats import GroupedCI, bootstrap_groups, categorical_order, infer_orient
+    orient = infer_orient(data, x, y, orient)
+    value, group = (y, x) if orient == "v" else (x, y)
+    n = len(data)
+    gcodes, order = categorical_order(data[group]) if group is not None else (np.zeros(n, np.int64), None)
+    hcodes, hue_order = categorical_order(data[hue]) if hue is not None else (np.zeros(n, np.int64), None)
+    ng, nh = len(order or [None]), len(hue_order or [None])
+    codes = np.where((gcodes >= 0) & (hcodes >= 0), gcodes * nh + hcodes, -1)
+    values = np.asarray(data[value].values)
+
+    def facet(ij):
+        idx = part.indices[ij]
+        est, lo, hi = bootstrap_groups(values[idx], codes[idx], ng * nh, estimator=estimator,
+                                       n_boot=n_boot, ci=ci)
+        return GroupedCI.from_arrays(orient, order, hue_order, est.reshape(ng, nh), lo.reshape(ng, nh),
+                                     hi.reshape(ng, nh))
+
+    keys = list(part.indices.keys())
+    return OrderedDict(zip(keys, map_tasks(facet, keys, nprocs=nprocs)))
+
+
+def facet_axes(g, part):
+    """Dictionary (i, j) --> axes of the FacetGrid `g` built with the row/col order of `part`."""
+    axes = np.asarray(g.axes).reshape(part.shape)
+    return OrderedDict((ij, axes[ij]) for ij in part.indices)
+
+
+def hue_colors(nh):
+    """Default colors of the hue levels with the same rules used by seaborn."""
+    import seaborn as sns
+    current = sns.color_palette()
+    return current[:nh] if nh <= len(current) else sns.color_palette("husl", nh)
@@ -0,0 +1,130 @@
+# coding: utf-8
+"""Lifecycle of the matplotlib figures created by the widgets."""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def live_figures():
+    """List with the figures currently managed by pyplot."""
+    from matplotlib._pylab_helpers import Gcf
+    return [manager.canvas.figure for manager in Gcf.get_all_fig_managers()]
+
+
+def figure_nbytes(fig):
+    """Estimate the memory used by the RGBA buffer of the figure in bytes."""
+    width, height = fig.get_size_inches() * fig.dpi
+    return int(width * height * 4)
+
+
+class FigureManager(object):
+    """
+    Keep track of the figures created by the widgets.
+    Each widget instance (owner) has at most one live figure: the previous figure is reused
+    or closed when the widget renders again. The number of live figures owned by the widgets
+    is bounded by `max_figures`: the figures of the least recently used widgets are closed first.
+    The current owner is thread-local so that widgets can be rendered in background.
+    `_figures` is shared by the threads and protected by a reentrant lock
+    (figure calls register that calls enforce and _prune).
+    """
+
+    def __init__(self, max_figures=20):
+        self.max_figures = max_figures
+        self._figures = OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+    @property
+    def _owner(self):
+        return getattr(self._local, "owner", None)
+
+    @contextmanager
+    def rendering(self, owner):
+        """Context manager used to set the owner of the figures created by :meth:`figure`."""
+        prev, self._local.owner = self._owner, owner
+        try:
+            yield
+        finally:
+            self._local.owner = prev
+
+    def figure(self, **kwargs):
+        """
+        Return empty figure for the current owner. The previous figure of the owner
+        is cleared and reused if still open, a new pyplot figure is created otherwise.
+        """
+        import matplotlib.pyplot as plt
+        with self._lock:
+            fig = self._figures.get(self._owner) if self._owner is not None else None
+            if fig is not None and any(f is fig for f in live_figures()):
+                fig.clf()
+                plt.figure(fig.number)
+            else:
+                fig = plt.figure(**kwargs)
+            self.register(fig)
+        return fig
+
+    def register(self, fig, owner=None):
+        """
+        Register figure `fig` created by `owner` (default: current owner).
+        Close the previous figure of the owner and enforce the maximum number of live figures.
+        """
+        import matplotlib.pyplot as plt
+        owner = self._owner if owner is None else owner
+        with self._lock:
+            if owner is not None:
+                old = self._figures.pop(owner, None)
+                if old is not None and old is not fig: plt.close(old)
+                self._figures[owner] = fig
+            self.enforce()
+
+    def _prune(self):
+        """Remove the entries whose figure has been closed."""
+        alive = live_figures()
+        with self._lock:
+            for owner, fig in list(self._figures.items()):
+                if not any(f is fig for f in alive): del self._figures[owner]
+
+    def enforce(self):
+        """Close the figures of the least recently used widgets if we have more than `max_figures`."""
+        import matplotlib.pyplot as plt
+        with self._lock:
+            self._prune()
+            excess = len(self._figures) - self.max_figures
+            for owner in list(self._figures.keys()):
+                if excess <= 0: break
+                if owner is self._owner: continue
+                plt.close(self._figures.pop(owner))
+                excess -= 1
+
+    def close(self, owner=None):
+        """Close the figure of `owner`. All the managed figures if owner is None."""
+        import matplotlib.pyplot as plt
+        with self._lock:
+            owners = list(self._figures.keys()) if owner is None else [owner]
+            figs = [self._figures.pop(o, None) for o in owners]
+        for fig in figs:
+            if fig is not None: plt.close(fig)
+
+    def stats(self):
+        """Return dictionary with the number of live figures and the memory used by their buffers."""
+        self._prune()
+        alive = live_figures()
+        with self._lock:
+            managed = list(self._figures.values())
+        return OrderedDict([
+            ("live_figures", len(alive)),
+            ("managed_figures", len(managed)),
+            ("max_figures", self.max_figures),
+            ("nbytes", sum(figure_nbytes(f) for f in alive)),
+            ("managed_nbytes", sum(figure_nbytes(f) for f in managed)),
+        ])
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, ", ".join("%s=%s" % kv for kv in self.stats().items()))
+
+
+# Global manager used by the widgets.
+figure_manager = FigureManager()
@@ -0,0 +1,351 @@
+# coding: utf-8
+"""
+Binned kernel density estimation.
+
+The observations are linearly binned on a regular grid and the counts are convolved
+with the Gaussian kernel sampled on the same grid using the FFT so that the cost
+is O(n + grid log grid) instead of the O(n * grid) of the direct evaluation.
+Bandwidths follow the conventions of `scipy.stats.gaussian_kde` used by seaborn and pandas:
+"scott", "silverman" or a number used as scale factor of the standard deviation of the data.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Number of standard deviations of the truncated kernel.
+TRUNCATE = 4.0
+
+
+def bw_factor(n, bw="scott", d=1):
+    """Scale factor of the covariance of the data (same definition as in gaussian_kde)."""
+    if bw == "scott":
+        return n ** (-1. / (d + 4))
+    elif bw == "silverman":
+        return (n * (d + 2) / 4.) ** (-1. / (d + 4))
+    try:
+        return float(bw)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid bw: %s. Use 'scott', 'silverman' or a number" % str(bw))
+
+
+def _linear_binning(pos, ngrid, weights=None):
+    """
+    Spread the observations at fractional grid positions `pos` over the two nearest grid points.
+    Return (left index, weight of left point, weight of right point).
+    """
+    i = np.clip(np.floor(pos).astype(np.int64), 0, ngrid - 2)
+    f = np.clip(pos - i, 0, 1)
+    w = np.ones(len(pos)) if weights is None else weights
+    return i, w * (1 - f), w * f
+
+
+def _fftconvolve(a, kernel):
+    """Convolution of `a` with the centered `kernel` computed with the FFT. Same shape as `a`."""
+    shape = [s + k - 1 for s, k in zip(a.shape, kernel.shape)]
+    fa = np.fft.rfftn(a, shape)
+    fk = np.fft.rfftn(kernel, shape)
+    out = np.fft.irfftn(fa * fk, shape)
+    sl = tuple(slice(k // 2, k // 2 + s) for s, k in zip(a.shape, kernel.shape))
+    return np.maximum(out[sl], 0)
+
+
+def _finite(*arrays):
+    arrays = [np.asarray(a, dtype=float) for a in arrays]
+    mask = np.ones(len(arrays[0]), dtype=bool)
+    for a in arrays: mask &= np.isfinite(a)
+    return [a[mask] for a in arrays]
+
+
+@tm.timed("stats")
+def kde1d(x, bw="scott", gridsize=200, cut=3, clip=None, support=None):
+    """
+    Gaussian KDE of the 1D data `x` evaluated on a regular grid.
+
+    Args:
+        bw: "scott", "silverman" or scale factor.
+        gridsize: Number of points of the grid.
+        cut: The grid extends `cut` bandwidths past the extreme data points.
+        clip: (low, high) limits of the grid.
+        support: (low, high) limits of the grid. Overrides cut and clip.
+
+    Returns: (support, density) arrays.
+    """
+    x, = _finite(x)
+    n = len(x)
+    if n == 0: return np.zeros(0), np.zeros(0)
+    std = x.std(ddof=1) if n > 1 else 0.0
+    sigma = bw_factor(n, bw) * std
+    if not sigma > 0: sigma = 1e-3 * max(1.0, abs(x[0]))
+
+    if support is None:
+        lo, hi = x.min() - cut * sigma, x.max() + cut * sigma
+        if clip is not None: lo, hi = max(lo, clip[0]), min(hi, clip[1])
+    else:
+        lo, hi = support
+    grid = np.linspace(lo, hi, gridsize)
+    delta = grid[1] - grid[0]
+
+    i, wl, wr = _linear_binning((x - lo) / delta, gridsize)
+    counts = np.bincount(i, weights=wl, minlength=gridsize) + np.bincount(i + 1, weights=wr, minlength=gridsize)
+
+    nk = min(gridsize - 1, int(np.ceil(TRUNCATE * sigma / delta)))
+    offsets = np.arange(-nk, nk + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2) / (np.sqrt(2 * np.pi) * sigma)
+    return grid, _fftconvolve(counts, kernel) / n
+
+
+@tm.timed("stats")
+def kde2d(x, y, bw="scott", gridsize=100, cut=3, clip=None):
+    """
+    Gaussian KDE of the 2D data (x, y) with the full covariance of the data as in gaussian_kde.
+
+    Returns: (xgrid, ygrid, z) where z[j, i] is the density at (xgrid[i], ygrid[j]).
+    """
+    x, y = _finite(x, y)
+    n = len(x)
+    if n < 2: return np.zeros(0), np.zeros(0), np.zeros((0, 0))
+    cov = np.cov(x, y) * bw_factor(n, bw, d=2) ** 2
+    sx, sy = np.sqrt(np.diag(cov))
+    if not sx > 0: sx = cov[0, 0] = 1e-3 * max(1.0, abs(x[0]))
+    if not sy > 0: sy = cov[1, 1] = 1e-3 * max(1.0, abs(y[0]))
+
+    limits = []
+    for v, s, c in ((x, sx, 0), (y, sy, 1)):
+        lo, hi = v.min() - cut * s, v.max() + cut * s
+        if clip is not None: lo, hi = max(lo, clip[c][0]), min(hi, clip[c][1])
+        limits.append((lo, hi))
+    xgrid, ygrid = np.linspace(*limits[0], num=gridsize), np.linspace(*limits[1], num=gridsize)
+    dx, dy = xgrid[1] - xgrid[0], ygrid[1] - ygrid[0]
+
+    ix, wxl, wxr = _linear_binning((x - xgrid[0]) / dx, gridsize)
+    iy, wyl, wyr = _linear_binning((y - ygrid[0]) / dy, gridsize)
+    counts = np.zeros(gridsize * gridsize)
+    for jy, wy in ((iy, wyl), (iy + 1, wyr)):
+        for jx, wx in ((ix, wxl), (ix + 1, wxr)):
+            counts += np.bincount(jy * gridsize + jx, weights=wy * wx, minlength=gridsize * gridsize)
+    counts = counts.reshape(gridsize, gridsize)
+
+    nx = min(gridsize - 1, int(np.ceil(TRUNCATE * sx / dx)))
+    ny = min(gridsize - 1, int(np.ceil(TRUNCATE * sy / dy)))
+    ox, oy = np.meshgrid(np.arange(-nx, nx + 1) * dx, np.arange(-ny, ny + 1) * dy)
+    inv = np.linalg.pinv(cov)
+    q = inv[0, 0] * ox ** 2 + 2 * inv[0, 1] * ox * oy + inv[1, 1] * oy ** 2
+    norm = 2 * np.pi * np.sqrt(max(np.linalg.det(cov), 1e-300))
+    kernel = np.exp(-0.5 * q) / norm
+
+    return xgrid, ygrid, _fftconvolve(counts, kernel) / n
+
+
+# Cache (fingerprint, key) --> densities
+_DENSITIES = OrderedDict()
+_MAX_DENSITIES = 64
+
+
+def cached_density(data, key, func):
+    """
+    Return the densities computed by `func()` for `data`.
+    Results are cached with the fingerprint of `data` and `key` (column, group, bandwidth ...).
+    """
+    from df_widgets.render import fingerprint
+    key = (fingerprint(data),) + tuple(key)
+    value = _DENSITIES.get(key)
+    if value is None:
+        value = func()
+        _DENSITIES[key] = value
+        while len(_DENSITIES) > _MAX_DENSITIES:
+            _DENSITIES.popitem(last=False)
+    else:
+        _DENSITIES.move_to_end(key)
+    return value
+
+
+def density_frame(data, columns, bw="scott", gridsize=1000):
+    """
+    DataFrame with the KDE of `columns` on a common support indexed by the grid.
+    The support is the same as the one used by `DataFrame.plot(kind="kde")`.
+    """
+    import pandas as pd
+
+    def compute():
+        values = [np.asarray(data[c], dtype=float) for c in columns]
+        vmin = min(np.nanmin(v) for v in values)
+        vmax = max(np.nanmax(v) for v in values)
+        rng = vmax - vmin
+        support = (vmin - 0.5 * rng, vmax + 0.5 * rng)
+        grid = None
+        dens = OrderedDict()
+        for c, v in zip(columns, values):
+            grid, dens[c] = kde1d(v, bw=bw, gridsize=gridsize, support=support)
+        return pd.DataFrame(dens, index=pd.Index(grid, name=None))
+
+    return cached_density(data, ("frame", tuple(columns), str(bw), gridsize), compute)
+
+
+class ViolinStats(object):
+    """
+    Densities and quartiles of the groups of a violin plot.
+    `curves` maps (category index, hue index) to a dictionary with support, density, n,
+    quartiles (q25, q50, q75) and whiskers (adjacent values within 1.5 IQR).
+    """
+
+    def __init__(self, data, x, y, hue=None, orient=None, bw="scott", cut=2, gridsize=100):
+        from df_widgets.stats import categorical_order, infer_orient
+        self.orient = infer_orient(data, x, y, orient)
+        self.value, self.group = (y, x) if self.orient == "v" else (x, y)
+        n = len(data)
+        if self.group is not None:
+            self.gcodes, self.order = categorical_order(data[self.group])
+        else:
+            self.gcodes, self.order = np.zeros(n, dtype=np.int64), [""]
+        if hue is not None:
+            self.hcodes, self.hue_order = categorical_order(data[hue])
+        else:
+            self.hcodes, self.hue_order = np.zeros(n, dtype=np.int64), [None]
+
+        key = ("violin", self.value, self.group, hue, str(bw), cut, gridsize)
+        self.curves = cached_density(data, key, lambda: self._compute(data, bw, cut, gridsize))
+
+    @tm.timed("stats")
+    def _compute(self, data, bw, cut, gridsize):
+        nh = len(self.hue_order)
+        vals = np.asarray(data[self.value], dtype=float)
+        ok = np.isfinite(vals) & (self.gcodes >= 0) & (self.hcodes >= 0)
+        keys = (self.gcodes * nh + self.hcodes)[ok]
+        vals = vals[ok]
+        order = np.lexsort((vals, keys))
+        keys, vals = keys[order], vals[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+
+        curves = OrderedDict()
+        for k, v in zip(keys[np.r_[0, bounds]] if len(keys) else [], np.split(vals, bounds)):
+            q25, q50, q75 = np.percentile(v, [25, 50, 75])
+            iqr = q75 - q25
+            lo = v[np.searchsorted(v, q25 - 1.5 * iqr)]
+            hi = v[np.searchsorted(v, q75 + 1.5 * iqr, side="right") - 1]
+            support, density = kde1d(v, bw=bw, gridsize=gridsize, cut=cut)
+            curves[divmod(int(k), nh)] = dict(support=support, density=density, n=len(v),
+                                              quartiles=(q25, q50, q75), whiskers=(lo, hi))
+        return curves
+
+    def values(self, data, g, h):
+        """Observations of group (g, h)."""
+        vals = np.asarray(data[self.value], dtype=float)[(self.gcodes == g) & (self.hcodes == h)]
+        return vals[np.isfinite(vals)]
+
+
+def _desaturate(color, prop):
+    import colorsys
+    import matplotlib as mpl
+    h, l, s = colorsys.rgb_to_hls(*mpl.colors.to_rgb(color))
+    return colorsys.hls_to_rgb(h, l, s * prop)
+
+
+def violinplot(ax, data, x=None, y=None, hue=None, orient=None, bw="scott", cut=2, scale="area",
+               inner="box", split=False, color=None, saturation=0.75, width=0.8, gridsize=100, linewidth=None,
+               **kwargs):
+    """
+    Violin plot drawn with the densities computed by :class:`ViolinStats`.
+    Arguments have the same meaning as in `seaborn.violinplot`.
+    kwargs are passed to the matplotlib function filling the violins (e.g. alpha, hatch).
+
+    Returns: ax
+    """
+    import matplotlib as mpl
+    from matplotlib.patches import Patch
+    from df_widgets.stats import label_categorical_axes
+
+    vs = ViolinStats(data, x, y, hue=hue, orient=orient, bw=bw, cut=cut, gridsize=gridsize)
+    ng, nh = len(vs.order), len(vs.hue_order)
+    split = split and nh == 2
+    if linewidth is None: linewidth = mpl.rcParams["lines.linewidth"]
+    cycle = mpl.rcParams["axes.prop_cycle"].by_key()["color"]
+    if hue is None and color is None:
+        colors = [[_desaturate(cycle[g % len(cycle)], saturation)] for g in range(ng)]
+    elif hue is None:
+        colors = [[_desaturate(color, saturation)]] * ng
+    else:
+        colors = [[_desaturate(cycle[h % len(cycle)], saturation) for h in range(nh)]] * ng
+
+    curves = vs.curves
+    if not curves: return ax
+    if scale == "area":
+        norm = {k: max(c["density"].max() for c in curves.values()) for k in curves}
+    elif scale == "count":
+        nmax = max(c["n"] for c in curves.values())
+        norm = {k: c["density"].max() * nmax / c["n"] for k, c in curves.items()}
+    elif scale == "width":
+        norm = {k: c["density"].max() for k, c in curves.items()}
+    else:
+        raise ValueError("Invalid scale: %s" % str(scale))
+
+    fill = ax.fill_betweenx if vs.orient == "v" else ax.fill_between
+    lines = ax.vlines if vs.orient == "v" else ax.hlines
+    dodge = nh > 1 and not split
+    half = width / 2 / (nh if dodge else 1)
+
+    for (g, h), c in curves.items():
+        pos = g + (-width / 2 + width / nh * (h + 0.5) if dodge else 0)
+        hw = c["density"] / norm[(g, h)] * half if norm[(g, h)] > 0 else c["density"] * 0
+        left = pos - hw if not split or h == 0 else pos
+        right = pos + hw if not split or h == 1 else pos
+        fill(c["support"], left, right, **dict(dict(facecolor=colors[g][h], edgecolor="0.26", linewidth=linewidth),
+                                               **kwargs))
+
+        if inner == "box":
+            lines(pos, *c["whiskers"], color="0.26", linewidth=linewidth)
+            lines(pos, c["quartiles"][0], c["quartiles"][2], color="0.26", linewidth=linewidth * 3)
+            xy = (pos, c["quartiles"][1]) if vs.orient == "v" else (c["quartiles"][1], pos)
+            ax.scatter(*xy, s=25, c="white", zorder=3, edgecolors="none")
+        elif inner in ("quartile", "stick"):
+            qs = c["quartiles"] if inner == "quartile" else vs.values(data, g, h)
+            ws = np.interp(qs, c["support"], hw)
+            lo = pos - ws if not split or h == 0 else np.full(len(ws), pos)
+            hi = pos + ws if not split or h == 1 else np.full(len(ws), pos)
+            styles = [":", "--", ":"] if inner == "quartile" else "-"
+            if vs.orient == "v":
+                ax.hlines(qs, lo, hi, colors="0.26", linestyles=styles, linewidth=linewidth)
+            else:
+                ax.vlines(qs, lo, hi, colors="0.26", linestyles=styles, linewidth=linewidth)
+        elif inner == "point":
+            v = vs.values(data, g, h)
+            xy = (np.full(len(v), pos), v) if vs.orient == "v" else (v, np.full(len(v), pos))
+            ax.scatter(*xy, s=4, c="0.26", zorder=3, edgecolors="none")
+        elif inner is not None:
+            raise ValueError("Invalid inner: %s" % str(inner))
+
+    set_cat = ax.set_xlim if vs.orient == "v" else ax.set_ylim
+    set_cat(-0.5, ng - 0.5)
+    label_categorical_axes(ax, vs.orient, vs.order, vs.group, vs.value)
+    if hue is not None:
+        ax.legend(handles=[Patch(facecolor=colors[0][h], edgecolor="0.26", label=str(l))
+                           for h, l in enumerate(vs.hue_order)], title=hue, loc="best")
+
+    return ax
+
+
+def joint_kde(grid, data, x, y, bw="scott", color=None, gridsize=100, cut=3, levels=10):
+    """
+    Draw the 2D KDE of (x, y) on the joint axes and the 1D KDEs on the marginal axes of a `JointGrid`.
+    """
+    import matplotlib as mpl
+    if color is None: color = mpl.rcParams["axes.prop_cycle"].by_key()["color"][0]
+    cmap = mpl.colors.LinearSegmentedColormap.from_list("joint_kde", ["white", color])
+
+    xs, ys, z = cached_density(data, ("joint", x, y, str(bw), gridsize, cut),
+                               lambda: kde2d(data[x], data[y], bw=bw, gridsize=gridsize, cut=cut))
+    (sx, dx), (sy, dy) = [cached_density(data, ("marginal", c, str(bw), gridsize, cut),
+                                         lambda c=c: kde1d(data[c], bw=bw, gridsize=gridsize, cut=cut))
+                          for c in (x, y)]
+
+    # The lowest level is not filled so that the background is left empty.
+    if z.size: grid.ax_joint.contourf(xs, ys, z, levels=np.linspace(0, z.max(), levels + 1)[1:], cmap=cmap)
+    grid.ax_marg_x.fill_between(sx, 0, dx, color=color, alpha=0.25)
+    grid.ax_marg_x.plot(sx, dx, color=color)
+    grid.ax_marg_y.fill_betweenx(sy, 0, dy, color=color, alpha=0.25)
+    grid.ax_marg_y.plot(dy, sy, color=color)
+    grid.ax_joint.set_xlabel(x)
+    grid.ax_joint.set_ylabel(y)
+    return grid
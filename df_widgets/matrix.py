@@ -0,0 +1,118 @@
+# coding: utf-8
+"""
+Resolution-aware heatmap.
+
+The matrix is reduced to the resolution of the axes in pixels with a block mean/max
+and drawn with a single image artist. Per-cell annotations and tick labels are only
+drawn when the number of cells shown is below a threshold. A sub-block of the matrix
+can be selected to zoom in at full resolution.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import warnings
+import numpy as np
+import df_widgets.timing as tm
+
+# Max number of annotated cells.
+MAX_ANNOT = 400
+# Max number of tick labels along each axis.
+MAX_TICKLABELS = 60
+
+
+@tm.timed("stats")
+def block_reduce(values, shape, how="mean"):
+    """
+    Reduce the 2D array `values` with blocks so that the result has at most `shape` elements along each axis.
+    NaN values are ignored. Returns (reduced array, (block rows, block columns)).
+    """
+    nrows, ncols = values.shape
+    fy, fx = max(1, -(-nrows // shape[0])), max(1, -(-ncols // shape[1]))
+    if fy == 1 and fx == 1: return values, (1, 1)
+
+    # Pad with NaN so that the shape is a multiple of the block.
+    ny, nx = -(-nrows // fy), -(-ncols // fx)
+    padded = np.full((ny * fy, nx * fx), np.nan)
+    padded[:nrows, :ncols] = values
+    blocks = padded.reshape(ny, fy, nx, fx)
+    funcs = {"mean": np.nanmean, "max": np.nanmax}
+    if how not in funcs: raise ValueError("Invalid reduction: %s" % str(how))
+    with warnings.catch_warnings():
+        # All-NaN blocks are expected.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return funcs[how](blocks, axis=(1, 3)), (fy, fx)
+
+
+def _color_limits(values, vmin, vmax, center, robust):
+    """Color limits with the same rules used by seaborn.heatmap."""
+    finite = values[np.isfinite(values)]
+    if not finite.size: return 0, 1
+    if vmin is None: vmin = np.percentile(finite, 2) if robust else finite.min()
+    if vmax is None: vmax = np.percentile(finite, 98) if robust else finite.max()
+    if center is not None:
+        vrange = max(vmax - center, center - vmin)
+        vmin, vmax = center - vrange, center + vrange
+    return vmin, vmax
+
+
+def heatmap(ax, data, how="mean", cmap=None, vmin=None, vmax=None, center=None, robust=False,
+            annot=False, fmt=".2g", rows=None, cols=None, shape=None, cbar=True, cbar_kws=None, annot_kws=None,
+            **kwargs):
+    """
+    Plot the numeric DataFrame `data` as a color-encoded matrix with a single image artist.
+
+    Args:
+        how: Block reduction ("mean" or "max") used when the matrix is larger than the axes in pixels.
+        rows, cols: (start, stop) positions of the sub-block to plot. None for all.
+        shape: Max (nrows, ncols) of the image. Default: size of the axes in pixels.
+        annot: Write the values in the cells if the block is not reduced and has at most MAX_ANNOT cells.
+        kwargs: Passed to `ax.imshow` (e.g. alpha, norm).
+
+    Returns: ax
+    """
+    from df_widgets.raster import pixel_shape
+    r0, r1 = rows if rows is not None else (0, data.shape[0])
+    c0, c1 = cols if cols is not None else (0, data.shape[1])
+    block = data.iloc[r0:r1, c0:c1]
+    with tm.phase("prepare"):
+        values = np.asarray(block.values, dtype=float)
+    if shape is None: shape = pixel_shape(ax)
+    reduced, (fy, fx) = block_reduce(values, shape, how=how)
+    vmin, vmax = _color_limits(reduced, vmin, vmax, center, robust)
+
+    # Cells are centered at integer + 0.5 as in seaborn. Row 0 at the top.
+    nr, nc = reduced.shape
+    kws = dict(aspect="auto", interpolation="nearest")
+    kws.update(kwargs)
+    image = ax.imshow(np.ma.masked_invalid(reduced), cmap=cmap, vmin=vmin, vmax=vmax,
+                      extent=(c0, c0 + nc * fx, r0 + nr * fy, r0), **kws)
+    # The padding of the last blocks is not shown.
+    ax.set_xlim(c0, c0 + values.shape[1])
+    ax.set_ylim(r0 + values.shape[0], r0)
+    if cbar: ax.figure.colorbar(image, ax=ax, **(cbar_kws or {}))
+
+    if annot and (fy, fx) == (1, 1) and nr * nc <= MAX_ANNOT:
+        kws = dict(ha="center", va="center", fontsize="small")
+        kws.update(annot_kws or {})
+        norm = image.norm
+        for i in range(nr):
+            for j in range(nc):
+                v = reduced[i, j]
+                if not np.isfinite(v): continue
+                # Dark text on light cells.
+                lum = np.dot(image.cmap(norm(v))[:3], [0.299, 0.587, 0.114])
+                ax.text(c0 + j + 0.5, r0 + i + 0.5, format(v, fmt), color="0.15" if lum > 0.5 else "white", **kws)
+
+    # Tick labels from the index/columns if there are few cells, otherwise positions chosen by matplotlib.
+    if fx == 1 and nc <= MAX_TICKLABELS:
+        ax.set_xticks(c0 + np.arange(nc) + 0.5)
+        ax.set_xticklabels([str(c) for c in block.columns], rotation=90)
+    if fy == 1 and nr <= MAX_TICKLABELS:
+        ax.set_yticks(r0 + np.arange(nr) + 0.5)
+        ax.set_yticklabels([str(i) for i in block.index], rotation=0)
+    if block.index.name: ax.set_ylabel(block.index.name)
+    if block.columns.name: ax.set_xlabel(block.columns.name)
+
+    if (fy, fx) != (1, 1):
+        ax.set_title("block %s %dx%d: %dx%d --> %dx%d" % (how, fy, fx, values.shape[0], values.shape[1], nr, nc),
+                     fontsize="small")
+    return ax
@@ -0,0 +1,171 @@
+# coding: utf-8
+"""
+Pairwise plots drawn from cached per-panel statistics.
+
+The statistics of each panel (points and regression band for the off-diagonal panels,
+histograms or densities for the diagonal) are cached with the fingerprint of the data and
+(x, y, hue, kind, max_points) so that adding a variable only computes the new row and column of panels.
+Missing panels are computed in parallel with a pool of threads (the heavy parts are NumPy
+operations that release the GIL).
+The off-diagonal panels can be restricted to a stratified subsample of `max_points` points (opt-in):
+the regression band is then bootstrapped on the subsample and the panels are annotated with "N of M points".
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Number of bins of the diagonal histograms.
+HIST_BINS = 30
+
+# Cache (fingerprint, x, y, hue, kind, max_points) --> panel statistics
+_PANELS = OrderedDict()
+_MAX_PANELS = 256
+
+
+def _hue_codes(data, hue):
+    from df_widgets.stats import categorical_order
+    if hue is None: return np.zeros(len(data), dtype=np.int64), [None]
+    return categorical_order(data[hue])
+
+
+def panel_stats(data, x, y, kind, codes, nh, max_points=None, seed=0):
+    """
+    Compute the statistics of one panel.
+    Diagonal panels (x == y) with kind "hist" or "kde", off-diagonal panels with kind "scatter" or "reg".
+    `codes` are the hue codes of the rows in [0, nh).
+    Off-diagonal panels keep a stratified subsample of at most `max_points` points (None for all).
+    Returns dictionary.
+    """
+    from df_widgets.decimate import _as_float, stratified_indices
+    xv = _as_float(data[x])
+
+    if x == y:
+        ok = np.isfinite(xv) & (codes >= 0)
+        xv, codes = xv[ok], codes[ok]
+        if kind == "hist":
+            edges = np.histogram_bin_edges(xv, bins=HIST_BINS) if len(xv) else np.linspace(0, 1, HIST_BINS + 1)
+            bins = np.clip(np.searchsorted(edges, xv, side="right") - 1, 0, HIST_BINS - 1)
+            counts = np.bincount(codes * HIST_BINS + bins, minlength=nh * HIST_BINS).reshape(nh, HIST_BINS)
+            return dict(edges=edges, counts=counts)
+        elif kind == "kde":
+            from df_widgets.kde import kde1d
+            curves = [kde1d(xv[codes == h], gridsize=200) for h in range(nh)]
+            return dict(curves=curves)
+        raise ValueError("Invalid diag_kind: %s" % str(kind))
+
+    yv = _as_float(data[y])
+    ok = np.flatnonzero(np.isfinite(xv) & np.isfinite(yv) & (codes >= 0))
+    xv, yv, codes = xv[ok], yv[ok], codes[ok]
+    idx = (stratified_indices(xv, yv, max_points, seed=seed) if max_points is not None and len(xv) > max_points
+           else np.arange(len(xv)))
+    stats = dict(x=xv[idx], y=yv[idx], codes=codes[idx], n=len(xv))
+    if kind == "reg":
+        from df_widgets.stats import bootstrap_linregress
+        fits = []
+        for h in range(nh):
+            mask = codes == h
+            grid = np.linspace(xv[mask].min(), xv[mask].max(), 100) if mask.any() else np.zeros(0)
+            # Line fitted on all the points, confidence band bootstrapped on the points drawn.
+            yhat, _, _ = bootstrap_linregress(xv[mask], yv[mask], grid, n_boot=0)
+            smask = stats["codes"] == h
+            _, lo, hi = bootstrap_linregress(stats["x"][smask], stats["y"][smask], grid, n_boot=1000, seed=seed)
+            fits.append((grid, yhat, lo, hi))
+        stats["fits"] = fits
+    elif kind != "scatter":
+        raise ValueError("Invalid kind: %s" % str(kind))
+    return stats
+
+
+@tm.timed("stats")
+def compute_panels(data, x_vars, y_vars, hue=None, kind="scatter", diag_kind="hist", max_points=None, nprocs=None):
+    """
+    Return dictionary (x, y) --> statistics for all the panels of the grid.
+    Only the panels that are not in the cache are computed (in parallel).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from df_widgets.render import fingerprint
+    fp = fingerprint(data)
+    keys = OrderedDict()
+    for y in y_vars:
+        for x in x_vars:
+            keys[(x, y)] = (fp, x, y, hue, diag_kind if x == y else kind, None if x == y else max_points)
+
+    missing = [k for k in keys.values() if k not in _PANELS]
+    if missing:
+        codes, levels = _hue_codes(data, hue)
+        nprocs = min(nprocs or os.cpu_count() or 1, len(missing))
+        with ThreadPoolExecutor(max_workers=nprocs) as pool:
+            results = list(pool.map(lambda k: panel_stats(data, k[1], k[2], k[4], codes, len(levels),
+                                                          max_points=k[5]), missing))
+        for k, stats in zip(missing, results):
+            _PANELS[k] = stats
+
+    panels = OrderedDict()
+    for xy, k in keys.items():
+        _PANELS.move_to_end(k)
+        panels[xy] = _PANELS[k]
+    while len(_PANELS) > _MAX_PANELS:
+        _PANELS.popitem(last=False)
+    return panels
+
+
+def pairplot(data, x_vars, y_vars, hue=None, kind="scatter", diag_kind="hist", size=2.5, max_points=None,
+             plot_kws=None, diag_kws=None):
+    """
+    Grid of pairwise plots drawn from the cached panel statistics.
+    `size` is the height (and width) of the panels in inches as in seaborn.pairplot.
+    `max_points`: draw a stratified subsample of at most `max_points` points per off-diagonal panel (None for all).
+    `plot_kws` and `diag_kws` are passed to the matplotlib calls of the off-diagonal and diagonal panels.
+
+    Returns: matplotlib figure.
+    """
+    import matplotlib as mpl
+    from matplotlib.lines import Line2D
+    from df_widgets.figures import figure_manager
+
+    x_vars, y_vars = list(x_vars), list(y_vars)
+    if not x_vars or not y_vars: raise ValueError("Select at least one variable for x_vars and y_vars")
+    panels = compute_panels(data, x_vars, y_vars, hue=hue, kind=kind, diag_kind=diag_kind, max_points=max_points)
+    _, levels = _hue_codes(data, hue)
+    cycle = mpl.rcParams["axes.prop_cycle"].by_key()["color"]
+    colors = mpl.colors.to_rgba_array([cycle[h % len(cycle)] for h in range(len(levels))])
+
+    plot_kws = dict(dict(s=10, linewidths=0), **(plot_kws or {}))
+    diag_kws = diag_kws or {}
+
+    nx, ny = len(x_vars), len(y_vars)
+    fig = figure_manager.figure()
+    fig.set_size_inches(nx * size, ny * size)
+    for i, y in enumerate(y_vars):
+        for j, x in enumerate(x_vars):
+            ax = fig.add_subplot(ny, nx, i * nx + j + 1)
+            stats = panels[(x, y)]
+            if x == y and diag_kind == "hist":
+                edges = stats["edges"]
+                for h, counts in enumerate(stats["counts"]):
+                    ax.fill_between(edges, np.r_[counts, counts[-1]], step="post", color=colors[h], alpha=0.5,
+                                    **diag_kws)
+            elif x == y:
+                for h, (support, density) in enumerate(stats["curves"]):
+                    ax.plot(support, density, color=colors[h], **diag_kws)
+            else:
+                ax.scatter(stats["x"], stats["y"], c=colors[stats["codes"]], **plot_kws)
+                for h, (grid, yhat, lo, hi) in enumerate(stats.get("fits", [])):
+                    ax.plot(grid, yhat, color=colors[h])
+                    ax.fill_between(grid, lo, hi, color=colors[h], alpha=0.15, linewidth=0)
+                if len(stats["x"]) < stats["n"]:
+                    ax.text(0.99, 0.01, "%d of %d points" % (len(stats["x"]), stats["n"]), transform=ax.transAxes,
+                            ha="right", va="bottom", fontsize="small", alpha=0.6)
+            if i == ny - 1: ax.set_xlabel(x)
+            if j == 0: ax.set_ylabel(y)
+
+    if hue is not None:
+        handles = [Line2D([], [], marker="o", linestyle="", color=colors[h], label=str(l)) for h, l in enumerate(levels)]
+        fig.legend(handles=handles, title=hue, loc="center right")
+    # Leave space for the legend on the right.
+    fig.tight_layout(rect=(0, 0, 0.9 if hue is not None else 1, 1))
+    return fig
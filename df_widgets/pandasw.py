@@ -2,30 +2,119 @@
 """Widgets for Pandas Dataframes."""
 from __future__ import print_function, division, unicode_literals, absolute_import
 
-import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
 import ipywidgets as ipw
 import df_widgets.utils as ut
+import df_widgets.render as rn
+import df_widgets.decimate as dc
+import df_widgets.schema as sc
+import df_widgets.kde as kd
+import df_widgets.raster as rs
+import df_widgets.compact as cp
+import df_widgets.sources as ds
+import df_widgets.client as ct
+import df_widgets.pyramid as pm
+import df_widgets.selection as sl
 
-from functools import wraps
+from collections import OrderedDict
 
 
-@wraps(pd.DataFrame.plot)
+@ut.lazy_wraps("pandas", "DataFrame.plot")
 def dfw_plot(data, **kwargs):
 
+    @rn.cached_render(data, options=kwargs)
     def plot_dataframe(x, y, kind, sharex, sharey, subplots, grid, legend,
-                      logx, logy, loglog, colorbar, sort_columns):
-        x, y = ut.widget2py(x, y)
+                      logx, logy, loglog, colorbar, sort_columns, downsample, bw, raster, c, cmap, rows):
+        import matplotlib.pyplot as plt
+        x, y, downsample, raster, c = ut.widget2py(x, y, downsample, raster, c)
         sharex, colorbar = ut.str2bool_or_none(sharex, colorbar)
-        data.plot(x=x, y=y, kind=kind, subplots=subplots, sharex=None, sharey=sharey,
-                layout=None, figsize=None, use_index=True, title=None, grid=grid, legend=legend, style=None,
-                logx=logx, logy=logy, loglog=loglog, xticks=None, yticks=None, xlim=None, ylim=None,
-                rot=None, fontsize=None, colormap=colorbar, table=False, yerr=None, xerr=None, secondary_y=False,
-                sort_columns=sort_columns, **kwargs)
-                # There's a typo in the documentation (colorbar/colormap!)
-        return plt.gcf()
-
-    allcols = ["None"] + list(data.keys())
+        start, stop = rows
+        sliced = (start, stop) != (0, len(data))
+
+        if kind == "scatter" and raster is not None:
+            # Aggregate the points on the pixels of the axes and draw a single image.
+            df = cp.compact(data, x, y, c)
+            if sliced: df = df.iloc[start:stop]
+            if ct.backend.enabled:
+                grid, extent = rs.aggregate(df[x], df[y], values=df[c] if c is not None else None, how=raster,
+                                            shape=ct.backend.plot_shape())
+                return ct.image(grid, extent, cmap=cmap, xlabel=x, ylabel=y)
+            fig, ax = plt.subplots()
+            rs.rasterplot(ax, df[x], df[y], values=df[c] if c is not None else None,
+                          how=raster, cmap=cmap)
+            ax.grid(grid)
+            return fig
+
+        if kind == "hist" and ds.is_source(data) and not sl.filtered(data) and not subplots:
+            # Out-of-core data: histograms computed with chunked aggregates (only the schema is used here).
+            numcols = ds.schema(data).select_dtypes(include=[np.number]).columns
+            columns = [y] if y is not None else [c for c in numcols if c != x]
+            edges, counts = ds.stream_histogram(data, columns, bins=kwargs.get("bins", 10), start=start, stop=stop)
+            if ct.backend.enabled: return ct.histogram(edges, counts)
+            fig, ax = plt.subplots()
+            for name, n in counts.items():
+                ax.hist(edges[:-1], bins=edges, weights=n, alpha=0.5 if len(counts) > 1 else 1, label=str(name),
+                        log=logy)
+            ax.set_ylabel("Frequency")
+            ax.grid(grid)
+            if legend: ax.legend()
+            return fig
+
+        density = kind in ("kde", "density")
+        # The pyramids cover all the rows: selections of the other widgets use the samples.
+        pyramid = downsample == "pyramid" and kind in ("line", "area") and x is None and not sl.filtered(data)
+        if pyramid:
+            # Rows in the range read from the min/max pyramid at the resolution of the figure.
+            numcols = ds.schema(data).select_dtypes(include=[np.number]).columns
+            columns = [y] if y is not None else list(numcols)
+            df = pm.pyramid_frame(data, columns, start, stop, dc.point_budget(points_per_pixel=1))
+        else:
+            # Project to the referenced columns (pandas plots all the columns if y is None).
+            df = cp.compact(data, x, y) if y is not None else cp.compact(data)
+            if sliced: df = df.iloc[start:stop]
+        # Number of rows in the range before the decimation.
+        nrows = len(df) if not pyramid else min(stop, len(data)) - start
+
+        # Optional decimation with budget given by the width of the figure in pixels.
+        if downsample is not None and not density and not pyramid:
+            budget = dc.point_budget(points_per_pixel=20 if kind == "scatter" else 2)
+            df = dc.decimate_frame(df, x, y, kind, "minmax" if downsample == "pyramid" else downsample, budget)
+
+        # Densities are computed with the binned KDE and plotted as lines.
+        if density:
+            numcols = ds.schema(data).select_dtypes(include=[np.number]).columns
+            columns = [y] if y is not None else [c for c in numcols if c != x]
+            frame = cp.compact(data, *columns).iloc[start:stop] if sliced else sl.filter_frame(data)
+            df, x, y, kind = kd.density_frame(frame, columns, bw=bw), None, None, "line"
+
+        if ct.backend.enabled and kind in ("line", "scatter", "hist") and not subplots:
+            # Densities, decimated series and histograms are drawn by the browser.
+            numcols = [c for c in df.select_dtypes(include=[np.number]).columns if c != x]
+            columns = [y] if y is not None else numcols
+            if kind == "hist":
+                values = [dc._as_float(df[c]) for c in columns]
+                finite = np.concatenate([v[np.isfinite(v)] for v in values])
+                edges = np.histogram_bin_edges(finite, bins=kwargs.get("bins", 10))
+                return ct.histogram(edges, OrderedDict((c, np.histogram(v, bins=edges)[0])
+                                                       for c, v in zip(columns, values)))
+            frame = df[([x] if x is not None else []) + columns]
+            return ct.series(frame, x=x, ylabel="Density" if density else (y or ""), kind=kind)
+
+        axes = df.plot(x=x, y=y, kind=kind, subplots=subplots, sharex=None, sharey=sharey,
+                       layout=None, figsize=None, use_index=True, title=None, grid=grid, legend=legend, style=None,
+                       logx=logx, logy=logy, loglog=loglog, xticks=None, yticks=None, xlim=None, ylim=None,
+                       rot=None, fontsize=None, colormap=colorbar, table=False, yerr=None, xerr=None, secondary_y=False,
+                       sort_columns=sort_columns, **kwargs)
+                       # There's a typo in the documentation (colorbar/colormap!)
+        fig = plt.gcf()
+        if density:
+            for ax in np.ravel(axes): ax.set_ylabel("Density")
+        elif downsample is not None and len(df) < nrows:
+            fig.text(0.99, 0.01, "%s: %d of %d points" % (downsample if kind != "scatter" else "stratified",
+                     len(df), nrows), ha="right", va="bottom", fontsize="small", alpha=0.6)
+        return fig
+
+    allcols = sc.column_options(data, "any")
     return ipw.interact_manual(
                 plot_dataframe,
                 x=allcols,
@@ -41,4 +130,10 @@ def dfw_plot(data, **kwargs):
                 loglog=False,
                 colorbar=["None", "True", "False"],
                 sort_columns=False,
+                downsample=["None", "minmax", "lttb", "pyramid"],
+                bw=ut.bw_dropdown(),
+                raster=["None", "count", "mean", "max"],
+                c=allcols,
+                cmap=ut.colormap_widget(default="viridis"),
+                rows=ipw.IntRangeSlider(value=[0, len(data)], min=0, max=len(data), description="rows"),
             )
\ No newline at end of file
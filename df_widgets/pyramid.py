@@ -0,0 +1,228 @@
+# coding: utf-8
+"""
+Multi-resolution min/max/mean pyramids for line plots over the index of long series.
+
+Level k of the pyramid of a column stores the min, max, mean and number of finite values
+of the blocks of `factor ** k` consecutive samples. Level 1 is computed from the samples
+with a chunked vectorized pass (`reduceat`), the other levels from the previous one.
+A query for the rows [start, stop) with `nbins` pixels reads the coarsest level that still has
+at least `nbins` blocks in the range so that the cost depends on the width of the figure
+and not on the number of rows. The arrays can be stored in .npy files opened as memory maps
+(see `STORE_DIR`) so that the pyramids of large columns are built once and shared by the sessions.
+The stored pyramids are reused only if the hash of the whole column matches the one saved in pyramid.json.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Number of samples of level k - 1 in a block of level k.
+FACTOR = 4
+
+# The levels with at most MIN_BLOCKS blocks are not refined further.
+MIN_BLOCKS = 256
+
+# Samples processed at once when building level 1 (multiple of FACTOR).
+CHUNKSIZE = 2 ** 22
+
+# Directory used to store the pyramids as memory-mapped .npy files. None to keep them in memory.
+STORE_DIR = None
+
+# Cache (fingerprint, column) --> Pyramid
+_PYRAMIDS = OrderedDict()
+_MAX_PYRAMIDS = 32
+
+_FIELDS = ("min", "max", "mean", "count")
+
+
+def _alloc(path, level, field, n, dtype):
+    """Array for `field` of `level`: .npy file opened for writing if path is not None."""
+    if path is None: return np.empty(n, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(path, "level%d_%s.npy" % (level, field)),
+                                     mode="w+", dtype=dtype, shape=(n,))
+
+
+def _digest(values):
+    """Hash of the content of the 1D array `values` (all the samples, not a fingerprint)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(values.dtype).encode("utf-8"))
+    h.update(np.ascontiguousarray(values).view(np.uint8))
+    return h.hexdigest()
+
+
+def _reduce_blocks(vmin, vmax, vmean, count, factor, out, offset=0):
+    """Aggregate consecutive blocks of `factor` entries and store the results in `out` at `offset`."""
+    starts = np.arange(0, len(vmin), factor)
+    stop = offset + len(starts)
+    n = np.add.reduceat(count, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.add.reduceat(np.where(count > 0, vmean * count, 0), starts) / n
+    out["min"][offset:stop] = np.fmin.reduceat(vmin, starts)
+    out["max"][offset:stop] = np.fmax.reduceat(vmax, starts)
+    out["mean"][offset:stop] = mean
+    out["count"][offset:stop] = n
+
+
+class Pyramid(object):
+    """
+    Min/max/mean pyramid of the values of a column.
+    `levels[k - 1]` is a dictionary field --> array for level k (blocks of `factor ** k` samples).
+    Level 0 are the samples (`values`).
+    """
+
+    def __init__(self, values, levels, factor=FACTOR):
+        self.values, self.levels, self.factor = values, levels, factor
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "<%s: %d samples, %d levels, factor %d>" % (
+            self.__class__.__name__, len(self), len(self.levels), self.factor)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for level in self.levels for a in level.values())
+
+    @classmethod
+    @tm.timed("stats")
+    def build(cls, values, factor=FACTOR, path=None, min_blocks=MIN_BLOCKS, chunksize=CHUNKSIZE):
+        """
+        Build the pyramid of `values` (1D array). If `path` is not None, the levels
+        are written to .npy files in the directory `path` and reopened as memory maps.
+        """
+        values = np.asarray(values)
+        if values.dtype.kind != "f": values = values.astype(float)
+        n = len(values)
+        if path is not None and not os.path.isdir(path): os.makedirs(path)
+        chunksize = max(factor, chunksize // factor * factor)
+
+        levels, size, level = [], n, 1
+        while size > min_blocks:
+            nblocks = -(-size // factor)
+            out = OrderedDict([
+                ("min", _alloc(path, level, "min", nblocks, values.dtype)),
+                ("max", _alloc(path, level, "max", nblocks, values.dtype)),
+                ("mean", _alloc(path, level, "mean", nblocks, np.float64)),
+                ("count", _alloc(path, level, "count", nblocks, np.int64)),
+            ])
+            if level == 1:
+                # Chunked pass over the samples so that the temporaries do not depend on n.
+                for start in range(0, n, chunksize):
+                    chunk = values[start:start + chunksize]
+                    finite = np.isfinite(chunk)
+                    _reduce_blocks(chunk, chunk, np.where(finite, chunk, 0), finite.astype(np.int64), factor,
+                                   out, offset=start // factor)
+            else:
+                prev = levels[-1]
+                _reduce_blocks(prev["min"], prev["max"], prev["mean"], prev["count"], factor, out)
+            levels.append(out)
+            size, level = nblocks, level + 1
+
+        if path is None: return cls(values, levels, factor=factor)
+        for out in levels:
+            for a in out.values(): a.flush()
+        with open(os.path.join(path, "pyramid.json"), "wt") as fh:
+            digest = _digest(values)
+            json.dump(dict(n=n, factor=factor, nlevels=len(levels), digest=digest), fh)
+        return cls.load(path, values, digest=digest)
+
+    @classmethod
+    def load(cls, path, values, digest=None):
+        """
+        Open the levels stored in `path` as memory maps.
+        Return None if the files were not built from `values` (length or hash of the content differ).
+        `digest` is the hash of `values` if already known.
+        """
+        try:
+            with open(os.path.join(path, "pyramid.json"), "rt") as fh:
+                meta = json.load(fh)
+        except (IOError, OSError, ValueError):
+            return None
+        if meta["n"] != len(values): return None
+        if meta.get("digest") != (digest or _digest(np.asarray(values))): return None
+        levels = [OrderedDict((f, np.load(os.path.join(path, "level%d_%s.npy" % (k, f)), mmap_mode="r"))
+                              for f in _FIELDS) for k in range(1, meta["nlevels"] + 1)]
+        return cls(values, levels, factor=meta["factor"])
+
+    def level_for(self, start, stop, nbins):
+        """Coarsest level with at least `nbins` blocks in the rows [start, stop)."""
+        level = 0
+        while level < len(self.levels) and (stop - start) // self.factor ** (level + 1) >= nbins:
+            level += 1
+        return level
+
+    def query(self, start, stop, nbins):
+        """
+        Aggregates of the rows [start, stop) at the resolution of `nbins` pixels.
+        Returns (positions, min, max, mean): position of the first sample of each block and the statistics
+        of the block (the samples with min = max = mean if no level is coarse enough).
+        The blocks at the boundaries may extend beyond the range by less than one block.
+        """
+        start, stop = max(0, int(start)), min(len(self), int(stop))
+        level = self.level_for(start, stop, nbins)
+        if level == 0:
+            values = np.asarray(self.values[start:stop])
+            return np.arange(start, stop), values, values, values
+        step = self.factor ** level
+        b0, b1 = start // step, -(-stop // step)
+        arrays = self.levels[level - 1]
+        return (np.arange(b0, b1) * step, np.asarray(arrays["min"][b0:b1]), np.asarray(arrays["max"][b0:b1]),
+                np.asarray(arrays["mean"][b0:b1]))
+
+
+def _slug(name, maxlen=40):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(name))[:maxlen]
+
+
+def get_pyramid(data, column, store_dir=None):
+    """
+    Return the (cached) :class:`Pyramid` of `data[column]`.
+    The levels are stored in `store_dir` (default: STORE_DIR) if not None and reused if already present.
+    """
+    from df_widgets.render import fingerprint
+    from df_widgets.decimate import _as_float
+    fp = fingerprint(data)
+    key = (fp, column)
+    pyr = _PYRAMIDS.get(key)
+    if pyr is not None:
+        _PYRAMIDS.move_to_end(key)
+        return pyr
+
+    values = _as_float(data[column])
+    store_dir = store_dir if store_dir is not None else STORE_DIR
+    path = os.path.join(store_dir, "%s-%s" % (fp[:16], _slug(column))) if store_dir is not None else None
+    if path is not None: pyr = Pyramid.load(path, values)
+    if pyr is None: pyr = Pyramid.build(values, path=path)
+    _PYRAMIDS[key] = pyr
+    while len(_PYRAMIDS) > _MAX_PYRAMIDS:
+        _PYRAMIDS.popitem(last=False)
+    return pyr
+
+
+@tm.timed("prepare")
+def pyramid_frame(data, columns, start, stop, nbins):
+    """
+    DataFrame for a line plot of `columns` versus the index of `data` restricted to the rows [start, stop).
+    Each block of the pyramid contributes two rows (min and max) so that the line covers
+    the same pixels as the samples. The index of the frame is the index of `data` at the first sample of each block.
+    """
+    import pandas as pd
+    series, index = OrderedDict(), None
+    for c in columns:
+        pos, vmin, vmax, _ = get_pyramid(data, c).query(start, stop, nbins)
+        if vmin is vmax:
+            # Few rows in the range: the samples are used.
+            series[c], index = vmin, pos
+        else:
+            series[c], index = np.column_stack([vmin, vmax]).ravel(), np.repeat(pos, 2)
+    if index is None: index = np.arange(0)
+    data_index = getattr(data, "index", None)
+    index = data_index[index] if data_index is not None else pd.RangeIndex(len(data))[index]
+    return pd.DataFrame(series, index=index)
@@ -0,0 +1,98 @@
+# coding: utf-8
+"""
+Raster aggregation of scatter plots.
+
+The points are binned on a grid with the resolution of the axes in pixels and the grid
+is drawn as a single image so that the cost of the rendering depends on the number of pixels
+instead of the number of rows. Each pixel shows the number of points or the mean/max
+of a third column over the points falling in the pixel.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+import df_widgets.timing as tm
+
+AGGREGATIONS = ("count", "mean", "max")
+
+
+def pixel_shape(ax):
+    """Number of pixels (nrows, ncols) of the axes."""
+    bbox = ax.bbox
+    return max(1, int(round(bbox.height))), max(1, int(round(bbox.width)))
+
+
+def _limits(v):
+    lo, hi = v.min(), v.max()
+    if hi == lo: lo, hi = lo - 0.5, hi + 0.5
+    return lo, hi
+
+
+@tm.timed("stats")
+def aggregate(x, y, values=None, how="count", shape=(480, 640), extent=None):
+    """
+    Aggregate the points (x, y) on a grid of shape (nrows, ncols).
+
+    Args:
+        values: Third column aggregated with `how` ("mean" or "max"). Not used if how == "count".
+        extent: (xmin, xmax, ymin, ymax). Default: range of the data.
+
+    Returns: (grid, extent). grid[i, j] is NaN for empty pixels (row 0 corresponds to ymin).
+    """
+    from df_widgets.decimate import _as_float
+    x, y = _as_float(x), _as_float(y)
+    mask = np.isfinite(x) & np.isfinite(y)
+    if how != "count":
+        if values is None: raise ValueError("Aggregation %s requires a column with values" % how)
+        values = _as_float(values)
+        mask &= np.isfinite(values)
+        values = values[mask]
+    x, y = x[mask], y[mask]
+
+    nrows, ncols = shape
+    if extent is None:
+        if not len(x): return np.full(shape, np.nan), (0, 1, 0, 1)
+        extent = _limits(x) + _limits(y)
+    xmin, xmax, ymin, ymax = extent
+    ix = ((x - xmin) * (ncols / (xmax - xmin))).astype(np.int64)
+    iy = ((y - ymin) * (nrows / (ymax - ymin))).astype(np.int64)
+    # Points on the upper limits go to the last pixel.
+    ix[ix == ncols] = ncols - 1
+    iy[iy == nrows] = nrows - 1
+    inside = (ix >= 0) & (ix < ncols) & (iy >= 0) & (iy < nrows)
+    flat = iy[inside] * ncols + ix[inside]
+
+    counts = np.bincount(flat, minlength=nrows * ncols).astype(float)
+    if how == "count":
+        grid = counts
+    elif how == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grid = np.bincount(flat, weights=values[inside], minlength=nrows * ncols) / counts
+    elif how == "max":
+        grid = np.full(nrows * ncols, np.nan)
+        np.fmax.at(grid, flat, values[inside])
+    else:
+        raise ValueError("Invalid aggregation: %s. Choose among %s" % (how, AGGREGATIONS))
+
+    grid[counts == 0] = np.nan
+    return grid.reshape(nrows, ncols), extent
+
+
+def rasterplot(ax, x, y, values=None, how="count", cmap="viridis", colorbar=True, shape=None, label=None):
+    """
+    Draw the aggregated points as a single image on `ax`.
+    `x`, `y`, `values` are Series (their names are used for the labels).
+    The resolution is given by the size of the axes in pixels if `shape` is None.
+
+    Returns: matplotlib AxesImage.
+    """
+    if shape is None: shape = pixel_shape(ax)
+    grid, extent = aggregate(x, y, values=values, how=how, shape=shape)
+    image = ax.imshow(np.ma.masked_invalid(grid), origin="lower", extent=extent, aspect="auto",
+                      interpolation="nearest", cmap=cmap)
+    ax.set_xlabel(getattr(x, "name", None) or "")
+    ax.set_ylabel(getattr(y, "name", None) or "")
+    if colorbar:
+        if label is None:
+            label = "count" if how == "count" else "%s(%s)" % (how, getattr(values, "name", None) or "")
+        ax.figure.colorbar(image, ax=ax, label=label)
+    return image
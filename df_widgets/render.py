@@ -0,0 +1,426 @@
+# coding: utf-8
+"""Rendering helpers shared by the widgets: DataFrame fingerprints, figure encoding and render cache."""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import time
+import hashlib
+import inspect
+import threading
+
+from functools import wraps
+from collections import OrderedDict
+from df_widgets.figures import figure_manager, live_figures
+import df_widgets.timing as tm
+import df_widgets.client as ct
+import df_widgets.encoding as ec
+import df_widgets.selection as sl
+
+
+def fingerprint(data, nsample=1000):
+    """
+    Cheap fingerprint of a DataFrame. Hash the shape, the columns, the dtypes
+    and a strided sample of at most `nsample` rows (plus the last one)
+    so that the cost does not depend on the number of rows.
+    Data sources are identified by their files.
+    """
+    import pandas as pd
+    from df_widgets.sources import is_source
+    if is_source(data): return data.fingerprint()
+    h = hashlib.sha1()
+    h.update(repr((data.shape, [str(c) for c in data.columns], [str(t) for t in data.dtypes])).encode("utf-8"))
+    step = max(1, len(data) // nsample)
+    sample = data.iloc[::step]
+    if len(data): sample = pd.concat([sample, data.iloc[-1:]])
+    try:
+        h.update(pd.util.hash_pandas_object(sample, index=True).values.tobytes())
+    except TypeError:
+        # Unhashable objects (e.g. lists) in the columns.
+        h.update(repr(sample.values.tolist()).encode("utf-8"))
+    return h.hexdigest()
+
+
+_WIDGET_VALUES = {"None": None, "True": True, "False": False}
+
+
+def normalize_args(arguments):
+    """
+    Normalize the values received from the widgets with the same conventions
+    used by :func:`widget2py` and :func:`str2bool_or_none`. Return sorted tuple of (name, value).
+    """
+    def norm(v):
+        if isinstance(v, list): return tuple(v)
+        try:
+            return _WIDGET_VALUES.get(v, v)
+        except TypeError:
+            # Unhashable value.
+            return v
+    return tuple(sorted((k, norm(v)) for k, v in arguments.items()))
+
+
+def get_figure(obj=None):
+    """
+    Return the matplotlib figure associated to the object returned by a plotting function
+    (Figure, Axes, seaborn Grid). Fallback to the current figure.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+    if isinstance(obj, Figure): return obj
+    # seaborn Grids have `fig`, Axes have `figure`.
+    for attr in ("fig", "figure"):
+        fig = getattr(obj, attr, None)
+        if isinstance(fig, Figure): return fig
+    return plt.gcf()
+
+
+def format_nbytes(nbytes):
+    """String with the size in B, kB or MB."""
+    for unit, scale in (("MB", 1024 ** 2), ("kB", 1024)):
+        if nbytes >= scale: return "%.1f %s" % (nbytes / scale, unit)
+    return "%d B" % nbytes
+
+
+def encode_figure(fig, fmt="png", dpi=None):
+    """Encode the matplotlib figure `fig`. Heavy artists are rasterized for vector formats. Return bytes."""
+    import io
+    if fmt in ec.VECTOR_FORMATS and ec.pipeline.rasterize_min is not None:
+        ec.rasterize_heavy(fig, ec.pipeline.rasterize_min)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight")
+    return buf.getvalue()
+
+
+def display_obj(payload, fmt="png", width=None):
+    """
+    Build the IPython object used to display the encoded image (ClientPlot widget for encoded scenes).
+    `width` is the width of the image in CSS pixels (HiDPI images are scaled down by the browser).
+    """
+    from IPython.display import Image, SVG, HTML
+    if ct.is_payload(payload): return ct.client_plot(payload)
+    if fmt == "svg": return SVG(data=payload)
+    if fmt == "webp":
+        import base64
+        style = " width='%d'" % width if width else ""
+        return HTML("<img src='data:image/webp;base64,%s'%s/>" % (base64.b64encode(payload).decode("ascii"), style))
+    return Image(data=payload, format=fmt, width=width)
+
+
+class RenderCache(object):
+    """
+    Size-bounded LRU cache with the images produced by the widgets.
+    Entries are evicted when the number of entries exceeds `maxsize`
+    or the total size of the encoded images exceeds `maxbytes`.
+    """
+
+    def __init__(self, maxsize=128, maxbytes=64 * 1024 ** 2):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the encoded image associated to `key` or None. Update statistics."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, payload):
+        """Add the encoded image `payload` to the cache."""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self.nbytes -= len(old)
+            # Don't store objects that would evict everything else.
+            if len(payload) > self.maxbytes: return
+            self._entries[key] = payload
+            self.nbytes += len(payload)
+            while len(self._entries) > self.maxsize or self.nbytes > self.maxbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def stats(self):
+        """Return dictionary with hit/miss statistics."""
+        ncalls = self.hits + self.misses
+        return OrderedDict([
+            ("hits", self.hits),
+            ("misses", self.misses),
+            ("hit_rate", self.hits / ncalls if ncalls else 0.0),
+            ("evictions", self.evictions),
+            ("entries", len(self._entries)),
+            ("nbytes", self.nbytes),
+            ("maxbytes", self.maxbytes),
+        ])
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, ", ".join("%s=%s" % kv for kv in self.stats().items()))
+
+
+# Global cache shared by all the widgets.
+render_cache = RenderCache()
+
+
+_SPINNER = "<i class='fa fa-spinner fa-spin'></i> rendering..."
+
+
+class RenderState(object):
+    """
+    Widgets used to display the images rendered in background: status line with
+    a cancel button, Output widget with the last image and panel with the timings.
+    One instance per widget.
+    """
+
+    def __init__(self, name):
+        import ipywidgets as ipw
+        self.name = name
+        self.status = ipw.HTML()
+        self.cancel_button = ipw.Button(description="Cancel", disabled=True, layout=ipw.Layout(width="80px"))
+        self.output = ipw.Output()
+        self.stats_panel = ipw.HTML()
+        self.widget = ipw.VBox(children=[ipw.HBox(children=[self.status, self.cancel_button]),
+                                         ipw.HBox(children=[self.output, self.stats_panel])])
+        self.generation = 0
+        self.future = None
+        self.cancel_button.on_click(lambda button: self.cancel())
+
+    def supersede(self):
+        """Invalidate the in-flight request. Return the new generation."""
+        self.generation += 1
+        if self.future is not None: self.future.cancel()
+        self.cancel_button.disabled = True
+        return self.generation
+
+    def cancel(self):
+        self.supersede()
+        self.status.value = "<i>cancelled</i>"
+
+    def show(self, payload, fmt, status=""):
+        """Replace the content of the output widget with the encoded image."""
+        self.output.outputs = ()
+        self.output.append_display_data(display_obj(payload, fmt=fmt, width=ec.pipeline.width))
+        self.status.value = status
+        self.stats_panel.value = tm.history.html(self.name)
+
+
+class RenderExecutor(object):
+    """
+    Run the plotting closures on a worker thread so that slow renders do not block the kernel.
+    A single thread is used because pyplot is not thread-safe. A new request of a widget
+    supersedes the previous one: the old request is cancelled if not started yet,
+    its result is discarded otherwise. Background rendering requires a non-GUI backend
+    (Agg or inline), the closures are executed synchronously otherwise.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def headless_backend():
+        import matplotlib
+        backend = matplotlib.get_backend().lower()
+        return backend == "agg" or "inline" in backend
+
+    def available(self):
+        return self.enabled and self.headless_backend()
+
+    def submit(self, state, job, fmt="png"):
+        """
+        Execute `job(is_stale)` on the worker thread and display the encoded image returned by job in `state`.
+        `is_stale()` returns True if the request has been superseded so that the job can stop early (returning None).
+        job can also return a Future with the encoded image (compressed on the encoder thread).
+        """
+        from concurrent.futures import ThreadPoolExecutor, Future
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1)
+            gen = state.supersede()
+            is_stale = lambda: gen != state.generation
+            state.status.value = _SPINNER
+            state.cancel_button.disabled = False
+            state.future = future = self._pool.submit(lambda: None if is_stale() else job(is_stale))
+
+        start = time.time()
+        def done(f):
+            if f.cancelled() or is_stale(): return
+            state.cancel_button.disabled = True
+            exc = f.exception()
+            if exc is not None:
+                import html
+                state.status.value = "<span style='color:red'>%s: %s</span>" % (
+                    exc.__class__.__name__, html.escape(str(exc)))
+            elif isinstance(f.result(), Future):
+                # Payload compressed on the encoder thread.
+                f.result().add_done_callback(done)
+            elif f.result() is not None:
+                payload = f.result()
+                state.show(payload, fmt, status="rendered in %.2f s, %s" % (time.time() - start, format_nbytes(len(payload))))
+
+        future.add_done_callback(done)
+        return future
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+# Global executor used by the widgets.
+render_executor = RenderExecutor()
+
+
+def cached_render(data, options=None, cache=None, fmt=None, style=None):
+    """
+    Decorator for the plotting closures of the widgets.
+    The figure produced by the closure is encoded and stored in the render cache with key
+    given by the fingerprint of `data`, the name of the closure, the normalized widget arguments,
+    `options` (dictionary with the extra keyword arguments passed to the plotting function)
+    and the options of the output :data:`pipeline` (`fmt` overrides the format of the pipeline).
+    Returns an IPython object displaying the image so that the figure can be closed.
+    The figures are tracked by :data:`figure_manager` with the decorated closure as owner.
+    If :data:`render_executor` is available, cache misses are rendered in background
+    (the pixels are compressed on the encoder thread) and the closure returns a widget
+    that is updated when the image is ready.
+    Closures may return a :class:`Scene` when the client-side backend is enabled:
+    the scene is encoded instead of the figure and displayed with a ClientPlot widget.
+    `style` is a :class:`Restyle` with the style-only parameters of the closure: the figure of the last render
+    is kept alive (subject to the limits of the figure manager) and, if only these parameters change,
+    its artists are updated in place instead of calling the closure again.
+    The closure sees the rows of `data` selected by the brushes of the other widgets (see :mod:`selection`):
+    the key of the brushes is part of the cache key and the widget is updated when they change.
+    """
+    def decorator(func):
+        sig = inspect.signature(func)
+        fname = "%s.%s" % (func.__module__, func.__name__)
+        opts = repr(sorted((options or {}).items()))
+        # RenderState, created on the first background render.
+        states = []
+        # Figure of the last render for the style-only updates: [key without style, arguments, figure].
+        live = []
+
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            c = render_cache if cache is None else cache
+            timer = tm.RenderTimer(func.__name__)
+            with timer.phase("prepare"):
+                fp = fingerprint(data)
+                sel = sl.selection(data, fp=fp)
+                skey = sel.register(wrapped)
+            if not c.enabled:
+                # The figure stays open and is displayed by the backend.
+                # The previous figure of this widget is reused or closed by the figure manager.
+                with tm.activate(timer), figure_manager.rendering(wrapped), sl.filtering(data, sel, skey):
+                    with timer.phase("plot"):
+                        out = func(*args, **kwargs)
+                    if ct.is_scene(out):
+                        tm.history.add(timer.record())
+                        return ct.client_plot(out.encode())
+                    fig = get_figure(out)
+                    figure_manager.register(fig)
+                    timer.nartists = tm.count_artists(fig)
+                tm.history.add(timer.record())
+                return out
+
+            out_fmt = fmt or ec.pipeline.fmt
+            with timer.phase("prepare"):
+                bound = sig.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = normalize_args(bound.arguments)
+                key = (fp, fname, opts, arguments, ct.backend.enabled, out_fmt, ec.pipeline.key(), skey)
+                base = key if style is None else key[:3] + (style.split(arguments)[0],) + key[4:]
+
+            def store(payload, fmt):
+                timer.nbytes, timer.fmt = len(payload), fmt
+                c.put(key, payload)
+                tm.history.add(timer.record())
+                return payload
+
+            def finish(frame):
+                with tm.activate(timer), timer.phase("encode"):
+                    payload = ec.encode(frame)
+                return store(payload, frame.fmt)
+
+            def restyle():
+                """Update the live figure in place if only the style-only parameters changed. Return the figure or None."""
+                if style is None or not live or live[0] != base: return None
+                fig = live[2]
+                # The figure may have been closed by the figure manager.
+                if not any(f is fig for f in live_figures()): return None
+                with timer.phase("plot"):
+                    if not style.apply(fig, dict(live[1]), dict(arguments)): return None
+                timer.restyled = True
+                return fig
+
+            def render(is_stale=None):
+                """
+                Execute the closure and capture the figure. Return the payload, None if the request is stale
+                or a Future with the payload if the pixels are compressed on the encoder thread.
+                """
+                frame = None
+                with tm.activate(timer), figure_manager.rendering(wrapped):
+                    fig = restyle()
+                    if fig is None:
+                        del live[:]
+                        with timer.phase("plot"), sl.filtering(data, sel, skey):
+                            out = func(*args, **kwargs)
+                        if ct.is_scene(out):
+                            with timer.phase("encode"):
+                                payload = out.encode()
+                            figure_manager.close(wrapped)
+                            return store(payload, "scene")
+                        fig = get_figure(out)
+                        figure_manager.register(fig)
+                    if is_stale is None or not is_stale():
+                        frame = ec.capture(fig, fmt=out_fmt)
+                        timer.nartists = tm.count_artists(fig)
+                    if style is not None:
+                        live[:] = [base, arguments, fig]
+                    else:
+                        figure_manager.close(wrapped)
+                if frame is None: return None
+                if is_stale is None or not ec.pipeline.threaded or frame.data is not None:
+                    return finish(frame)
+                return ec.encoder.submit(finish, frame)
+
+            payload = c.get(key)
+            if payload is not None:
+                timer.nbytes = len(payload)
+                tm.history.add(timer.record(cached=True))
+            if not render_executor.available():
+                if payload is None: payload = render()
+                return display_obj(payload, fmt=out_fmt, width=ec.pipeline.width)
+
+            if not states: states.append(RenderState(func.__name__))
+            state = states[0]
+            if payload is not None:
+                state.supersede()
+                state.show(payload, out_fmt, status="cached, %s" % format_nbytes(len(payload)))
+            else:
+                render_executor.submit(state, render, fmt=out_fmt)
+
+            return state.widget
+
+        wrapped.cache = cache if cache is not None else render_cache
+        return wrapped
+
+    return decorator
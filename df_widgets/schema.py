@@ -0,0 +1,198 @@
+# coding: utf-8
+"""
+Column profile of a DataFrame used to populate the column pickers of the widgets
+and to refuse combinations of hue/row/col that would produce too many levels or facets.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import warnings
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Number of rows above which the cardinality is estimated with HyperLogLog.
+EXACT_NUNIQUE_MAXROWS = 100000
+
+# Soft limit (warning) and hard limit (ValueError) on the number of levels.
+LIMITS = OrderedDict([
+    ("hue", (10, 50)),
+    # Levels of a single row/col variable.
+    ("facet", (8, 20)),
+    # Total number of facets: row levels * col levels.
+    ("grid", (24, 64)),
+    # Levels along the categorical axis of boxplot, barplot ...
+    ("categories", (50, 200)),
+])
+
+
+def approx_nunique(series, p=12):
+    """
+    HyperLogLog estimate of the number of distinct non-null values in `series`
+    with 2**p registers (relative error ~ 1.04 / sqrt(2**p)).
+    """
+    import pandas as pd
+    h = pd.util.hash_pandas_object(series.dropna(), index=False).values
+    if not len(h): return 0
+    m = 1 << p
+    registers = (h >> np.uint64(64 - p)).astype(np.int64)
+    w = h & np.uint64((1 << (64 - p)) - 1)
+    # Position of the leftmost 1-bit in the remaining 64 - p bits.
+    nbits = np.zeros(len(w))
+    nz = w > 0
+    nbits[nz] = np.floor(np.log2(w[nz].astype(float))) + 1
+    rank = (64 - p) - nbits + 1
+    reg = np.zeros(m)
+    np.maximum.at(reg, registers, rank)
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    est = alpha * m * m / np.sum(2.0 ** -reg)
+    zeros = np.count_nonzero(reg == 0)
+    # Small range correction (linear counting).
+    if est <= 2.5 * m and zeros: est = m * np.log(m / zeros)
+    return int(round(est))
+
+
+def _role(series):
+    import pandas as pd
+    if pd.api.types.is_bool_dtype(series): return "categorical"
+    if pd.api.types.is_datetime64_any_dtype(series): return "datetime"
+    if pd.api.types.is_numeric_dtype(series): return "numeric"
+    return "categorical"
+
+
+def _compute_profile(data):
+    import pandas as pd
+    approx = len(data) > EXACT_NUNIQUE_MAXROWS
+    rows = []
+    for name in data.columns:
+        s = data[name]
+        try:
+            nunique = approx_nunique(s) if approx else s.nunique(dropna=True)
+        except TypeError:
+            # Unhashable objects.
+            nunique = len(s)
+        rows.append(OrderedDict([
+            ("column", name),
+            ("dtype", str(s.dtype)),
+            ("role", _role(s)),
+            ("cardinality", nunique),
+            ("approx", approx),
+            ("null_frac", float(s.isna().mean()) if len(s) else 0.0),
+        ]))
+
+    return pd.DataFrame(rows, columns=["column", "dtype", "role", "cardinality", "approx", "null_frac"]).set_index("column")
+
+
+def _schema_profile(source):
+    """Profile of a DataSource computed from the schema. Cardinality and null_frac are unknown (NaN)."""
+    import pandas as pd
+    empty = source.empty
+    rows = [OrderedDict([
+        ("column", name),
+        ("dtype", str(empty[name].dtype)),
+        ("role", _role(empty[name])),
+        ("cardinality", np.nan),
+        ("approx", None),
+        ("null_frac", np.nan),
+    ]) for name in empty.columns]
+    return pd.DataFrame(rows, columns=["column", "dtype", "role", "cardinality", "approx", "null_frac"]).set_index("column")
+
+
+# Cache fingerprint --> profile
+_PROFILES = OrderedDict()
+_MAX_PROFILES = 16
+
+
+def profile(data):
+    """
+    Return DataFrame indexed by column name with dtype, role (numeric, categorical, datetime),
+    cardinality (estimated with HyperLogLog for large frames) and fraction of null values.
+    Only the schema is read for data sources (unknown cardinality).
+    Results are cached with the fingerprint of `data` as key.
+    """
+    from df_widgets.render import fingerprint
+    from df_widgets.sources import is_source
+    key = fingerprint(data)
+    prof = _PROFILES.get(key)
+    if prof is None:
+        prof = _schema_profile(data) if is_source(data) else _compute_profile(data)
+        _PROFILES[key] = prof
+        while len(_PROFILES) > _MAX_PROFILES:
+            _PROFILES.popitem(last=False)
+    else:
+        _PROFILES.move_to_end(key)
+    return prof
+
+
+def column_options(data, kind="any"):
+    """
+    List with the options for a column picker ("None" is the first entry).
+
+    Args:
+        kind: "any" for all the columns, "numeric" for numeric/datetime columns,
+            "hue" or "facet" for columns whose number of levels is below the hard limit,
+            "categorical" for columns that can be used as categorical axis.
+            Non-numeric columns with unknown cardinality (data sources) are accepted
+            and checked by :func:`check_levels` when selected.
+    """
+    prof = profile(data)
+    unknown = prof["cardinality"].isna() & (prof["role"] == "categorical")
+    if kind == "any":
+        mask = np.ones(len(prof), dtype=bool)
+    elif kind == "numeric":
+        mask = prof["role"].isin(["numeric", "datetime"]).values
+    elif kind in ("hue", "facet"):
+        mask = ((prof["cardinality"] <= LIMITS[kind][1]) | unknown).values
+    elif kind == "categorical":
+        mask = ((prof["cardinality"] <= LIMITS["categories"][1]) | (prof["role"] == "numeric") | unknown).values
+    else:
+        raise ValueError("Invalid kind: %s" % str(kind))
+
+    return ["None"] + [c for c, ok in zip(prof.index, mask) if ok]
+
+
+def _check(what, name, nlevels):
+    soft, hard = LIMITS[what]
+    if nlevels > hard:
+        raise ValueError("`%s` has %d levels, more than the %d allowed for %s" % (name, nlevels, hard, what))
+    if nlevels > soft:
+        warnings.warn("`%s` has %d levels (%s). The plot may be slow and hard to read." % (name, nlevels, what))
+
+
+@tm.timed("prepare")
+def check_levels(data, hue=None, col=None, row=None, group=None):
+    """
+    Warn about, or refuse with ValueError, combinations that would explode
+    the number of hue levels, facets or categories.
+    `group` is the column used as categorical axis (boxplot, barplot ...).
+    Unknown cardinalities (data sources) are computed from the selected column.
+    """
+    prof = profile(data)
+
+    def nlevels(c):
+        card = prof.loc[c, "cardinality"]
+        if np.isnan(card):
+            card = prof.loc[c, "cardinality"] = data[c].nunique(dropna=True)
+        return int(card)
+
+    if hue is not None: _check("hue", hue, nlevels(hue))
+    if group is not None: _check("categories", group, nlevels(group))
+    nfacets = 1
+    for c in (col, row):
+        if c is None: continue
+        _check("facet", c, nlevels(c))
+        nfacets *= nlevels(c)
+    if col is not None and row is not None:
+        _check("grid", "%s x %s" % (row, col), nfacets)
+
+
+@tm.timed("prepare")
+def check_categorical(data, x, y, hue=None, orient=None):
+    """
+    :func:`check_levels` for categorical plots.
+    The categorical axis is inferred with the same rules used by seaborn.
+    """
+    from df_widgets.stats import infer_orient
+    group = x if infer_orient(data, x, y, orient) == "v" else y
+    check_levels(data, hue=hue, group=group)
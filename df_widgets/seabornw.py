@@ -46,13 +46,30 @@ JointGrid(x, y[, data, size, ratio, space, ...])	Grid for drawing a bivariate pl
 from __future__ import print_function, division, unicode_literals, absolute_import
 
 import sys
+import numpy as np
 import ipywidgets as ipw
-import seaborn as sns
 import df_widgets.utils as ut
+import df_widgets.render as rn
+import df_widgets.stats as st
+import df_widgets.schema as sc
+import df_widgets.kde as kd
+import df_widgets.raster as rs
+import df_widgets.cluster as cl
+import df_widgets.matrix as mx
+import df_widgets.pairs as pr
+import df_widgets.compact as cp
+import df_widgets.swarm as sw
+import df_widgets.sources as ds
+import df_widgets.facets as fc
+import df_widgets.client as ct
+import df_widgets.styles as sy
+import df_widgets.selection as sl
 
-from functools import wraps
 from collections import OrderedDict
-from IPython.display import display, clear_output
+from IPython.display import display
+
+# seaborn (and scipy, statsmodels) are imported when the first plot is produced.
+sns = ut.LazyModule("seaborn")
 
 __all__ = [
     "api_selector",
@@ -91,6 +108,8 @@ def api_selector(data, funcname="countplot"):
     """
     A widgets with ToogleButtons that allow the user to select and display
     the widget associated to the different seaborn functions.
+    The widget of each function is built on first use and kept alive together with
+    its last output so that switching between functions only changes the visible panel.
     """
     this_module = sys.modules[__name__]
     name2wfunc = OrderedDict()
@@ -100,64 +119,114 @@ def api_selector(data, funcname="countplot"):
         if not callable(func): continue
         name2wfunc[func.__name__] = func
 
-    w1 = ipw.ToggleButtons(description='seaborn API', options=list(name2wfunc.keys()))
-    w1.value = funcname
-    w2 = name2wfunc[funcname](data)
-    box = ipw.VBox(children=[w1, w2])
+    w1 = ipw.ToggleButtons(description='seaborn API', options=list(name2wfunc.keys()), value=funcname)
+    stack = ipw.VBox()
+    # Name of the function --> Output widget containing the interactive widget.
+    panels = OrderedDict()
+
+    def show(name):
+        if name not in panels:
+            out = ipw.Output()
+            with out:
+                name2wfunc[name](data)
+            panels[name] = out
+            stack.children = tuple(panels.values())
+        for k, out in panels.items():
+            out.layout.display = None if k == name else "none"
 
     def on_value_change(change):
-        #print(change)
-        box.close()
-        clear_output()
-        api_selector(data, funcname=change["new"])
+        show(change["new"])
     w1.observe(on_value_change, names='value')
 
+    show(funcname)
+    box = ipw.VBox(children=[w1, stack])
+
     return display(box)
 
 
-@wraps(sns.jointplot)
-def joinplot(data, joint_kws=None, marginal_kws=None, annot_kws=None, **kwargs):
+@ut.lazy_wraps("seaborn", "jointplot")
+def jointplot(data, joint_kws=None, marginal_kws=None, annot_kws=None, **kwargs):
 
-    def sns_joinplot(x, y, kind, color):
+    @rn.cached_render(data, options=dict(joint_kws=joint_kws, marginal_kws=marginal_kws, annot_kws=annot_kws, **kwargs))
+    def sns_jointplot(x, y, kind, color, bw, raster, cmap):
         x, y, color = ut.widget2py(x, y, color)
+        df = cp.compact(data, x, y)
+        if kind == "scatter" and raster:
+            # Joint distribution aggregated on the pixels of the axes and drawn as a single image.
+            g = sns.JointGrid(x, y, data=df, size=6, ratio=5, space=0.2, dropna=True, xlim=None, ylim=None)
+            rs.rasterplot(g.ax_joint, df[x], df[y], cmap=cmap, colorbar=False)
+            g.ax_marg_x.hist(df[x].dropna().values, bins=50, color=color)
+            g.ax_marg_y.hist(df[y].dropna().values, bins=50, color=color, orientation="horizontal")
+            return g
+        if kind == "kde":
+            # Binned KDE computed by df_widgets instead of the direct evaluation done by seaborn.
+            g = sns.JointGrid(x, y, data=df, size=6, ratio=5, space=0.2, dropna=True, xlim=None, ylim=None)
+            return kd.joint_kde(g, df, x, y, bw=bw, color=color)
+
         # TODO: stat_func
-        return sns.jointplot(x, y, data=data, kind=kind, # stat_func=<function pearsonr>,
+        return sns.jointplot(x, y, data=df, kind=kind, # stat_func=<function pearsonr>,
                             color=color, size=6, ratio=5, space=0.2, dropna=True, xlim=None, ylim=None,
                             joint_kws=joint_kws, marginal_kws=marginal_kws, annot_kws=annot_kws, **kwargs)
 
-    allcols = ["None"] + list(data.keys())
+    numcols = sc.column_options(data, "numeric")
+    kind = ipw.Dropdown(options=["scatter", "reg", "resid", "kde", "hex"], value="scatter", description="kind")
+    bw = ut.bw_dropdown()
+    raster = ipw.Checkbox(value=False, description="raster")
+    cmap = ut.colormap_widget(default="viridis")
+
+    def on_kind_change(change):
+        # Show only the controls used by the selected kind.
+        bw.layout.display = None if change["new"] == "kde" else "none"
+        for w in (raster, cmap):
+            w.layout.display = None if change["new"] == "scatter" else "none"
+
+    kind.observe(on_kind_change, names="value")
+    on_kind_change(dict(new=kind.value))
+
     return ipw.interact_manual(
-                sns_joinplot,
-                x=allcols,
-                y=allcols,
-                kind=["scatter", "reg", "resid", "kde", "hex"],
+                sns_jointplot,
+                x=numcols,
+                y=numcols,
+                kind=kind,
                 color=ut.colors_dropdow(),
+                bw=bw,
+                raster=raster,
+                cmap=cmap,
             )
 
 
-@wraps(sns.pairplot)
-def pairplot(data, plot_kws=None, diag_kws=None, grid_kws=None):
-    # TODO: Write widget with multiple checkboxes to implement lists.
+# Old name kept for backward compatibility.
+joinplot = jointplot
 
-    def sns_pairplot(x_vars, y_vars, hue, kind, diag_kind):
-        x_vars, y_vars, hue = ut.widget2py(x_vars, y_vars, hue)
-        return sns.pairplot(data, hue=hue, hue_order=None, palette=None, vars=None, x_vars=x_vars, y_vars=y_vars,
-                     kind=kind, diag_kind=diag_kind, markers=None, size=2.5, aspect=1, dropna=True,
-                     plot_kws=plot_kws, diag_kws=diag_kws, grid_kws=grid_kws)
 
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manul(
+@ut.lazy_wraps("seaborn", "pairplot")
+def pairplot(data, plot_kws=None, diag_kws=None):
+
+    @rn.cached_render(data, options=dict(plot_kws=plot_kws, diag_kws=diag_kws))
+    def sns_pairplot(x_vars, y_vars, hue, kind, diag_kind, max_points):
+        hue, max_points = ut.widget2py(hue, max_points)
+        sc.check_levels(data, hue=hue)
+        # The statistics of each panel are cached so that only the new panels are computed.
+        return pr.pairplot(sl.filter_frame(data), x_vars, y_vars, hue=hue, kind=kind, diag_kind=diag_kind, size=2.5,
+                           max_points=int(max_points) if max_points is not None else None,
+                           plot_kws=plot_kws, diag_kws=diag_kws)
+
+    huecols = sc.column_options(data, "hue")
+    numcols = sc.column_options(data, "numeric")[1:]
+    return ipw.interact_manual(
                 sns_pairplot,
-                x_vars=allcols,
-                y_vars=allcols,
-                hue=allcols,
-                kind=["scatter", "ref"],
+                x_vars=ipw.SelectMultiple(options=numcols, value=numcols[:3], description="x_vars"),
+                y_vars=ipw.SelectMultiple(options=numcols, value=numcols[:3], description="y_vars"),
+                hue=huecols,
+                kind=["scatter", "reg"],
                 diag_kind=["hist", "kde"],
+                # Opt-in subsampling of the off-diagonal panels.
+                max_points=["None", "1000", "5000", "20000"],
             )
 
 
 """
-@wraps(sns.distplot)
+@ut.lazy_wraps("seaborn", "distplot")
 def distplot(data, fit=None, hist_kws=None, kde_kws=None, rug_kws=None, fit_kws=None):
 
     def sns_distplot(hist, kde, rug, color, vertical, norm_hist):
@@ -179,7 +248,7 @@ def distplot(data, fit=None, hist_kws=None, kde_kws=None, rug_kws=None, fit_kws=
             )
 
 
-@wraps(sns.kdeplot)
+@ut.lazy_wraps("seaborn", "kdeplot")
 def kdeplot(data, **kwargs):
 
     def sns_kdeplot()
@@ -200,38 +269,59 @@ def kdeplot(data, **kwargs):
 # Regression plots #
 ####################
 
-@wraps(sns.lmplot)
+@ut.lazy_wraps("seaborn", "lmplot")
 def lmplot(data, scatter_kws=None, line_kws=None):
 
-    def sns_lmplot(x, y, hue, col, row, legend, size):
+    @rn.cached_render(data, options=dict(scatter_kws=scatter_kws, line_kws=line_kws),
+                      style=sy.Restyle(size=sy.resize_facets))
+    def sns_lmplot(x, y, hue, col, row, legend, size, n_boot):
         x, y, hue, col, row = ut.widget2py(x, y, hue, col, row)
-
-        return sns.lmplot(x, y, data, hue=hue, col=col, row=row, palette=None, col_wrap=None,
-                   size=size, aspect=1, markers='o', sharex=True, sharey=True, hue_order=None,
-                   col_order=None, row_order=None, legend=legend, legend_out=True,
+        sc.check_levels(data, hue=hue, col=col, row=row)
+        df = cp.compact(data, x, y, hue, col, row)
+        # Rows of the facets found once. Seaborn receives the same row/col/hue order.
+        part = fc.partition(df, row=row, col=col)
+        row_order, col_order = part.orders()
+        hue_order = st.categorical_order(df[hue])[1] if hue is not None else None
+
+        # Seaborn draws the regression lines, the bootstrap bands are computed by df_widgets in parallel.
+        g = sns.lmplot(x, y, df, hue=hue, col=col, row=row, palette=None, col_wrap=None,
+                   size=size, aspect=1, markers='o', sharex=True, sharey=True, hue_order=hue_order,
+                   col_order=col_order, row_order=row_order, legend=legend, legend_out=True,
                    x_estimator=None, x_bins=None, x_ci='ci', scatter=True, fit_reg=True,
-                   ci=95, n_boot=1000, units=None, order=1, logistic=False, lowess=False, robust=False,
+                   ci=None, n_boot=n_boot, units=None, order=1, logistic=False, lowess=False, robust=False,
                    logx=False, x_partial=None, y_partial=None, truncate=False, x_jitter=None, y_jitter=None,
                    scatter_kws=scatter_kws, line_kws=line_kws)
-
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+        if n_boot:
+            grid = np.linspace(*g.axes.flat[0].get_xlim(), num=100)
+            levels, bands = fc.regression_bands(df, x, y, grid, part, hue=hue, n_boot=n_boot, ci=95)
+            colors, axes = fc.hue_colors(len(levels)), fc.facet_axes(g, part)
+            for (i, j, h), (lo, hi) in bands.items():
+                axes[(i, j)].fill_between(grid, lo, hi, color=colors[h], alpha=0.15, linewidth=0)
+        return g
+
+    facetcols = sc.column_options(data, "facet")
+    huecols = sc.column_options(data, "hue")
+    numcols = sc.column_options(data, "numeric")
+    return ut.interact(
                 sns_lmplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
-                col=allcols,
-                row=allcols,
+                x=numcols,
+                y=numcols,
+                hue=huecols,
+                col=facetcols,
+                row=facetcols,
                 legend=True,
                 size=ut.size_slider(default=5),
+                n_boot=ut.n_boot_slider(default=1000),
             )
 
-@wraps(sns.interactplot)
+@ut.lazy_wraps("seaborn", "interactplot")
 def interactplot(data, contour_kws=None, scatter_kws=None, **kwargs):
 
+    @rn.cached_render(data, options=dict(contour_kws=contour_kws, scatter_kws=scatter_kws, **kwargs))
     def sns_interactplot(x1, x2, y, filled, colorbar, logistic):
+        df = cp.compact(data, x1, x2, y)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.interactplot(x1, x2, y, data=data, filled=filled, cmap='RdBu_r', colorbar=colorbar,
+        return sns.interactplot(x1, x2, y, data=df, filled=filled, cmap='RdBu_r', colorbar=colorbar,
                          levels=30, logistic=logistic, contour_kws=contour_kws, scatter_kws=scatter_kws,
                          ax=ax, **kwargs)
 
@@ -251,46 +341,80 @@ def interactplot(data, contour_kws=None, scatter_kws=None, **kwargs):
 # Categorical plots #
 #####################
 
-@wraps(sns.factorplot)
+@ut.lazy_wraps("seaborn", "factorplot")
 def factorplot(data, facet_kws=None, **kwargs):
 
-    def sns_factorplot(x, y, hue, color, kind, size, legend):
-        x, y, hue, color = ut.widget2py(x, y, hue, color)
-        return sns.factorplot(x=x, y=y, hue=hue, data=data, row=None, col=None, col_wrap=None, # estimator=<function mean>,
-                       ci=95, n_boot=1000, units=None, order=None, hue_order=None, row_order=None, col_order=None,
-                       kind=kind, size=size, aspect=1, orient=None, color=color, palette=None,
+    @rn.cached_render(data, options=dict(facet_kws=facet_kws, **kwargs), style=sy.Restyle(size=sy.resize_facets))
+    def sns_factorplot(x, y, hue, col, row, color, kind, size, legend, estimator, n_boot):
+        x, y, hue, col, row, color = ut.widget2py(x, y, hue, col, row, color)
+        sc.check_categorical(data, x, y, hue=hue)
+        sc.check_levels(data, col=col, row=row)
+        df = cp.compact(data, x, y, hue, col, row)
+        part = fc.partition(df, row=row, col=col)
+        row_order, col_order = part.orders()
+        if kind not in ("point", "bar"):
+            return sns.factorplot(x=x, y=y, hue=hue, data=df, row=row, col=col, col_wrap=None,
+                           units=None, order=None, hue_order=None, row_order=row_order, col_order=col_order,
+                           kind=kind, size=size, aspect=1, orient=None, color=color, palette=None,
+                           legend=legend, legend_out=True, sharex=True, sharey=True, margin_titles=False,
+                           facet_kws=facet_kws, **kwargs)
+
+        # Precompute estimates and error bars of all the facets in parallel (batched pass per facet).
+        cis = fc.grouped_ci(df, x, y, part, hue=hue, estimator=estimator, n_boot=n_boot, ci=95)
+        ci = next(iter(cis.values()))
+        g = sns.factorplot(x=x, y=y, hue=hue, data=df, row=row, col=col, col_wrap=None,
+                       estimator=st.ESTIMATORS[estimator], ci=None, n_boot=n_boot, units=None,
+                       order=ci.order, hue_order=ci.hue_order, row_order=row_order, col_order=col_order,
+                       kind=kind, size=size, aspect=1, orient=ci.orient, color=color, palette=None,
                        legend=legend, legend_out=True, sharex=True, sharey=True, margin_titles=False,
                        facet_kws=facet_kws, **kwargs)
-
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+        for ij, ax in fc.facet_axes(g, part).items():
+            cis[ij].draw(ax, dodge=kind == "bar")
+        return g
+
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    facetcols = sc.column_options(data, "facet")
+    return ut.interact(
                 sns_factorplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
+                col=facetcols,
+                row=facetcols,
                 color=ut.colors_dropdow(),
                 kind=["point", "bar", "count", "box", "violin", "strip"],
                 size=ut.size_slider(default=4),
                 legend=True,
+                estimator=ut.estimator_dropdown(),
+                n_boot=ut.n_boot_slider(default=1000),
             )
 
 
-@wraps(sns.boxplot)
+@ut.lazy_wraps("seaborn", "boxplot")
 def boxplot(data, **kwargs):
 
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_faces, saturation=sy.recolor_faces))
     def sns_boxplot(x, y, hue, orient, color, saturation, notch):
         x, y, hue, orient, color = ut.widget2py(x, y, hue, orient, color)
+        sc.check_categorical(data, x, y, hue=hue, orient=orient)
+        df = cp.compact(data, x, y, hue)
+        if ct.backend.enabled:
+            # Quartiles and whiskers computed by df_widgets, drawn by the browser.
+            vs = kd.ViolinStats(df, x, y, hue=hue, orient=orient)
+            return ct.boxes(vs, hue=hue, color=color, saturation=saturation)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.boxplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None, orient=orient,
+        return sns.boxplot(x=x, y=y, hue=hue, data=df, order=None, hue_order=None, orient=orient,
                           color=color, palette=None, saturation=saturation, width=0.8, fliersize=5, linewidth=None,
                           whis=1.5, notch=notch, ax=ax, **kwargs)
 
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_boxplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
                 orient=["None", "v", "h"],
                 color=ut.colors_dropdow(),
                 saturation=ut.saturation_slider(default=0.75),
@@ -298,25 +422,31 @@ def boxplot(data, **kwargs):
             )
 
 
-@wraps(sns.violinplot)
+@ut.lazy_wraps("seaborn", "violinplot")
 def violinplot(data, **kwargs):
 
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_faces, saturation=sy.recolor_faces))
     def sns_violinplot(x, y, hue, bw, scale, inner, split, orient, color, saturation):
         x, y, hue, inner, orient, color = ut.widget2py(x, y, hue, inner, orient, color)
+        sc.check_categorical(data, x, y, hue=hue, orient=orient)
+        df = cp.compact(data, x, y, hue)
+        if ct.backend.enabled:
+            vs = kd.ViolinStats(df, x, y, hue=hue, orient=orient, bw=bw, cut=2, gridsize=100)
+            return ct.violins(vs, hue=hue, color=color, saturation=saturation, scale=scale)
         ax, fig, _ = ut.get_ax_fig_plt()
-
-        sns.violinplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None,
-                       bw=bw, cut=2, scale=scale, scale_hue=True,
-                       gridsize=100, width=0.8, inner=inner, split=split, orient=orient,
-                       linewidth=None, color=color, palette=None, saturation=saturation, ax=ax, **kwargs)
-
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+        # The densities are computed by df_widgets with the binned KDE and cached.
+        return kd.violinplot(ax, df, x=x, y=y, hue=hue, orient=orient, bw=bw, cut=2, scale=scale,
+                             inner=inner, split=split, color=color, saturation=saturation, width=0.8,
+                             gridsize=100, **kwargs)
+
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_violinplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
-                bw=["scott", "silverman", "float"],
+                x=catcols,
+                y=catcols,
+                hue=huecols,
+                bw=ut.bw_dropdown(),
                 scale=["area", "count", "width"],
                 inner=["box", "quartile", "point", "stick", "None"],
                 split=False,
@@ -326,22 +456,27 @@ def violinplot(data, **kwargs):
             )
 
 
-@wraps(sns.stripplot)
+@ut.lazy_wraps("seaborn", "stripplot")
 def stripplot(data, **kwargs):
 
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_markers, size=sy.resize_markers,
+                                                             linewidth=sy.marker_linewidth))
     def sns_stripplot(x, y, hue, split, orient, color, size, linewidth):
         x, y, hue, orient, color = ut.widget2py(x, y, hue, orient, color)
+        sc.check_categorical(data, x, y, hue=hue, orient=orient)
+        df = cp.compact(data, x, y, hue)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.stripplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None, jitter=False,
+        return sns.stripplot(x=x, y=y, hue=hue, data=df, order=None, hue_order=None, jitter=False,
                             split=split, orient=orient, color=color, palette=None, size=size, edgecolor='gray',
                             linewidth=linewidth, ax=ax, **kwargs)
 
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_stripplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
                 split=False,
                 orient=["None", "v", "h"],
                 color=ut.colors_dropdow(),
@@ -350,91 +485,150 @@ def stripplot(data, **kwargs):
             )
 
 
-@wraps(sns.swarmplot)
+@ut.lazy_wraps("seaborn", "swarmplot")
 def swarmplot(data, **kwargs):
 
-    def sns_swarmplot(x, y, hue, split, orient, color, size, linewidth):
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_markers, linewidth=sy.marker_linewidth))
+    def sns_swarmplot(x, y, hue, split, orient, color, size, linewidth, budget, overflow):
         x, y, hue, orient, color = ut.widget2py(x, y, hue, orient, color)
+        sc.check_categorical(data, x, y, hue=hue, orient=orient)
+        df = cp.compact(data, x, y, hue)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.swarmplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None,
-                            split=split, orient=orient, color=color, palette=None, size=size,
-                            edgecolor='gray', linewidth=linewidth, ax=ax, **kwargs)
-
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+        # The layout is computed by df_widgets so that large categories can be subsampled.
+        return sw.swarmplot(ax, df, x=x, y=y, hue=hue, orient=orient, color=color, size=size,
+                            linewidth=linewidth, edgecolor='gray', split=split,
+                            budget=budget, overflow=overflow, **kwargs)
+
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_swarmplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
                 split=False,
                 orient=["None", "v", "h"],
                 color=ut.colors_dropdow(),
                 size=ut.size_slider(default=5),
                 linewidth=ut.linewidth_slider(default=0),
+                budget=ut.budget_slider(default=2000),
+                overflow=["subsample", "strip"],
             )
 
 
-@wraps(sns.pointplot)
+@ut.lazy_wraps("seaborn", "pointplot")
 def pointplot(data, **kwargs):
 
-    def sns_pointplot(x, y, hue, split, join, orient, color, linewidth):
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_markers))
+    def sns_pointplot(x, y, hue, split, join, orient, color, linewidth, estimator, n_boot):
         x, y, hue, orient, color = ut.widget2py(x, y, hue, orient, color)
+        sc.check_categorical(data, x, y, hue=hue, orient=orient)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.pointplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None, # estimator=<function mean>,
-                            ci=95, n_boot=1000, units=None, markers='o', linestyles='-', dodge=False, join=join, scale=1,
-                            orient=orient, color=color, palette=None, ax=ax, errwidth=None, capsize=None, **kwargs)
-
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+        if ds.is_source(data) and not sl.filtered(data) and estimator in ds.STREAMING_ESTIMATORS and None not in (x, y):
+            # Out-of-core data: estimates from chunked aggregates, normal-approximation intervals.
+            ci = ds.grouped_estimates(data, x, y, hue=hue, orient=orient, estimator=estimator, ci=95)
+            df = ds.estimates_frame(ci, x, y, hue=hue)
+            # One row per group: the identity estimator plots the precomputed estimates.
+            func = np.mean
+        else:
+            df = cp.compact(data, x, y, hue)
+            ci = st.GroupedCI(df, x, y, hue=hue, orient=orient, estimator=estimator, n_boot=n_boot, ci=95)
+            func = st.ESTIMATORS[estimator]
+        sns.pointplot(x=x, y=y, hue=hue, data=df, order=ci.order, hue_order=ci.hue_order,
+                      estimator=func, ci=None, n_boot=n_boot, units=None, markers='o',
+                      linestyles='-', dodge=False, join=join, scale=1,
+                      orient=ci.orient, color=color, palette=None, ax=ax, errwidth=None, capsize=None, **kwargs)
+        return ci.draw(ax, dodge=False)
+
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_pointplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
                 split=False,
                 join=True,
                 orient=["None", "v", "h"],
                 color=ut.colors_dropdow(),
                 linewidth=ut.linewidth_slider(default=0),
+                estimator=ut.estimator_dropdown(),
+                n_boot=ut.n_boot_slider(default=1000),
             )
 
 
-@wraps(sns.barplot)
+@ut.lazy_wraps("seaborn", "barplot")
 def barplot(data, **kwargs):
 
-    def sns_barplot(x, y, hue, orient, color, saturation):
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_faces, saturation=sy.recolor_faces))
+    def sns_barplot(x, y, hue, orient, color, saturation, estimator, n_boot):
         x, y, hue, orient, color = ut.widget2py(x, y, hue, orient, color)
+        sc.check_categorical(data, x, y, hue=hue, orient=orient)
+        if ds.is_source(data) and not sl.filtered(data) and estimator in ds.STREAMING_ESTIMATORS and None not in (x, y):
+            # Out-of-core data: estimates from chunked aggregates, normal-approximation intervals.
+            ci = ds.grouped_estimates(data, x, y, hue=hue, orient=orient, estimator=estimator, ci=95)
+            df = ds.estimates_frame(ci, x, y, hue=hue)
+            # One row per group: the identity estimator plots the precomputed estimates.
+            func = np.mean
+        else:
+            df = cp.compact(data, x, y, hue)
+            ci = st.GroupedCI(df, x, y, hue=hue, orient=orient, estimator=estimator, n_boot=n_boot, ci=95)
+            func = st.ESTIMATORS[estimator]
+        if ct.backend.enabled:
+            value, group = (y, x) if ci.orient == "v" else (x, y)
+            return ct.bars(ci, group, value, hue=hue, color=color, saturation=saturation)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.barplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None, # estimator=<function mean>,
-                           ci=95, n_boot=1000, units=None, orient=orient, color=color, palette=None,
-                           saturation=saturation, errcolor='.26', ax=ax, **kwargs) # errwidth=None, capsize=None, # New args added in ??
-
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+        sns.barplot(x=x, y=y, hue=hue, data=df, order=ci.order, hue_order=ci.hue_order,
+                    estimator=func, ci=None, n_boot=n_boot, units=None, orient=ci.orient,
+                    color=color, palette=None, saturation=saturation, errcolor='.26', ax=ax, **kwargs)
+        return ci.draw(ax, width=0.8, dodge=True, color='.26')
+
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_barplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
                 orient=["None", "v", "h"],
                 color=ut.colors_dropdow(),
                 saturation=ut.saturation_slider(default=0.75),
+                estimator=ut.estimator_dropdown(),
+                n_boot=ut.n_boot_slider(default=1000),
             )
 
 
-@wraps(sns.countplot)
+@ut.lazy_wraps("seaborn", "countplot")
 def countplot(data, **kwargs):
 
+    @rn.cached_render(data, options=kwargs, style=sy.Restyle(color=sy.recolor_faces, saturation=sy.recolor_faces))
     def sns_countplot(x, y, hue, color, saturation):
         x, y, hue, color = ut.widget2py(x, y, hue, color)
+        sc.check_levels(data, hue=hue, group=x if x is not None else y)
+        if ct.backend.enabled and (x is None) != (y is None):
+            counts = (ds.grouped_counts(data, x, y, hue=hue) if ds.is_source(data) and not sl.filtered(data) else
+                      st.grouped_counts(cp.compact(data, x, y, hue), x, y, hue=hue))
+            return ct.bars(counts, x or y, "count", hue=hue, color=color, saturation=saturation)
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.countplot(x=x, y=y, hue=hue, data=data, order=None, hue_order=None, orient=None,
+        if ds.is_source(data) and not sl.filtered(data) and (x is None) != (y is None):
+            # Out-of-core data: counts from chunked aggregates drawn as bars.
+            counts = ds.grouped_counts(data, x, y, hue=hue)
+            df = ds.estimates_frame(counts, x, y, hue=hue, value="count")
+            ax = sns.barplot(x=x or "count", y=y or "count", hue=hue, data=df, order=counts.order,
+                             hue_order=counts.hue_order, orient=counts.orient, ci=None, color=color, palette=None,
+                             saturation=saturation, ax=ax, **kwargs)
+            return ax
+        df = cp.compact(data, x, y, hue)
+        return sns.countplot(x=x, y=y, hue=hue, data=df, order=None, hue_order=None, orient=None,
                              color=color, palette=None, saturation=saturation, ax=ax, **kwargs)
 
-    allcols = ["None"] + list(data.keys())
-    return ipw.interact_manual(
+    catcols = sc.column_options(data, "categorical")
+    huecols = sc.column_options(data, "hue")
+    return ut.interact(
                 sns_countplot,
-                x=allcols,
-                y=allcols,
-                hue=allcols,
+                x=catcols,
+                y=catcols,
+                hue=huecols,
                 color=ut.colors_dropdow(),
                 saturation=ut.saturation_slider(default=0.75),
             )
@@ -443,30 +637,64 @@ def countplot(data, **kwargs):
 # Matrix plots #
 ################
 
-@wraps(sns.heatmap)
+# Options of seaborn.heatmap that cannot be applied to the image drawn by matrix.heatmap.
+_SNS_HEATMAP_ONLY = ("linewidths", "linecolor", "square", "xticklabels", "yticklabels", "mask", "cbar_ax")
+
+
+@ut.lazy_wraps("seaborn", "heatmap")
 def heatmap(data, annot_kws=None, cbar_kws=None, **kwargs):
+    # cmap, robust and annot are controlled by widgets: the values passed by the caller are the defaults.
+    cmap = kwargs.pop("cmap", "viridis")
+    robust, annot = kwargs.pop("robust", False), kwargs.pop("annot", False)
 
-    def sns_heatmap():
+    @rn.cached_render(data, options=dict(annot_kws=annot_kws, cbar_kws=cbar_kws, **kwargs))
+    def sns_heatmap(how, cmap, robust, annot, rows, cols):
         ax, fig, _ = ut.get_ax_fig_plt()
-        return sns.heatmap(data, vmin=None, vmax=None, cmap=None, center=None, robust=False, annot=None,
-                           fmt='.2g', annot_kws=annot_kws, linewidths=0, linecolor='white', cbar=True,
-                           cbar_kws=cbar_kws, cbar_ax=None, square=False, ax=ax,
-                           xticklabels=True, yticklabels=True, mask=None, **kwargs)
-
+        opts = dict(vmin=None, vmax=None, center=None, fmt='.2g', cbar=True)
+        opts.update(kwargs)
+        if any(k in kwargs for k in _SNS_HEATMAP_ONLY):
+            # Cell-level options: seaborn draws the selected block.
+            (r0, r1), (c0, c1) = rows, cols
+            return sns.heatmap(numdata.iloc[r0:r1, c0:c1], cmap=cmap, robust=robust, annot=annot,
+                               cbar_kws=cbar_kws, annot_kws=annot_kws, ax=ax, **opts)
+        # Drawn by df_widgets with a single image reduced to the resolution of the axes.
+        return mx.heatmap(ax, numdata, how=how, cmap=cmap, robust=robust, annot=annot, rows=rows, cols=cols,
+                          cbar_kws=cbar_kws, annot_kws=annot_kws, **opts)
+
+    numdata = data.select_dtypes(include=["number"])
+    nrows, ncols = numdata.shape
     return ipw.interact_manual(
                 sns_heatmap,
+                how=["mean", "max"],
+                cmap=ut.colormap_widget(default=getattr(cmap, "name", cmap)),
+                robust=bool(robust),
+                annot=bool(annot),
+                rows=ipw.IntRangeSlider(value=[0, nrows], min=0, max=nrows, description="rows"),
+                cols=ipw.IntRangeSlider(value=[0, ncols], min=0, max=ncols, description="cols"),
             )
 
 
-@wraps(sns.clustermap)
+@ut.lazy_wraps("seaborn", "clustermap")
 def clustermap(data, pivot_kws=None, cbar_kws=None, **kwargs):
 
-    def sns_clustermap():
-        return sns.clustermap(data, pivot_kws=pivot_kws, method='average', metric='euclidean',
-                              z_score=None, standard_scale=None, figsize=None, cbar_kws=cbar_kws,
-                              row_cluster=True, col_cluster=True, row_linkage=None, col_linkage=None,
+    @rn.cached_render(data, options=dict(pivot_kws=pivot_kws, cbar_kws=cbar_kws, **kwargs))
+    def sns_clustermap(method, metric, z_score, standard_scale, max_rows):
+        z_score, standard_scale, max_rows = ut.widget2py(z_score, standard_scale, max_rows)
+        numdata = data.select_dtypes(include=["number"])
+        # Linkages are computed (and cached) by df_widgets. seaborn only draws the figure.
+        opts = dict(method=method, metric=metric, z_score=z_score, standard_scale=standard_scale)
+        row_linkage = cl.linkage(numdata, axis=0, max_rows=max_rows, **opts)
+        col_linkage = cl.linkage(numdata, axis=1, **opts)
+        return sns.clustermap(numdata, pivot_kws=pivot_kws, method=method, metric=metric,
+                              z_score=z_score, standard_scale=standard_scale, figsize=None, cbar_kws=cbar_kws,
+                              row_cluster=True, col_cluster=True, row_linkage=row_linkage, col_linkage=col_linkage,
                               row_colors=None, col_colors=None, mask=None, **kwargs)
 
     return ipw.interact_manual(
                 sns_clustermap,
+                method=cl.METHODS,
+                metric=cl.METRICS,
+                z_score=["None", 0, 1],
+                standard_scale=["None", 0, 1],
+                max_rows=ipw.Dropdown(options=["None", 1000, 2000, 5000, 10000], value=5000, description="max_rows"),
             )
@@ -0,0 +1,287 @@
+# coding: utf-8
+"""
+Linked brushing: selections shared by the widgets of the same DataFrame.
+
+A :class:`Selection` holds the brushes of a frame (a range of a numeric column or a set
+of levels of a categorical column). Each brush has an owner (a widget or a brush control)
+and filters the rows seen by all the other widgets of the frame (not by its owner).
+The masks are computed without pandas indexing: ranges with `searchsorted` on a sorted index
+of the column (built once), levels with a lookup table indexed by the category codes (built once).
+
+The widgets receive the filtered rows through :func:`df_widgets.compact.compact`: the key of the
+active brushes is part of the key of the render cache, so when a brush changes only the widgets
+whose filter changed are rendered again and previous selections are served from the cache.
+
+Usage:
+
+    from df_widgets.selection import brush
+    f = barplot(df)
+    display(brush(df, "day", owner=f))      # Selecting days in f filters the other widgets of df.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import weakref
+import threading
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Cache fingerprint --> Selection
+_SELECTIONS = OrderedDict()
+_MAX_SELECTIONS = 16
+
+# Cache (fingerprint, columns, key) --> filtered frame
+_FRAMES = OrderedDict()
+_MAX_FRAMES = 8
+
+# Max number of positions of the range slider of the datetime columns.
+MAX_DATETIME_STEPS = 200
+
+_local = threading.local()
+
+
+class Selection(object):
+    """
+    Brushes of a DataFrame (or DataSource).
+    `filters` maps (owner, column) --> spec where spec is ("range", lo, hi) or ("levels", tuple_of_levels).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.filters = OrderedDict()
+        self._index = {}
+        self._codes = {}
+        self._masks = OrderedDict()
+        # Widgets rendered with this selection --> key of the filters they have seen.
+        self._seen = weakref.WeakKeyDictionary()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return "<%s: %d rows, %d filters, %d widgets>" % (
+            self.__class__.__name__, len(self.data), len(self.filters), len(self._seen))
+
+    def sorted_index(self, column):
+        """(order, sorted values, number of finite values) of `column`. NaNs are at the end."""
+        from df_widgets.decimate import _as_float
+        with self._lock:
+            entry = self._index.get(column)
+            if entry is None:
+                with tm.phase("prepare"):
+                    values = _as_float(self.data[column])
+                    order = np.argsort(values, kind="stable")
+                    svalues = values[order]
+                    entry = (order, svalues, int(np.count_nonzero(np.isfinite(values))))
+                self._index[column] = entry
+            return entry
+
+    def category_codes(self, column):
+        """(codes, levels) of `column` with the order used by the plots."""
+        from df_widgets.stats import categorical_order
+        with self._lock:
+            entry = self._codes.get(column)
+            if entry is None:
+                with tm.phase("prepare"):
+                    entry = categorical_order(self.data[column])
+                self._codes[column] = entry
+            return entry
+
+    def _to_float(self, column, values):
+        """Convert the bounds of a range to the units of the sorted index (ns for datetimes)."""
+        import pandas as pd
+        from df_widgets.decimate import _as_float
+        if pd.api.types.is_datetime64_any_dtype(self.data.dtypes[column]):
+            return _as_float(pd.Series(pd.to_datetime(list(values))))
+        return np.asarray(values, dtype=float)
+
+    def filter_mask(self, column, spec):
+        """Boolean mask of the rows selected by the filter `spec` on `column`."""
+        n = len(self.data)
+        if spec[0] == "range":
+            order, svalues, nfinite = self.sorted_index(column)
+            lo, hi = self._to_float(column, spec[1:])
+            i0 = np.searchsorted(svalues[:nfinite], lo, side="left")
+            i1 = np.searchsorted(svalues[:nfinite], hi, side="right")
+            mask = np.zeros(n, dtype=bool)
+            mask[order[i0:i1]] = True
+            return mask
+        if spec[0] == "levels":
+            codes, levels = self.category_codes(column)
+            # Lookup table with an extra False entry for the missing values (code -1).
+            lut = np.zeros(len(levels) + 1, dtype=bool)
+            selected = set(spec[1])
+            lut[[i for i, level in enumerate(levels) if level in selected]] = True
+            return lut[codes]
+        raise ValueError("Invalid filter: %s" % str(spec))
+
+    def key(self, exclude=None):
+        """Hashable key with the filters of the owners other than `exclude`."""
+        with self._lock:
+            items = set((c, spec) for (owner, c), spec in self.filters.items() if owner is not exclude)
+        return tuple(sorted(items, key=repr))
+
+    def mask(self, key):
+        """Boolean mask of the rows selected by all the filters in `key`. None if key is empty."""
+        if not key: return None
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+        with tm.phase("prepare"):
+            mask = np.ones(len(self.data), dtype=bool)
+            for column, spec in key:
+                mask &= self.filter_mask(column, spec)
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > 8:
+                self._masks.popitem(last=False)
+        return mask
+
+    def register(self, owner):
+        """Register the widget `owner` rendered with this selection. Return the key of the filters it sees."""
+        key = self.key(exclude=owner)
+        with self._lock:
+            self._seen[owner] = key
+        return key
+
+    def select_range(self, owner, column, lo, hi):
+        """Select the rows with lo <= column <= hi."""
+        self._set(owner, column, ("range", lo, hi))
+
+    def select_levels(self, owner, column, levels):
+        """Select the rows whose `column` is in `levels`."""
+        self._set(owner, column, ("levels", tuple(levels)))
+
+    def clear(self, owner=None, column=None):
+        """Remove the filters of `owner` on `column` (all the owners/columns if None)."""
+        with self._lock:
+            for o, c in list(self.filters.keys()):
+                if (owner is None or o is owner) and (column is None or c == column): del self.filters[(o, c)]
+        self.notify(owner)
+
+    def _set(self, owner, column, spec):
+        with self._lock:
+            if self.filters.get((owner, column)) == spec: return
+            self.filters[(owner, column)] = spec
+        self.notify(owner)
+
+    def notify(self, source=None):
+        """Update the widgets (other than `source`) whose filters changed since their last render."""
+        with self._lock:
+            stale = [o for o, key in list(self._seen.items()) if o is not source and self.key(exclude=o) != key]
+        for owner in stale:
+            widget = getattr(owner, "widget", None)
+            if widget is not None: widget.update()
+
+
+def selection(data, fp=None):
+    """Return the (cached) :class:`Selection` of `data`. `fp` is the fingerprint of data (computed if None)."""
+    from df_widgets.render import fingerprint
+    key = fingerprint(data) if fp is None else fp
+    sel = _SELECTIONS.get(key)
+    if sel is None:
+        sel = _SELECTIONS[key] = Selection(data)
+        while len(_SELECTIONS) > _MAX_SELECTIONS:
+            _SELECTIONS.popitem(last=False)
+    else:
+        _SELECTIONS.move_to_end(key)
+    return sel
+
+
+@contextmanager
+def filtering(data, sel, key):
+    """Restrict `data` to the rows selected by the filters in `key` in the renders of the current thread."""
+    prev = getattr(_local, "active", None)
+    _local.active = (data, sel, key) if key else None
+    try:
+        yield
+    finally:
+        _local.active = prev
+
+
+def filtered(data):
+    """True if the rows of `data` are restricted by a selection in the current render."""
+    active = getattr(_local, "active", None)
+    return active is not None and active[0] is data
+
+
+def filter_frame(data, frame=None, columns=()):
+    """
+    Return `frame` (DataFrame with the rows of `data`, default: `data`) restricted to the rows
+    selected in the current render. The filtered frames are cached with the key of the filters.
+    """
+    from df_widgets.render import fingerprint
+    from df_widgets.sources import is_source
+    if frame is None: frame = data
+    if not filtered(data): return frame
+    _, sel, key = _local.active
+    if is_source(frame): frame = frame.load()
+    ckey = (fingerprint(data), tuple(columns), key)
+    out = _FRAMES.get(ckey)
+    if out is not None:
+        _FRAMES.move_to_end(ckey)
+        return out
+    with tm.phase("prepare"):
+        out = frame.take(np.flatnonzero(sel.mask(key)))
+    _FRAMES[ckey] = out
+    while len(_FRAMES) > _MAX_FRAMES:
+        _FRAMES.popitem(last=False)
+    return out
+
+
+def brush(data, column, owner=None, description=None):
+    """
+    Control to select the rows of `data`: range slider for numeric and datetime columns, multiple selection
+    for the other columns. `owner` is the widget function whose selection is controlled
+    (the widgets returned by the wrappers). The brush filters all the widgets of `data` but its owner.
+    """
+    import pandas as pd
+    import ipywidgets as ipw
+    sel = selection(data)
+    dtype = data.dtypes[column]
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        # At most MAX_DATETIME_STEPS positions taken from the sorted values (NaT excluded).
+        _, svalues, nfinite = sel.sorted_index(column)
+        svalues = svalues[:nfinite]
+        svalues = svalues[svalues != float(np.iinfo(np.int64).min)]
+        if len(svalues):
+            tz = getattr(dtype, "tz", None)
+            pos = np.linspace(0, len(svalues) - 1, min(len(svalues), MAX_DATETIME_STEPS)).astype(np.int64)
+            stamps = pd.to_datetime(np.unique(svalues[pos]).astype(np.int64), utc=tz is not None)
+            if tz is not None: stamps = stamps.tz_convert(tz)
+        else:
+            stamps = pd.to_datetime([0])
+        options = [(str(t), t) for t in stamps]
+        w = ipw.SelectionRangeSlider(options=options, index=(0, len(options) - 1),
+                                     description=description or str(column), continuous_update=False)
+    elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        _, svalues, nfinite = sel.sorted_index(column)
+        vmin, vmax = (float(svalues[0]), float(svalues[nfinite - 1])) if nfinite else (0.0, 1.0)
+        w = ipw.FloatRangeSlider(value=[vmin, vmax], min=vmin, max=vmax, step=(vmax - vmin) / 200 or 1,
+                                 description=description or str(column), continuous_update=False)
+    else:
+        _, levels = sel.category_codes(column)
+        w = ipw.SelectMultiple(options=[(str(l), l) for l in levels], value=(), description=description or str(column))
+    if owner is None: owner = w
+
+    def on_change(change):
+        value = change["new"]
+        if isinstance(w, ipw.SelectionRangeSlider):
+            if tuple(w.index) == (0, len(w.options) - 1):
+                sel.clear(owner, column)
+            else:
+                sel.select_range(owner, column, *value)
+        elif isinstance(w, ipw.FloatRangeSlider):
+            if tuple(value) == (w.min, w.max):
+                sel.clear(owner, column)
+            else:
+                sel.select_range(owner, column, *value)
+        elif not value:
+            sel.clear(owner, column)
+        else:
+            sel.select_levels(owner, column, value)
+
+    w.observe(on_change, names="value")
+    return w
@@ -0,0 +1,440 @@
+# coding: utf-8
+"""
+Lazy data sources for frames that do not fit in memory.
+
+A :class:`DataSource` can be passed to the widgets in place of a DataFrame. The column pickers
+only use the schema, each render loads the selected columns (cached with a size-bounded LRU)
+and countplot, barplot and histograms can be computed with chunked streaming aggregates.
+
+Usage:
+
+    src = open_source("data.parquet")
+    boxplot(src)
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import hashlib
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+# Number of rows of the chunks used by the streaming aggregates.
+CHUNKSIZE = 1000000
+
+# Estimators of barplot that can be computed from (count, sum, sum of squares).
+STREAMING_ESTIMATORS = ["mean", "sum", "std"]
+
+
+def is_source(obj):
+    return isinstance(obj, DataSource)
+
+
+class DataSource(object):
+    """
+    Base class. Subclasses implement `_schema` (empty DataFrame with the dtypes), `_nrows`,
+    `_read(columns)` and `_iter_chunks(columns, chunksize)`.
+    Loaded columns are cached until their size exceeds `cache_bytes`.
+    """
+
+    def __init__(self, path, cache_bytes=1024 ** 3):
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self._loaded = OrderedDict()
+        self._empty = None
+        self._len = None
+
+    def __repr__(self):
+        return "<%s %s: %d rows, %d columns>" % (self.__class__.__name__, self.path, len(self), len(self.columns))
+
+    @property
+    def empty(self):
+        """DataFrame with zero rows and the dtypes of the source."""
+        if self._empty is None: self._empty = self._schema()
+        return self._empty
+
+    @property
+    def columns(self):
+        return self.empty.columns
+
+    @property
+    def dtypes(self):
+        return self.empty.dtypes
+
+    def __len__(self):
+        if self._len is None: self._len = int(self._nrows())
+        return self._len
+
+    def keys(self):
+        return self.columns
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def fingerprint(self):
+        """Hash of the path, size and modification time of the file(s)."""
+        h = hashlib.sha1()
+        paths = self.path if isinstance(self.path, (list, tuple)) else [self.path]
+        for p in paths:
+            st = os.stat(p)
+            h.update(repr((os.path.abspath(p), st.st_size, st.st_mtime)).encode("utf-8"))
+        h.update(repr(getattr(self, "key", None)).encode("utf-8"))
+        return h.hexdigest()
+
+    def load(self, columns=None):
+        """DataFrame with `columns` (default: all). Only the columns that are not cached are read."""
+        import pandas as pd
+        columns = list(self.columns) if columns is None else list(columns)
+        unknown = [c for c in columns if c not in self.columns]
+        if unknown: raise KeyError("Columns not in %s: %s" % (self.path, unknown))
+        missing = [c for c in columns if c not in self._loaded]
+        if missing:
+            with tm.phase("prepare"):
+                frame = self._read(missing)
+            for c in missing:
+                self._loaded[c] = frame[c]
+        for c in columns:
+            self._loaded.move_to_end(c)
+        out = pd.DataFrame(OrderedDict((c, self._loaded[c]) for c in columns), copy=False)
+        self._evict(keep=columns)
+        return out
+
+    def _evict(self, keep=()):
+        nbytes = lambda s: s.memory_usage(index=False, deep=False)
+        total = sum(nbytes(s) for s in self._loaded.values())
+        for c in list(self._loaded.keys()):
+            if total <= self.cache_bytes: break
+            if c in keep: continue
+            total -= nbytes(self._loaded.pop(c))
+
+    def clear(self):
+        """Release the loaded columns."""
+        self._loaded.clear()
+
+    def __getitem__(self, key):
+        if isinstance(key, (list, tuple)): return self.load(key)
+        return self.load([key])[key]
+
+    def select_dtypes(self, include=None, exclude=None):
+        """Load the columns selected with the rules of `DataFrame.select_dtypes`."""
+        return self.load(list(self.empty.select_dtypes(include=include, exclude=exclude).columns))
+
+    def iter_chunks(self, columns, chunksize=CHUNKSIZE):
+        """Iterate over DataFrames with `columns` and at most `chunksize` rows."""
+        return self._iter_chunks(list(columns), chunksize)
+
+
+class ParquetSource(DataSource):
+    """Parquet file read with pyarrow. Chunks are record batches."""
+
+    def _file(self):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(self.path)
+
+    def _schema(self):
+        return self._file().schema_arrow.empty_table().to_pandas()
+
+    def _nrows(self):
+        return self._file().metadata.num_rows
+
+    def _read(self, columns):
+        return self._file().read(columns=columns).to_pandas()
+
+    def _iter_chunks(self, columns, chunksize):
+        for batch in self._file().iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+
+
+class FeatherSource(DataSource):
+    """Feather (Arrow IPC) file. The file is memory-mapped."""
+
+    def _table(self, columns=None):
+        import pyarrow.feather as feather
+        return feather.read_table(self.path, columns=columns, memory_map=True)
+
+    def _schema(self):
+        return self._table().schema.empty_table().to_pandas()
+
+    def _nrows(self):
+        return self._table().num_rows
+
+    def _read(self, columns):
+        return self._table(columns).to_pandas()
+
+    def _iter_chunks(self, columns, chunksize):
+        for batch in self._table(columns).to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas()
+
+
+class HDFSource(DataSource):
+    """
+    HDF5 file written by pandas. Columns and chunks can only be selected without reading
+    the whole frame if the data is stored in table format (`format="table"`).
+    """
+
+    def __init__(self, path, key=None, **kwargs):
+        super(HDFSource, self).__init__(path, **kwargs)
+        self.key = key
+
+    def _store(self):
+        import pandas as pd
+        store = pd.HDFStore(self.path, mode="r")
+        if self.key is None:
+            # Categorical columns are stored with additional "meta" nodes.
+            keys = [k for k in store.keys() if "/meta/" not in k]
+            if len(keys) != 1:
+                store.close()
+                raise ValueError("%s contains %d objects. Specify the key" % (self.path, len(keys)))
+            self.key = keys[0]
+        return store
+
+    def _is_table(self, store):
+        return store.get_storer(self.key).is_table
+
+    def _schema(self):
+        with self._store() as store:
+            if self._is_table(store): return store.select(self.key, stop=0)
+            return store.select(self.key).iloc[:0]
+
+    def _nrows(self):
+        with self._store() as store:
+            return store.get_storer(self.key).nrows
+
+    def _read(self, columns):
+        with self._store() as store:
+            if self._is_table(store): return store.select(self.key, columns=columns)
+            return store.select(self.key)[columns]
+
+    def _iter_chunks(self, columns, chunksize):
+        with self._store() as store:
+            if self._is_table(store):
+                for chunk in store.select(self.key, columns=columns, chunksize=chunksize):
+                    yield chunk
+            else:
+                frame = store.select(self.key)[columns]
+                for start in range(0, len(frame), chunksize):
+                    yield frame.iloc[start:start + chunksize]
+
+
+class MemmapSource(DataSource):
+    """
+    Columns stored in .npy files opened with `np.load(mmap_mode="r")`.
+    `path` is a directory with one file per column (the name of the file is the name of the column)
+    or a dictionary name --> path.
+    """
+
+    def __init__(self, path, **kwargs):
+        if isinstance(path, dict):
+            self.files = OrderedDict(path)
+        else:
+            self.files = OrderedDict((os.path.splitext(f)[0], os.path.join(path, f))
+                                     for f in sorted(os.listdir(path)) if f.endswith(".npy"))
+        if not self.files: raise ValueError("No .npy file in %s" % str(path))
+        super(MemmapSource, self).__init__(list(self.files.values()), **kwargs)
+        self._arrays = OrderedDict((c, np.load(p, mmap_mode="r")) for c, p in self.files.items())
+        lengths = set(len(a) for a in self._arrays.values())
+        if len(lengths) != 1: raise ValueError("Columns have different lengths: %s" % sorted(lengths))
+
+    def __repr__(self):
+        return "<MemmapSource: %d rows, %d columns>" % (len(self), len(self.columns))
+
+    def _frame(self, columns, start=None, stop=None):
+        import pandas as pd
+        return pd.DataFrame(OrderedDict((c, self._arrays[c][start:stop]) for c in columns), copy=False)
+
+    def _schema(self):
+        return self._frame(self._arrays.keys(), 0, 0)
+
+    def _nrows(self):
+        return len(next(iter(self._arrays.values())))
+
+    def _read(self, columns):
+        # Pages are read from disk when the plotting functions access the data.
+        return self._frame(columns)
+
+    def _iter_chunks(self, columns, chunksize):
+        for start in range(0, len(self), chunksize):
+            yield self._frame(columns, start, start + chunksize)
+
+
+def open_source(path, **kwargs):
+    """Return DataSource for `path`. The type is detected from the extension (a directory for .npy columns)."""
+    if isinstance(path, dict) or os.path.isdir(path): return MemmapSource(path, **kwargs)
+    ext = os.path.splitext(path)[1].lower()
+    classes = {
+        ".parquet": ParquetSource,
+        ".pq": ParquetSource,
+        ".feather": FeatherSource,
+        ".arrow": FeatherSource,
+        ".h5": HDFSource,
+        ".hdf5": HDFSource,
+    }
+    if ext not in classes:
+        raise ValueError("Don't know how to open %s. Supported extensions: %s" % (path, list(classes.keys())))
+    return classes[ext](path, **kwargs)
+
+
+def schema(data):
+    """DataFrame with the columns and dtypes of `data` (DataFrame or DataSource) without reading a source."""
+    return data.empty if is_source(data) else data
+
+
+def _level_order(dtype, levels, categories):
+    """
+    Order of the levels with the rules of seaborn: categories for categorical data
+    (collected from the chunks since the schema may not store them), sorted numbers or order of appearance.
+    """
+    import pandas as pd
+    if isinstance(dtype, pd.CategoricalDtype): return list(categories)
+    if pd.api.types.is_numeric_dtype(dtype): return sorted(levels)
+    return list(levels)
+
+
+@tm.timed("stats")
+def stream_groupby(source, keys, value=None, chunksize=CHUNKSIZE):
+    """
+    Streaming aggregation over the chunks of `source`.
+
+    Returns: (agg, orders) where agg is a DataFrame indexed by `keys` with the number of rows (n)
+    and, if `value` is given, the number of finite values (n), their sum, mean and sum of squared
+    deviations from the mean (m2). The moments of the chunks are merged with the parallel formula
+    of Chan et al. so that the variance does not lose precision when the values are far from zero.
+    orders is a list with the order of the levels of each key.
+    """
+    import pandas as pd
+    keys = list(keys)
+    parts, seen, categories = [], [OrderedDict() for _ in keys], [OrderedDict() for _ in keys]
+    columns = keys + ([value] if value is not None else [])
+    for chunk in source.iter_chunks(columns, chunksize=chunksize):
+        if value is not None:
+            v = pd.to_numeric(chunk[value], errors="coerce")
+            chunk = chunk[keys].assign(_v=v).dropna(subset=["_v"])
+            g = chunk.groupby(keys, sort=False, observed=True)["_v"]
+            n = g.size()
+            part = pd.DataFrame({"n": n, "mean": g.mean(), "m2": g.var(ddof=0) * n})
+        else:
+            part = chunk.groupby(keys, sort=False, observed=True).size().to_frame("n")
+        for i, k in enumerate(keys):
+            for level in part.index.get_level_values(i): seen[i].setdefault(level, None)
+            if isinstance(chunk[k].dtype, pd.CategoricalDtype):
+                for level in chunk[k].cat.categories: categories[i].setdefault(level, None)
+        parts.append(part)
+
+    if not parts:
+        agg = pd.DataFrame()
+    elif value is None:
+        agg = pd.concat(parts).groupby(level=list(range(len(keys)))).sum()
+    else:
+        # m2 = sum of the m2 of the chunks + sum of n_chunk * (mean_chunk - mean) ** 2
+        parts = pd.concat(parts)
+        level = list(range(len(keys)))
+        parts["sum"] = parts["n"] * parts["mean"]
+        agg = parts[["n", "sum"]].groupby(level=level).sum()
+        agg["mean"] = agg["sum"] / agg["n"]
+        dev = parts["mean"] - agg["mean"].reindex(parts.index).values
+        agg["m2"] = (parts["m2"] + parts["n"] * dev ** 2).groupby(level=level).sum()
+    orders = [_level_order(source.dtypes[k], list(s.keys()), list(c.keys()))
+              for k, s, c in zip(keys, seen, categories)]
+    return agg, orders
+
+
+def _iter_range(source, columns, start=0, stop=None, chunksize=CHUNKSIZE):
+    """Iterate over the chunks of `source` restricted to the rows [start, stop)."""
+    stop = len(source) if stop is None else stop
+    offset = 0
+    for chunk in source.iter_chunks(columns, chunksize=chunksize):
+        n = len(chunk)
+        if offset + n > start and offset < stop:
+            yield chunk.iloc[max(start - offset, 0):stop - offset]
+        offset += n
+        if offset >= stop: break
+
+
+@tm.timed("stats")
+def stream_histogram(source, columns, bins=10, start=0, stop=None, chunksize=CHUNKSIZE):
+    """
+    Histograms of `columns` in the rows [start, stop) computed in two streaming passes (range, counts)
+    with common bins. Returns (edges, OrderedDict column --> counts).
+    """
+    vmin, vmax = np.inf, -np.inf
+    for chunk in _iter_range(source, columns, start, stop, chunksize=chunksize):
+        values = chunk.values.astype(float)
+        if np.isfinite(values).any():
+            vmin, vmax = min(vmin, np.nanmin(values)), max(vmax, np.nanmax(values))
+    if not np.isfinite(vmin): vmin, vmax = 0, 1
+    edges = np.histogram_bin_edges([vmin, vmax], bins=bins)
+
+    counts = OrderedDict((c, np.zeros(bins, dtype=np.int64)) for c in columns)
+    for chunk in _iter_range(source, columns, start, stop, chunksize=chunksize):
+        for c in columns:
+            counts[c] += np.histogram(chunk[c].values.astype(float), bins=edges)[0]
+    return edges, counts
+
+
+def grouped_estimates(source, x, y, hue=None, orient=None, estimator="mean", ci=95, chunksize=CHUNKSIZE):
+    """
+    :class:`GroupedCI` computed with streaming aggregates. Supported estimators: mean, sum, std.
+    The confidence intervals of mean and sum use the normal approximation (no bootstrap).
+    """
+    from df_widgets.stats import GroupedCI, infer_orient
+    from scipy.stats import norm
+    if estimator not in STREAMING_ESTIMATORS:
+        raise ValueError("Estimator %s cannot be computed with streaming aggregates" % estimator)
+
+    orient = infer_orient(source, x, y, orient)
+    value, group = (y, x) if orient == "v" else (x, y)
+    if group is None: raise ValueError("Streaming aggregates require the categorical axis")
+    keys = [k for k in (group, hue) if k is not None]
+    agg, orders = stream_groupby(source, keys, value=value, chunksize=chunksize)
+    order, hue_order = orders[0], (orders[-1] if hue is not None else None)
+    index = [(g, h) if hue is not None else g for g in order for h in (hue_order or [None])]
+    agg = agg.reindex(index)
+    n, s, mean, m2 = (agg[c].values.astype(float) for c in ("n", "sum", "mean", "m2"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = m2 / n
+        sem = np.sqrt(var * n / (n - 1)) / np.sqrt(n)
+    z = norm.ppf(0.5 + ci / 200.)
+    if estimator == "mean":
+        est, lo, hi = mean, mean - z * sem, mean + z * sem
+    elif estimator == "sum":
+        est, lo, hi = s, s - z * sem * n, s + z * sem * n
+    else:
+        est, lo, hi = np.sqrt(var), np.full(len(n), np.nan), np.full(len(n), np.nan)
+
+    shape = (len(order), len(hue_order or [None]))
+    return GroupedCI.from_arrays(orient, order, hue_order, est.reshape(shape), lo.reshape(shape), hi.reshape(shape))
+
+
+def estimates_frame(ci, x, y, hue=None, value=None):
+    """
+    DataFrame with one row per (group, hue) and the estimates of the :class:`GroupedCI` `ci`
+    in the column of the values (or `value`), to be passed to seaborn with `order` and `hue_order`.
+    """
+    import pandas as pd
+    vcol, gcol = (y, x) if ci.orient == "v" else (x, y)
+    if value is not None: vcol = value
+    columns = [c for c in (gcol, hue) if c is not None] + [vcol]
+    rows = []
+    for i, g in enumerate(ci.order if ci.order is not None else [None]):
+        for j, h in enumerate(ci.hue_order if ci.hue_order is not None else [None]):
+            row = [g] if gcol is not None else []
+            if hue is not None: row.append(h)
+            rows.append(row + [ci.est[i, j]])
+    return pd.DataFrame(rows, columns=columns).dropna(subset=[vcol])
+
+
+def grouped_counts(source, x, y, hue=None, chunksize=CHUNKSIZE):
+    """Counts of the countplot computed with streaming aggregates. Returns :class:`GroupedCI` without intervals."""
+    from df_widgets.stats import GroupedCI
+    orient, group = ("v", x) if x is not None else ("h", y)
+    if group is None: raise ValueError("Streaming aggregates require the categorical axis")
+    keys = [k for k in (group, hue) if k is not None]
+    agg, orders = stream_groupby(source, keys, chunksize=chunksize)
+    order, hue_order = orders[0], (orders[-1] if hue is not None else None)
+    index = [(g, h) if hue is not None else g for g in order for h in (hue_order or [None])]
+    n = agg["n"].reindex(index).fillna(0).values.astype(float)
+    shape = (len(order), len(hue_order or [None]))
+    nan = np.full(shape, np.nan)
+    return GroupedCI.from_arrays(orient, order, hue_order, n.reshape(shape), nan, nan)
@@ -0,0 +1,257 @@
+# coding: utf-8
+"""
+Aggregation engine used by the widgets: per-group estimates and bootstrap confidence intervals
+computed in batched NumPy passes. The resampling is performed with a matrix of random indices
+(one row per bootstrap iteration) and the statistics are obtained by reducing along the last axis.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+import df_widgets.timing as tm
+
+from collections import OrderedDict
+
+
+# Estimators exposed in the widgets. Values are the functions passed to seaborn.
+ESTIMATORS = OrderedDict([
+    ("mean", np.mean),
+    ("median", np.median),
+    ("sum", np.sum),
+    ("std", np.std),
+])
+
+# Max number of elements in the resample matrix. Bootstrap iterations are processed in chunks.
+MAX_ELEMENTS = 2 ** 24
+
+
+def _segment_reduce(mat, starts, sizes, estimator):
+    """
+    Reduce the segments [starts[g], starts[g] + sizes[g]) along the last axis of `mat`.
+    Segments must be non-empty and contiguous.
+    """
+    if estimator in ("mean", "sum"):
+        out = np.add.reduceat(mat, starts, axis=-1)
+        return out / sizes if estimator == "mean" else out
+
+    func = ESTIMATORS[estimator]
+    out = np.empty(mat.shape[:-1] + (len(starts),))
+    for g, (s, k) in enumerate(zip(starts, sizes)):
+        out[..., g] = func(mat[..., s:s + k], axis=-1)
+    return out
+
+
+def _percentiles(boots, ci):
+    """Lower and upper percentiles for the `ci` confidence interval."""
+    return np.percentile(boots, [50 - ci / 2, 50 + ci / 2], axis=0)
+
+
+def _chunks(n_boot, n):
+    """Split n_boot iterations in chunks so that the resample matrix has at most MAX_ELEMENTS."""
+    step = max(1, MAX_ELEMENTS // max(n, 1))
+    for b in range(0, n_boot, step):
+        yield b, min(step, n_boot - b)
+
+
+def bootstrap_groups(values, codes, ngroups, estimator="mean", n_boot=1000, ci=95, seed=0):
+    """
+    Point estimates and bootstrap confidence intervals for all the groups at once.
+
+    Args:
+        values: Array with the observations.
+        codes: Integer array with the group of each observation in [0, ngroups). Negative codes are ignored.
+        ngroups: Number of groups.
+        estimator: Name of the estimator (key in ESTIMATORS).
+        n_boot: Number of bootstrap iterations. No CI is computed if 0.
+        ci: Size of the confidence interval in percent.
+        seed: Seed for the random number generator.
+
+    Returns: (est, lo, hi) arrays of shape (ngroups,). NaN for empty groups.
+    """
+    values, codes = np.asarray(values, dtype=float), np.asarray(codes)
+    mask = np.isfinite(values) & (codes >= 0)
+    order = np.argsort(codes[mask], kind="mergesort")
+    values, codes = values[mask][order], codes[mask][order]
+
+    allsizes = np.bincount(codes, minlength=ngroups)
+    nonempty = np.flatnonzero(allsizes)
+    sizes = allsizes[nonempty]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    est, lo, hi = np.full((3, ngroups), np.nan)
+    if not len(values): return est, lo, hi
+    est[nonempty] = _segment_reduce(values, starts, sizes, estimator)
+    if not n_boot: return est, lo, hi
+
+    # Each column of the resample matrix draws from the segment of its group.
+    col_starts, col_sizes = np.repeat(starts, sizes), np.repeat(sizes, sizes)
+    rng = np.random.RandomState(seed)
+    boots = np.empty((n_boot, len(sizes)))
+    for b, nb in _chunks(n_boot, len(values)):
+        idx = col_starts + (rng.random_sample((nb, len(values))) * col_sizes).astype(np.int64)
+        boots[b:b + nb] = _segment_reduce(values[idx], starts, sizes, estimator)
+
+    lo[nonempty], hi[nonempty] = _percentiles(boots, ci)
+    return est, lo, hi
+
+
+def bootstrap_linregress(x, y, grid, n_boot=1000, ci=95, seed=0):
+    """
+    Linear regression of `y` on `x` evaluated on `grid` with bootstrap confidence band.
+    All the bootstrap fits are computed with closed-form least squares reduced along the last axis.
+
+    Returns: (yhat, lo, hi) arrays with the same shape as `grid`.
+    """
+    x, y, grid = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(grid, dtype=float)
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = x[mask], y[mask]
+    n = len(x)
+    nan = np.full(grid.shape, np.nan)
+    if n < 2: return nan, nan, nan
+
+    def fit(xs, ys):
+        xm, ym = xs.mean(axis=-1, keepdims=True), ys.mean(axis=-1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = ((xs - xm) * (ys - ym)).sum(axis=-1) / ((xs - xm) ** 2).sum(axis=-1)
+        intercept = ym[..., 0] - slope * xm[..., 0]
+        return intercept[..., None] + slope[..., None] * grid
+
+    yhat = fit(x, y)
+    if not n_boot: return yhat, nan, nan
+
+    rng = np.random.RandomState(seed)
+    boots = np.empty((n_boot, len(grid)))
+    for b, nb in _chunks(n_boot, n):
+        idx = rng.randint(0, n, size=(nb, n))
+        boots[b:b + nb] = fit(x[idx], y[idx])
+
+    lo, hi = np.nanpercentile(boots, [50 - ci / 2, 50 + ci / 2], axis=0)
+    return yhat, lo, hi
+
+
+def categorical_order(values):
+    """
+    Order of the levels used by seaborn: categories for categorical data,
+    sorted levels for numeric data, order of appearance otherwise.
+    Returns (codes, levels).
+    """
+    import pandas as pd
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.values, list(values.cat.categories)
+    codes, levels = pd.factorize(values, sort=pd.api.types.is_numeric_dtype(values))
+    return codes, list(levels)
+
+
+def infer_orient(data, x, y, orient=None):
+    """Orientation of a categorical plot with the same rules used by seaborn."""
+    import pandas as pd
+    if orient is not None: return orient
+    if y is None and x is not None: return "h"
+    if x is not None and y is not None:
+        # Only the dtypes are needed (data sources are not read).
+        dtypes = data.dtypes
+        if pd.api.types.is_numeric_dtype(dtypes[x]) and not pd.api.types.is_numeric_dtype(dtypes[y]): return "h"
+    return "v"
+
+
+def label_categorical_axes(ax, orient, order, group, value):
+    """Set ticks, tick labels and axis labels of a categorical plot drawn by df_widgets."""
+    ticks, labels = np.arange(len(order)), [str(o) for o in order]
+    if orient == "v":
+        ax.set_xticks(ticks)
+        ax.set_xticklabels(labels)
+        ax.set_xlabel(group or "")
+        ax.set_ylabel(value)
+    else:
+        ax.set_yticks(ticks)
+        ax.set_yticklabels(labels)
+        ax.set_ylabel(group or "")
+        ax.set_xlabel(value)
+    return ax
+
+
+class GroupedCI(object):
+    """
+    Estimates and confidence intervals of a categorical plot.
+    `est`, `lo`, `hi` are arrays of shape (len(order), len(hue_order)).
+    `order` and `hue_order` must be passed to seaborn so that the positions of the artists are consistent.
+    """
+
+    @tm.timed("stats")
+    def __init__(self, data, x, y, hue=None, orient=None, estimator="mean", n_boot=1000, ci=95, seed=0):
+        self.orient = infer_orient(data, x, y, orient)
+        value, group = (y, x) if self.orient == "v" else (x, y)
+        n = len(data)
+
+        if group is not None:
+            gcodes, self.order = categorical_order(data[group])
+        else:
+            gcodes, self.order = np.zeros(n, dtype=np.int64), None
+        if hue is not None:
+            hcodes, self.hue_order = categorical_order(data[hue])
+        else:
+            hcodes, self.hue_order = np.zeros(n, dtype=np.int64), None
+
+        ng = len(self.order) if self.order is not None else 1
+        nh = len(self.hue_order) if self.hue_order is not None else 1
+        codes = np.where((gcodes >= 0) & (hcodes >= 0), gcodes * nh + hcodes, -1)
+        shape = (ng, nh)
+        est, lo, hi = bootstrap_groups(data[value].values, codes, ng * nh,
+                                       estimator=estimator, n_boot=n_boot, ci=ci, seed=seed)
+        self.est, self.lo, self.hi = est.reshape(shape), lo.reshape(shape), hi.reshape(shape)
+
+    @classmethod
+    def from_arrays(cls, orient, order, hue_order, est, lo, hi):
+        """Build the object from precomputed arrays of shape (len(order), len(hue_order))."""
+        new = cls.__new__(cls)
+        new.orient, new.order, new.hue_order = orient, order, hue_order
+        new.est, new.lo, new.hi = est, lo, hi
+        return new
+
+    def positions(self, width=0.8, dodge=True):
+        """Positions of the artists along the categorical axis, shape (len(order), len(hue_order))."""
+        ng, nh = self.est.shape
+        offsets = np.zeros(nh)
+        if dodge and nh > 1:
+            offsets = -width / 2 + width / nh * (np.arange(nh) + 0.5)
+        return np.arange(ng)[:, None] + offsets[None, :]
+
+    def draw(self, ax, width=0.8, dodge=True, color=".26", linewidth=None):
+        """Draw the precomputed error bars on `ax`."""
+        import matplotlib as mpl
+        if linewidth is None: linewidth = mpl.rcParams["lines.linewidth"] * 1.8
+        pos = self.positions(width=width, dodge=dodge).ravel()
+        lo, hi = self.lo.ravel(), self.hi.ravel()
+        ok = np.isfinite(lo) & np.isfinite(hi)
+        if self.orient == "v":
+            ax.vlines(pos[ok], lo[ok], hi[ok], colors=color, linewidth=linewidth, zorder=3)
+        else:
+            ax.hlines(pos[ok], lo[ok], hi[ok], colors=color, linewidth=linewidth, zorder=3)
+        return ax
+
+
+@tm.timed("stats")
+def grouped_counts(data, x, y, hue=None):
+    """Number of rows of each (category, hue level) of a countplot. Returns :class:`GroupedCI` without intervals."""
+    orient, group = ("v", x) if x is not None else ("h", y)
+    n = len(data)
+    gcodes, order = categorical_order(data[group])
+    hcodes, hue_order = categorical_order(data[hue]) if hue is not None else (np.zeros(n, dtype=np.int64), None)
+    ng, nh = len(order), len(hue_order or [None])
+    ok = (gcodes >= 0) & (hcodes >= 0)
+    counts = np.bincount(gcodes[ok] * nh + hcodes[ok], minlength=ng * nh).reshape(ng, nh).astype(float)
+    nan = np.full((ng, nh), np.nan)
+    return GroupedCI.from_arrays(orient, order, hue_order, counts, nan, nan)
+
+
+@tm.timed("stats")
+def regression_band(x, y, data=None, color=None, label=None, n_boot=1000, ci=95, alpha=0.15):
+    """
+    Draw the bootstrap confidence band of the linear regression on the current axes.
+    Signature compatible with :meth:`FacetGrid.map_dataframe`.
+    """
+    import matplotlib.pyplot as plt
+    ax = plt.gca()
+    grid = np.linspace(*ax.get_xlim(), num=100)
+    _, lo, hi = bootstrap_linregress(data[x].values, data[y].values, grid, n_boot=n_boot, ci=ci)
+    ax.fill_between(grid, lo, hi, color=color, alpha=alpha, linewidth=0)
+    return ax
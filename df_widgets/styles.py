@@ -0,0 +1,187 @@
+# coding: utf-8
+"""
+Style-only parameters of the widgets.
+
+The parameters of the plotting closures are either data-affecting (columns, estimator, n_boot ...)
+or style-only (color, saturation, size, linewidth). When only the style-only parameters change,
+the figure of the previous render is kept alive and its artists are updated in place
+(`set_facecolor`, `set_sizes`, `set_linewidth`, ...) so that neither the statistics nor the
+figure are computed again. Appliers return False when the change cannot be applied in place
+(e.g. back to the default palette) and the figure is rendered from scratch.
+
+`notch` is data-affecting: the notches change the geometry of the boxes (median confidence intervals).
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import colorsys
+import numpy as np
+
+from collections import OrderedDict
+
+# Names of the style-only controls in utils (colors_dropdow, saturation_slider, size_slider, linewidth_slider).
+STYLE_PARAMS = ("color", "saturation", "size", "linewidth")
+
+
+class Restyle(object):
+    """
+    Style-only parameters of a plotting closure and the functions updating the artists.
+    `appliers` maps the name of the parameter to `func(fig, old, new)` where `old` and `new` are dictionaries
+    with the (normalized) arguments of the previous and of the new render.
+    func returns False if the figure must be rendered again.
+    """
+
+    def __init__(self, **appliers):
+        for name in appliers:
+            if name not in STYLE_PARAMS: raise ValueError("%s is not a style-only parameter" % name)
+        self.appliers = OrderedDict(sorted(appliers.items()))
+
+    @property
+    def params(self):
+        return tuple(self.appliers.keys())
+
+    def split(self, arguments):
+        """Split the normalized arguments (tuple of (name, value)) in data-affecting and style-only."""
+        data = tuple((k, v) for k, v in arguments if k not in self.appliers)
+        style = tuple((k, v) for k, v in arguments if k in self.appliers)
+        return data, style
+
+    def apply(self, fig, old, new):
+        """Update the artists of `fig` from the arguments `old` to `new`. Return False if not possible."""
+        funcs = []
+        for name, func in self.appliers.items():
+            if old.get(name) != new.get(name) and func not in funcs: funcs.append(func)
+        return all(func(fig, old, new) is not False for func in funcs)
+
+
+def _desaturate(color, prop):
+    """Decrease the saturation of `color` (rgb tuple) by `prop` with the same rules used by seaborn."""
+    h, l, s = colorsys.rgb_to_hls(*color[:3])
+    return colorsys.hls_to_rgb(h, l, s * prop)
+
+
+def _resaturate(color, old, new):
+    """Color with saturation `new` from a color desaturated by `old`."""
+    h, l, s = colorsys.rgb_to_hls(*color[:3])
+    return colorsys.hls_to_rgb(h, l, min(s / old, 1) * new)
+
+
+def _same(c1, c2, tol=2e-3):
+    return np.allclose(np.asarray(c1)[:3], np.asarray(c2)[:3], atol=tol)
+
+
+def _axes_artists(fig):
+    """Collections, patches and lines of the axes and the patches of the legends."""
+    for ax in fig.axes:
+        for artist in list(ax.patches) + list(ax.collections) + list(ax.lines):
+            yield artist
+    legends = list(fig.legends) + [ax.get_legend() for ax in fig.axes if ax.get_legend() is not None]
+    for legend in legends:
+        for artist in legend.legend_handles if hasattr(legend, "legend_handles") else legend.legendHandles:
+            yield artist
+
+
+def _filled(fig):
+    """Filled artists of a categorical plot: bars, boxes, violins and legend patches."""
+    from matplotlib.patches import Patch
+    from matplotlib.collections import PolyCollection
+    return [a for a in _axes_artists(fig) if isinstance(a, (Patch, PolyCollection))]
+
+
+def _markers(fig):
+    """Markers and lines of the strip/swarm/point plots."""
+    from matplotlib.collections import PathCollection
+    from matplotlib.lines import Line2D
+    return [a for a in _axes_artists(fig) if isinstance(a, (PathCollection, Line2D))]
+
+
+def _lines(fig):
+    from matplotlib.lines import Line2D
+    return [a for a in _axes_artists(fig) if isinstance(a, Line2D)]
+
+
+def _gray(color):
+    """Gray used by seaborn for the lines of the boxes filled with `color`."""
+    lum = colorsys.rgb_to_hls(*color[:3])[1] * .6
+    return (lum, lum, lum)
+
+
+def _map_facecolors(artist, func, which="face"):
+    """Replace the face (edge) colors of `artist` with `func(rgba)` (None to keep the color). Keep alpha."""
+    from matplotlib.colors import to_rgba_array
+    faces = to_rgba_array(getattr(artist, "get_%scolor" % which)())
+    if not len(faces): return
+    new = faces.copy()
+    for i, c in enumerate(faces):
+        rgb = func(c)
+        if rgb is not None: new[i, :3] = rgb
+    if not np.array_equal(new, faces):
+        getattr(artist, "set_%scolor" % which)(new if len(new) > 1 else new[0])
+
+
+def recolor_faces(fig, old, new):
+    """
+    Update the fill color of bars, boxes and violins after a change of `color` and/or `saturation`.
+    A new color is applied only to the artists filled with the previous color (no hue, no palette).
+    """
+    from matplotlib.colors import to_rgb
+    s0, s1 = old.get("saturation", 1), new.get("saturation", 1)
+    if old.get("color") != new.get("color"):
+        if old.get("color") is None or new.get("color") is None or new.get("hue") is not None: return False
+        src = _desaturate(to_rgb(old["color"]), s0)
+        dst = _desaturate(to_rgb(new["color"]), s1)
+        for artist in _filled(fig):
+            _map_facecolors(artist, lambda c: dst if _same(c, src) else None)
+        # Lines and edges of the boxes drawn with the gray derived from the fill color.
+        g0, g1 = _gray(src), _gray(dst)
+        for artist in _filled(fig):
+            _map_facecolors(artist, lambda c: g1 if _same(c, g0) else None, which="edge")
+        for artist in _lines(fig):
+            if _same(to_rgb(artist.get_color()), g0): artist.set_color(g1)
+            if _same(to_rgb(artist.get_markeredgecolor()), g0): artist.set_markeredgecolor(g1)
+        return True
+    if not s0: return False
+    for artist in _filled(fig):
+        _map_facecolors(artist, lambda c: _resaturate(c, s0, s1))
+    return True
+
+
+def recolor_markers(fig, old, new):
+    """Update the color of the markers and lines drawn with `color` (no hue, no palette)."""
+    from matplotlib.colors import to_rgb
+    from matplotlib.lines import Line2D
+    if old.get("color") is None or new.get("color") is None or new.get("hue") is not None: return False
+    src, dst = to_rgb(old["color"]), to_rgb(new["color"])
+    for artist in _markers(fig):
+        if isinstance(artist, Line2D):
+            if _same(to_rgb(artist.get_color()), src): artist.set_color(dst)
+            if _same(to_rgb(artist.get_markerfacecolor()), src): artist.set_markerfacecolor(dst)
+        else:
+            _map_facecolors(artist, lambda c: dst if _same(c, src) else None)
+    return True
+
+
+def resize_markers(fig, old, new):
+    """Set the area of the markers to `size ** 2` (seaborn convention)."""
+    from matplotlib.collections import PathCollection
+    for artist in _markers(fig):
+        if isinstance(artist, PathCollection):
+            artist.set_sizes(np.full(max(len(artist.get_sizes()), 1), new["size"] ** 2))
+    return True
+
+
+def marker_linewidth(fig, old, new):
+    """Set the width of the edges of the markers."""
+    from matplotlib.collections import PathCollection
+    for artist in _markers(fig):
+        if isinstance(artist, PathCollection): artist.set_linewidth(new["linewidth"])
+    return True
+
+
+def resize_facets(fig, old, new):
+    """
+    Scale the figure of a grid with `size` (height of the facets).
+    The margins set by seaborn are fractions of the figure so the layout is preserved.
+    """
+    if not old.get("size") or not new.get("size"): return False
+    fig.set_size_inches(fig.get_size_inches() * new["size"] / old["size"])
+    return True
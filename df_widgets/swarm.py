@@ -0,0 +1,194 @@
+# coding: utf-8
+"""
+Swarm layout engine for categorical scatter plots.
+
+The layout is computed with a sorted sweep: points are sorted by value and each point
+is only compared with the w already placed points whose value is within one marker diameter.
+The free position closest to the center is found by merging the w forbidden intervals (numpy)
+so that the cost is O(n log n) for the sort plus O(w log w) per point (Python loop over the points).
+Categories with more points than the budget are subsampled (stratified by hue)
+or drawn with a strip (random jitter) layout.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+import df_widgets.timing as tm
+
+
+def beeswarm(values, diameter):
+    """
+    Offsets of the points of a beeswarm (same units as `values`) so that circles
+    of diameter `diameter` centered at (offset, value) do not overlap.
+    Each point is placed at the position closest to the center that does not
+    overlap with the points already placed. Returns offsets in the original order.
+    """
+    # Point i overlaps with the placed point j if its offset is in the open interval
+    # (offset_j - dx_j, offset_j + dx_j). The closest free position is 0 or
+    # one of the ends of the union of the intervals containing 0.
+    v = np.asarray(values, dtype=float)
+    order = np.argsort(v, kind="mergesort")
+    vs = v[order]
+    offsets = np.zeros(len(vs))
+    d2 = diameter ** 2
+    lo = 0
+    for i in range(1, len(vs)):
+        # Window [lo, i) with the placed points that may overlap with point i.
+        while vs[i] - vs[lo] >= diameter: lo += 1
+        if lo == i: continue
+        dx = np.sqrt(np.maximum(d2 * (1 - 1e-9) - (vs[i] - vs[lo:i]) ** 2, 0))
+        placed = offsets[lo:i]
+        starts, ends = placed - dx, placed + dx
+        k = np.argsort(starts, kind="mergesort")
+        starts, ends = starts[k], np.maximum.accumulate(ends[k])
+        # Start of a new connected interval where the start is not covered by the previous intervals.
+        first = np.r_[True, starts[1:] >= ends[:-1]]
+        a, b = starts[first], np.maximum.reduceat(ends, np.flatnonzero(first))
+        hit = np.flatnonzero((a < 0) & (b > 0))
+        if hit.size:
+            a, b = a[hit[0]], b[hit[0]]
+            offsets[i] = b if b <= -a else a
+
+    out = np.empty_like(offsets)
+    out[order] = offsets
+    return out
+
+
+def stratified_subsample(groups, strata, budget, seed=0):
+    """
+    Indices of a random subsample with at most `budget` points per group.
+    Inside each group the points are sampled proportionally to the size of the strata (e.g. hue levels)
+    with at least one point per stratum. Returns sorted array of indices.
+    """
+    groups, strata = np.asarray(groups, dtype=np.int64), np.asarray(strata, dtype=np.int64)
+    n = len(groups)
+    if not n: return np.arange(0)
+    keys = groups * (strata.max() + 1) + strata
+    gcount = np.bincount(groups)
+    kcount = np.bincount(keys)
+    # Quota of each stratum.
+    ngroups_of_key = np.arange(len(kcount)) // (strata.max() + 1)
+    frac = np.minimum(1.0, budget / np.maximum(gcount[ngroups_of_key], 1))
+    quota = np.where(kcount > 0, np.maximum(1, np.floor(kcount * frac)), 0)
+
+    # Random rank of each point inside its stratum.
+    rng = np.random.RandomState(seed)
+    order = np.lexsort((rng.random_sample(n), keys))
+    sorted_keys = keys[order]
+    rank = np.arange(n) - np.searchsorted(sorted_keys, sorted_keys, side="left")
+
+    return np.sort(order[rank < quota[sorted_keys]])
+
+
+@tm.timed("stats")
+def _layout(vals, swarm_ids, diameter, px_cat, px_val, layout, width, rng):
+    """Offsets along the categorical axis in data units."""
+    offsets = np.zeros(len(vals))
+    half = width / 2
+    if layout == "strip":
+        return rng.uniform(-half * 0.8, half * 0.8, size=len(vals))
+
+    for sid in np.unique(swarm_ids):
+        sel = np.flatnonzero(swarm_ids == sid)
+        offsets[sel] = beeswarm(vals[sel] * px_val, diameter) / px_cat
+
+    return np.clip(offsets, -half, half)
+
+
+def swarmplot(ax, data, x=None, y=None, hue=None, orient=None, color=None, size=5, linewidth=0,
+              edgecolor="gray", split=False, budget=2000, overflow="subsample", width=0.8, seed=0, **kwargs):
+    """
+    Categorical scatter plot with non-overlapping points drawn with a single scatter artist.
+
+    Args:
+        ax: matplotlib Axes.
+        data: DataFrame.
+        x, y, hue: Column names. The categorical axis is inferred as in seaborn if orient is None.
+        size: Diameter of the markers in points.
+        split: True to draw separate swarms for the hue levels.
+        budget: Max number of points per category.
+        overflow: What to do if a category has more than `budget` points:
+            "subsample" for stratified subsampling (by hue) or "strip" to draw all points with random jitter.
+        kwargs: Passed to `ax.scatter`.
+
+    Returns: ax
+    """
+    import matplotlib as mpl
+    from matplotlib.lines import Line2D
+    from df_widgets.stats import categorical_order, infer_orient, label_categorical_axes
+
+    orient = infer_orient(data, x, y, orient)
+    value, group = (y, x) if orient == "v" else (x, y)
+    if value is None: raise ValueError("swarmplot requires a numeric column")
+    n = len(data)
+    with tm.phase("prepare"):
+        if group is not None:
+            gcodes, order = categorical_order(data[group])
+        else:
+            gcodes, order = np.zeros(n, dtype=np.int64), [""]
+        if hue is not None:
+            hcodes, hue_order = categorical_order(data[hue])
+        else:
+            hcodes, hue_order = np.zeros(n, dtype=np.int64), [None]
+
+        vals = np.asarray(data[value], dtype=float)
+        ok = np.flatnonzero(np.isfinite(vals) & (gcodes >= 0) & (hcodes >= 0))
+        vals, gcodes, hcodes = vals[ok], gcodes[ok], hcodes[ok]
+        ntot = len(vals)
+
+        overflowing = len(vals) and np.bincount(gcodes).max() > budget
+        layout = "swarm"
+        if overflowing:
+            if overflow == "subsample":
+                idx = stratified_subsample(gcodes, hcodes, budget, seed=seed)
+                vals, gcodes, hcodes = vals[idx], gcodes[idx], hcodes[idx]
+            elif overflow == "strip":
+                layout = "strip"
+            else:
+                raise ValueError("Invalid overflow: %s" % str(overflow))
+
+    ng, nh = len(order), len(hue_order)
+    cat = gcodes.astype(float)
+    swarm_ids = gcodes
+    swarm_width = width
+    if split and nh > 1:
+        cat += -width / 2 + width / nh * (hcodes + 0.5)
+        swarm_ids = gcodes * nh + hcodes
+        swarm_width = width / nh
+
+    # Fix the limits so that we can convert the marker diameter from points to data units.
+    vmin, vmax = (vals.min(), vals.max()) if len(vals) else (0, 1)
+    pad = 0.05 * (vmax - vmin) if vmax > vmin else 0.5
+    set_cat, set_val = (ax.set_xlim, ax.set_ylim) if orient == "v" else (ax.set_ylim, ax.set_xlim)
+    set_cat(-0.5, ng - 0.5)
+    set_val(vmin - pad, vmax + pad)
+    p = ax.transData.transform([[0, 0], [1, 1]])
+    px_x, px_y = abs(p[1, 0] - p[0, 0]), abs(p[1, 1] - p[0, 1])
+    px_cat, px_val = (px_x, px_y) if orient == "v" else (px_y, px_x)
+    diameter = size * ax.figure.dpi / 72
+
+    rng = np.random.RandomState(seed)
+    cat = cat + _layout(vals, swarm_ids, diameter, px_cat, px_val, layout, swarm_width, rng)
+
+    cycle = mpl.rcParams["axes.prop_cycle"].by_key()["color"]
+    if hue is not None:
+        palette = [cycle[i % len(cycle)] for i in range(nh)]
+        colors = mpl.colors.to_rgba_array(palette)[hcodes]
+    else:
+        colors = mpl.colors.to_rgba_array([color if color is not None else cycle[0]])
+
+    xs, ys = (cat, vals) if orient == "v" else (vals, cat)
+    ax.scatter(xs, ys, s=size ** 2, c=colors,
+               linewidths=linewidth, edgecolors=edgecolor, zorder=3, **kwargs)
+
+    label_categorical_axes(ax, orient, order, group, value)
+
+    if hue is not None:
+        handles = [Line2D([], [], marker="o", linestyle="", color=palette[i], label=str(h))
+                   for i, h in enumerate(hue_order)]
+        ax.legend(handles=handles, title=hue, loc="best")
+
+    if len(vals) < ntot or layout == "strip":
+        msg = "%d of %d points" % (len(vals), ntot) if len(vals) < ntot else "strip layout (%d points)" % ntot
+        ax.text(0.99, 0.01, msg, transform=ax.transAxes, ha="right", va="bottom", fontsize="small", alpha=0.6)
+
+    return ax
@@ -0,0 +1,168 @@
+# coding: utf-8
+"""
+Per-phase timing instrumentation of the renders.
+
+Phases (exclusive times):
+    prepare: data preparation done by df_widgets (checks, decimation, projection ...).
+    stats: statistics computed by df_widgets (bootstrap, KDE, binning ...).
+    plot: pandas/seaborn call i.e. their own statistics and the creation of the matplotlib artists.
+    draw: canvas draw and capture of the pixels (raster formats, included in encode for vector formats).
+    encode: compression of the pixels (PNG/JPEG/WebP) or savefig (SVG).
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import time
+import threading
+
+from functools import wraps
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+PHASES = ("prepare", "stats", "plot", "draw", "encode")
+
+_local = threading.local()
+
+
+class RenderTimer(object):
+    """
+    Collect the timings of the phases of a single render.
+    Nested phases are subtracted from the enclosing one so that the times are exclusive.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.times = OrderedDict((p, 0.0) for p in PHASES)
+        self.nartists = None
+        self.nbytes = None
+        self.fmt = None
+        # True if the artists of the previous figure were updated in place.
+        self.restyled = False
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        # Each entry of the stack accumulates the time spent in the children.
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            self.times[name] = self.times.get(name, 0.0) + elapsed - children
+            if self._stack: self._stack[-1] += elapsed
+
+    def record(self, cached=False):
+        """Return OrderedDict with the results."""
+        rec = OrderedDict([
+            ("timestamp", time.time()),
+            ("widget", self.name),
+            ("cached", cached),
+            ("total", sum(self.times.values())),
+        ])
+        rec.update(self.times)
+        rec["nartists"] = self.nartists
+        rec["nbytes"] = self.nbytes
+        rec["format"] = self.fmt
+        rec["restyled"] = self.restyled
+        return rec
+
+
+def current_timer():
+    """Timer of the render executed by the current thread or None."""
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def activate(timer):
+    """Set `timer` as the timer of the current thread."""
+    prev, _local.timer = current_timer(), timer
+    try:
+        yield timer
+    finally:
+        _local.timer = prev
+
+
+@contextmanager
+def phase(name):
+    """Account the time spent in the block to phase `name` of the current timer (if any)."""
+    timer = current_timer()
+    if timer is None:
+        yield
+    else:
+        with timer.phase(name):
+            yield
+
+
+def timed(name):
+    """Decorator accounting the time spent in the function to phase `name`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def count_artists(fig):
+    """Number of artists in the figure (a collection counts as one artist)."""
+    return len(fig.findobj())
+
+
+class RenderHistory(object):
+    """Rolling history with the timings of the last `maxlen` renders."""
+
+    def __init__(self, maxlen=500):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, record):
+        if not self.enabled: return
+        with self._lock:
+            self._records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def records(self, widget=None):
+        with self._lock:
+            return [r for r in self._records if widget is None or r["widget"] == widget]
+
+    def to_dataframe(self, widget=None):
+        """Return DataFrame with the history (optionally filtered by widget name)."""
+        import pandas as pd
+        df = pd.DataFrame(self.records(widget=widget))
+        if len(df): df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+        return df
+
+    def summary(self):
+        """DataFrame with the mean timings of each widget (renders that were not cached)."""
+        df = self.to_dataframe()
+        if not len(df): return df
+        df = df[~df["cached"]]
+        return df.groupby("widget")[["total"] + list(PHASES) + ["nartists", "nbytes"]].mean()
+
+    def html(self, widget, nlast=20):
+        """HTML table with the last render and the mean of the last `nlast` renders of `widget`."""
+        records = self.records(widget=widget)
+        if not records: return ""
+        last = records[-1]
+        renders = [r for r in records[-nlast:] if not r["cached"]]
+        rows = []
+        for key in ("total",) + PHASES:
+            mean = sum(r[key] for r in renders) / len(renders) if renders else float("nan")
+            rows.append("<tr><td>%s</td><td>%.3f</td><td>%.3f</td></tr>" % (key, last[key], mean))
+        rows.append("<tr><td>artists</td><td>%s</td><td></td></tr>" % last["nartists"])
+        rows.append("<tr><td>bytes</td><td>%s (%s)</td><td></td></tr>" % (last["nbytes"], last.get("format")))
+        return ("<table style='font-size:small'><tr><th>phase [s]</th><th>last%s</th><th>mean(%d)</th></tr>%s</table>" %
+                (" (cached)" if last["cached"] else " (restyled)" if last.get("restyled") else "", len(renders), "".join(rows)))
+
+
+# Global history.
+history = RenderHistory()
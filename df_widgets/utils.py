@@ -48,6 +48,76 @@ def add_docstrings(*tuples):
     return wrapper
 
 
+class LazyModule(object):
+    """
+    Proxy for module `name`. The module is imported on first attribute access
+    so that heavy backends (e.g. seaborn) are not loaded at import time.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            import importlib
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return "<%s %s (%s)>" % (self.__class__.__name__, self._name,
+                                 "loaded" if self._module is not None else "not loaded")
+
+
+def _resolve(modname, qualname):
+    """Import module `modname` and return the object `qualname` e.g. `DataFrame.plot`."""
+    import importlib
+    obj = importlib.import_module(modname)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class _LazyWrapped(object):
+    # Function that takes its docstring from `modname.qualname` when `__doc__` is accessed.
+    # No class docstring here because `__doc__` is a property.
+
+    def __init__(self, func, modname, qualname):
+        self._func = func
+        self._modname, self._qualname = modname, qualname
+        self.__name__ = qualname.split(".")[-1]
+        self.__qualname__ = self.__name__
+        self.__module__ = func.__module__
+
+    @property
+    def __doc__(self):
+        try:
+            return _resolve(self._modname, self._qualname).__doc__
+        except (ImportError, AttributeError):
+            return self._func.__doc__
+
+    @property
+    def __wrapped__(self):
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self._func(*args, **kwargs)
+
+    def __repr__(self):
+        return "<function %s wrapping %s.%s>" % (self.__name__, self._modname, self._qualname)
+
+
+def lazy_wraps(modname, qualname):
+    """
+    Lazy version of `functools.wraps(modname.qualname)`.
+    The docstring of the wrapped function is resolved on first access
+    so that the decorator does not import `modname`.
+    """
+    def decorator(func):
+        return _LazyWrapped(func, modname, qualname)
+    return decorator
+
+
 def widget2py(*args):
     l = [None if a == "None" else a for a in args]
     return l[0] if len(l) == 1 else l
@@ -59,11 +129,59 @@ def str2bool_or_none(*args):
     return l[0] if len(l) == 1 else l
 
 
+# If True, the widgets are re-rendered when a control changes (after `live_delay` seconds without changes)
+# instead of waiting for the "Run Interact" button.
+live_update = False
+live_delay = 0.3
+
+
+def _call_later(delay, callback):
+    """Schedule `callback` on the event loop of the kernel (timer thread if no loop is running). Return handle."""
+    import asyncio
+    try:
+        return asyncio.get_running_loop().call_later(delay, callback)
+    except RuntimeError:
+        import threading
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+def interact_live(func, delay=0.3, **widgets):
+    """
+    Version of :func:`ipywidgets.interact` with debounced updates: `func` is called
+    when no control has changed for `delay` seconds so that dragging a slider does not queue one render per step.
+    Returns `func` with the `widget` attribute (same convention as ipywidgets).
+    """
+    from IPython.display import display
+    w = ipw.interactive(func, {"manual": True}, **widgets)
+    w.manual_button.layout.display = "none"
+    pending = []
+
+    def schedule(change):
+        while pending: pending.pop().cancel()
+        pending.append(_call_later(delay, w.update))
+
+    for control in w.kwargs_widgets:
+        control.observe(schedule, names="value")
+    w.update()
+    display(w)
+    func.widget = w
+    return func
+
+
+def interact(func, **widgets):
+    """:func:`ipywidgets.interact_manual` or :func:`interact_live` depending on `live_update`."""
+    if live_update: return interact_live(func, delay=live_delay, **widgets)
+    return ipw.interact_manual(func, **widgets)
+
+
 def get_ax_fig_plt(ax=None):
     """
     Helper function used in plot functions supporting an optional Axes argument.
-    If ax is None, we build the `matplotlib` figure and create the Axes else
-    we return the current active figure.
+    If ax is None, we get the `matplotlib` figure from the figure manager (the previous figure
+    of the widget is reused or closed) and create the Axes else we return the current active figure.
 
     Returns:
         ax: :class:`Axes` object
@@ -71,8 +189,9 @@ def get_ax_fig_plt(ax=None):
         plt: matplotlib pyplot module.
     """
     import matplotlib.pyplot as plt
+    from df_widgets.figures import figure_manager
     if ax is None:
-        fig = plt.figure()
+        fig = figure_manager.figure()
         ax = fig.add_subplot(1,1,1)
     else:
         fig = plt.gcf()
@@ -183,6 +302,45 @@ def saturation_slider(default=0.75, orientation="horizontal"):
         readout_format='.1f'
     )
 
+def n_boot_slider(default=1000, orientation="horizontal"):
+    return ipw.IntSlider(
+        value=default,
+        min=0,
+        max=10000,
+        step=100,
+        description='n_boot',
+        orientation=orientation,
+    )
+
+
+def budget_slider(default=2000, orientation="horizontal"):
+    return ipw.IntSlider(
+        value=default,
+        min=100,
+        max=20000,
+        step=100,
+        description='budget',
+        orientation=orientation,
+    )
+
+
+def bw_dropdown(default="scott"):
+    # Numeric values are scale factors as in scipy.stats.gaussian_kde
+    return ipw.Dropdown(
+        options=["scott", "silverman", "0.1", "0.2", "0.5", "1.0"],
+        value=default,
+        description='bw',
+    )
+
+
+def estimator_dropdown(default="mean"):
+    from df_widgets.stats import ESTIMATORS
+    return ipw.Dropdown(
+        options=list(ESTIMATORS.keys()),
+        value=default,
+        description='estimator',
+    )
+
 # Have colormaps separated into categories:
 # http://matplotlib.org/examples/color/colormaps_reference.html
 
@@ -216,7 +374,7 @@ def colormap_widget(default=None):
     value = options[0]
     if default is not None:
         value = default
-        if default not in _mpl_cmaps: options[:].insert(0, value)
+        if default not in _mpl_cmaps: options = [value] + options
     return ipw.Dropdown(options=options, value=value, description='colormap')
 
 
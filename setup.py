@@ -26,7 +26,13 @@ setup(name='df_widgets',
           "seaborn",
           #"matplotlib",
       ],
-      #extras_require={
-      #    'test': ['pytest'],
-      #},
+      entry_points={
+          "console_scripts": [
+              "df-widgets-batch = df_widgets.batch:main",
+          ],
+      },
+      extras_require={
+          "client": ["anywidget"],
+          #'test': ['pytest'],
+      },
       )